@@ -1,17 +1,33 @@
 import express from 'express';
 import cors from 'cors';
 import dotenv from 'dotenv';
+import cluster from 'cluster';
 import aiRoutes from './routes/ai';
 import favoritesRoutes from './routes/favorites';
-import { initDb } from './services/db';
+import translateRoutes from './routes/translate';
+import metricsRoutes from './routes/metrics';
+import recipesRoutes from './routes/recipes';
+import { checkpoint, flushWrites, initDb } from './services/db';
+import { httpMetrics } from './services/metrics';
+import { warmLlmCaches } from './services/llmClient';
+import { flush as flushPersistentCache } from './services/persistentCache';
+import { initTranslationMemory } from './services/translationMemory';
+import { initRecipeCorpus, recipes as corpusRecipes } from './services/recipeCorpus';
+import { addAll as indexRecipeVectors } from './services/recipeVectors';
+import { getFavorites } from './services/favorites.service';
+import { startMaintenance, stopMaintenance } from './services/maintenance';
+import { runPrimary, workerCount } from './services/cluster';
 
 dotenv.config();
 
 const app = express();
 const PORT = process.env.PORT || 4000;
 
-app.use(cors());
+// Expose X-Cache so the browser client can tell fresh, stale and cached responses apart,
+// X-Next-Cursor so it can page through favorites, and ETag so it can revalidate AI responses.
+app.use(cors({ exposedHeaders: ['X-Cache', 'X-Next-Cursor', 'ETag'] }));
 app.use(express.json());
+app.use(httpMetrics);
 
 app.get('/health', (_req, res) => {
   res.json({ status: 'ok' });
@@ -21,6 +37,9 @@ app.get('/', (_req, res) => {
 });
 app.use('/ai', aiRoutes);
 app.use('/favorites', favoritesRoutes);
+app.use('/translate', translateRoutes);
+app.use('/recipes', recipesRoutes);
+app.use('/metrics', metricsRoutes);
 
 // Centralized error handler
 app.use((err: Error, _req: express.Request, res: express.Response, _next: express.NextFunction) => {
@@ -34,9 +53,37 @@ app.use((err: Error, _req: express.Request, res: express.Response, _next: expres
  */
 async function startServer() {
   await initDb();
+  const warmed = await warmLlmCaches();
+  console.log(`Warmed ${warmed} cached LLM responses from the database.`);
+  await initTranslationMemory();
+  const corpusSize = await initRecipeCorpus();
+  console.log(`Loaded ${corpusSize} recipes into the local recipe corpus.`);
+  const vectorCount = indexRecipeVectors([...corpusRecipes(), ...(await getFavorites())]);
+  console.log(`Indexed ${vectorCount} recipes for similarity search.`);
+  startMaintenance();
   app.listen(PORT, () => {
     console.log(`API server running on http://localhost:${PORT}`);
   });
 }
 
-startServer();
+// With CLUSTER_WORKERS > 1 (or 'auto') this process only supervises the workers; each worker
+// runs the whole API and the cluster module spreads connections across them.
+const WORKERS = workerCount();
+
+if (WORKERS > 1 && cluster.isPrimary) {
+  runPrimary(WORKERS);
+} else {
+  // Write any buffered cache entries and queued writes to disk before the process exits on deploy
+  // or Ctrl+C, and fold the WAL back into the database file.
+  for (const signal of ['SIGTERM', 'SIGINT'] as const) {
+    process.once(signal, async () => {
+      stopMaintenance();
+      await flushPersistentCache();
+      await flushWrites();
+      await checkpoint('TRUNCATE');
+      process.exit(0);
+    });
+  }
+
+  startServer();
+}
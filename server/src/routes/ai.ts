@@ -1,9 +1,38 @@
-import { Router } from 'express';
+import { Response, Router } from 'express';
 import { RecipeQuery, RecipeSuggestion } from '../types/recipes';
-import { generateRecipesFromLlama, generateRecipeDetailsFromGroq } from '../services/llmClient';
+import {
+  generateRecipesFromLlama,
+  generateRecipeDetailsFromGroq,
+  generateRecipeDetailsBatch,
+  streamRecipesFromLlama,
+  prefetchRecipeDetails,
+  LlmCallInfo,
+  RecipeDetailsBatchItem,
+} from '../services/llmClient';
+import { trackForeground } from '../services/prefetch';
+import { TIMEOUT_HEADER, deadlineFromTimeoutHeader, stats as transportStats } from '../services/groqTransport';
+import { sendJson } from '../services/httpCache';
+import { stats as llmUsageStats } from '../services/llmUsage';
+import { stats as promptStats } from '../services/prompts';
 
 const router = Router();
 
+// Groq transport state: in-flight calls, limiter tokens and rate, and queue depth / wait per lane.
+router.get('/transport/stats', (_req, res) => {
+  res.json(transportStats());
+});
+
+// Tokens, queue wait and upstream latency per LLM endpoint, plus the size and budget of each prompt.
+router.get('/usage', (_req, res) => {
+  res.json({ endpoints: llmUsageStats(), prompts: promptStats() });
+});
+
+// Count in-flight user requests so background prefetching can back off under load.
+router.use((_req, res, next) => {
+  res.on('close', trackForeground());
+  next();
+});
+
 router.post('/suggest-recipes', async (req, res) => {
   try {
     const body = req.body as RecipeQuery;
@@ -12,26 +41,119 @@ router.post('/suggest-recipes', async (req, res) => {
       return res.status(400).json({ message: 'ingredients[] is required' });
     }
 
-    const result = await generateRecipesFromLlama(body);
-    return res.json(result);
+    const info: LlmCallInfo = {};
+    const deadline = deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER));
+    const result = await generateRecipesFromLlama(body, info, { deadline });
+    res.set('X-Cache', (info.cacheStatus ?? 'miss').toUpperCase());
+    prefetchRecipeDetails(result.recipes);
+    // Sent with an ETag: the client may repeat the request with If-None-Match and gets a bodiless
+    // 304 when the (usually cached) result has not changed. This is a POST, so browsers never do
+    // that on their own; AiRecipeService does it explicitly. Results come from the LLM caches and
+    // are never mutated, so their encoded forms can be reused.
+    return await sendJson(req, res, result, { memoize: true });
   } catch (err: any) {
     console.error('Error in /ai/suggest-recipes:', err?.message || err);
     return res.status(500).json({ message: 'Failed to generate recipes' });
   }
 });
 
+/**
+ * Writes one server-sent event to the response.
+ * @param res - The response stream.
+ * @param event - The event name.
+ * @param data - The JSON-serializable payload.
+ */
+function sendEvent(res: Response, event: string, data: unknown): void {
+  res.write(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`);
+}
+
+// Streams suggestions as server-sent events: one 'recipe' event per recipe as soon as it is
+// generated, then a 'done' event (or an 'error' event if generation fails part-way).
+router.post('/suggest-recipes/stream', async (req, res) => {
+  const body = req.body as RecipeQuery;
+  if (!body.ingredients || !Array.isArray(body.ingredients) || body.ingredients.length === 0) {
+    return res.status(400).json({ message: 'ingredients[] is required' });
+  }
+
+  res.set({
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    Connection: 'keep-alive',
+  });
+  res.flushHeaders();
+
+  // Stop generating if the client goes away before the stream is complete.
+  const controller = new AbortController();
+  res.on('close', () => {
+    if (!res.writableEnded) controller.abort();
+  });
+
+  try {
+    const info: LlmCallInfo = {};
+    const result = await streamRecipesFromLlama(
+      body,
+      (recipe) => sendEvent(res, 'recipe', recipe),
+      info,
+      { deadline: deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER)), signal: controller.signal },
+    );
+    sendEvent(res, 'done', { count: result.recipes.length, cacheStatus: info.cacheStatus ?? 'miss' });
+    prefetchRecipeDetails(result.recipes);
+  } catch (err: any) {
+    console.error('Error in /ai/suggest-recipes/stream:', err?.message || err);
+    if (!controller.signal.aborted) {
+      sendEvent(res, 'error', { message: 'Failed to generate recipes' });
+    }
+  }
+  return res.end();
+});
+
 router.post('/recipe-details', async (req, res) => {
   try {
     const base = req.body as Partial<RecipeSuggestion>;
     if (!base || !base.id || !base.title) {
       return res.status(400).json({ message: 'id and title are required' });
     }
-    const detailed = await generateRecipeDetailsFromGroq(base as RecipeSuggestion);
-    return res.json(detailed);
+    const info: LlmCallInfo = {};
+    const detailed = await generateRecipeDetailsFromGroq(base as RecipeSuggestion, info, {
+      deadline: deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER)),
+    });
+    res.set('X-Cache', (info.cacheStatus ?? 'miss').toUpperCase());
+    // ETag and 304 handling as for /suggest-recipes.
+    return await sendJson(req, res, detailed, { memoize: true });
   } catch (err: any) {
     console.error('Error in /ai/recipe-details:', err?.message || err);
     return res.status(500).json({ message: 'Failed to generate recipe details' });
   }
 });
 
+const MAX_BATCH_SIZE = 20;
+
+// Enriches several recipes in one round-trip. The response holds one result per input recipe,
+// in order, each with status 'ok' (and the recipe) or 'error' (and a message).
+router.post('/recipe-details/batch', async (req, res) => {
+  try {
+    const bases = (Array.isArray(req.body) ? req.body : req.body?.recipes) as Partial<RecipeSuggestion>[];
+    if (!Array.isArray(bases) || bases.length === 0) {
+      return res.status(400).json({ message: 'recipes[] is required' });
+    }
+    if (bases.length > MAX_BATCH_SIZE) {
+      return res.status(400).json({ message: `At most ${MAX_BATCH_SIZE} recipes per batch` });
+    }
+
+    const valid = bases.filter((base) => base && base.id && base.title) as RecipeSuggestion[];
+    const deadline = deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER));
+    const enriched = await generateRecipeDetailsBatch(valid, { deadline });
+    let next = 0;
+    const results = bases.map((base): RecipeDetailsBatchItem =>
+      base && base.id && base.title
+        ? enriched[next++]
+        : { id: String(base?.id ?? ''), status: 'error', error: 'id and title are required' },
+    );
+    return await sendJson(req, res, { results });
+  } catch (err: any) {
+    console.error('Error in /ai/recipe-details/batch:', err?.message || err);
+    return res.status(500).json({ message: 'Failed to generate recipe details' });
+  }
+});
+
 export default router;
@@ -1,13 +1,38 @@
 import { Router } from 'express';
-import { getFavorites, addFavorite, removeFavorite } from '../services/favorites.service';
+import { getFavorites, getFavoritesPage, parseCursor, addFavorite, removeFavorite } from '../services/favorites.service';
+import { sendJson } from '../services/httpCache';
 import { RecipeSuggestion } from '../types/recipes';
 
 const router = Router();
 
-router.get('/', async (_req, res) => {
+const DEFAULT_PAGE_SIZE = 50;
+const MAX_PAGE_SIZE = 100;
+
+// Without query parameters every favorite is returned. With ?limit= (and ?after=<cursor> for later
+// pages) one page is returned, still as a plain array; X-Next-Cursor carries the cursor of the next
+// page and is absent on the last one. Responses carry an ETag, so clients can revalidate with
+// If-None-Match and get a 304 when nothing changed.
+router.get('/', async (req, res) => {
   try {
-    const favorites = await getFavorites();
-    res.json(favorites);
+    const { limit, after } = req.query;
+    if (limit === undefined && after === undefined) {
+      const favorites = await getFavorites();
+      return await sendJson(req, res, favorites);
+    }
+
+    const pageSize = limit === undefined ? DEFAULT_PAGE_SIZE : Number(limit);
+    if (!Number.isInteger(pageSize) || pageSize < 1 || pageSize > MAX_PAGE_SIZE) {
+      return res.status(400).json({ message: `limit must be an integer between 1 and ${MAX_PAGE_SIZE}` });
+    }
+    if (after !== undefined && (typeof after !== 'string' || !parseCursor(after))) {
+      return res.status(400).json({ message: 'Invalid cursor' });
+    }
+
+    const page = await getFavoritesPage(pageSize, after as string | undefined);
+    if (page.nextCursor) {
+      res.set('X-Next-Cursor', page.nextCursor);
+    }
+    await sendJson(req, res, page.favorites);
   } catch (err: any) {
     console.error('Error in GET /favorites:', err?.message || err);
     res.status(500).json({ message: 'Failed to get favorites' });
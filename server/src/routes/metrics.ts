@@ -0,0 +1,190 @@
+import { Router } from 'express';
+import { Sample, collect, render } from '../services/metrics';
+import * as cache from '../services/cache';
+import * as persistentCache from '../services/persistentCache';
+import * as translationMemory from '../services/translationMemory';
+import * as similarityIndex from '../services/similarityIndex';
+import * as recipeCorpus from '../services/recipeCorpus';
+import * as recipeVectors from '../services/recipeVectors';
+import * as recipeSearch from '../services/recipeSearch';
+import * as singleFlight from '../services/singleFlight';
+import * as prefetch from '../services/prefetch';
+import * as revalidator from '../services/revalidator';
+import * as groqTransport from '../services/groqTransport';
+import * as clusterService from '../services/cluster';
+import * as db from '../services/db';
+import * as maintenance from '../services/maintenance';
+import * as httpCache from '../services/httpCache';
+import * as llmUsage from '../services/llmUsage';
+import * as prompts from '../services/prompts';
+
+const router = Router();
+
+// Values the services already track are read when /metrics is scraped, not on the request path.
+
+collect('cache_requests_total', 'In-memory LLM cache lookups by result.', 'counter', () => {
+  const { hits, staleHits, misses } = cache.stats();
+  return [
+    [{ result: 'hit' }, hits],
+    [{ result: 'stale' }, staleHits],
+    [{ result: 'miss' }, misses],
+  ];
+});
+collect('cache_evictions_total', 'In-memory LLM cache entries removed, by reason.', 'counter', () => {
+  const { evictions, expirations } = cache.stats();
+  return [
+    [{ reason: 'capacity' }, evictions],
+    [{ reason: 'expired' }, expirations],
+  ];
+});
+collect('cache_entries', 'Entries in the in-memory LLM cache.', 'gauge', () => [[{}, cache.stats().entries]]);
+collect('cache_bytes', 'Approximate size of the in-memory LLM cache.', 'gauge', () => [[{}, cache.stats().bytes]]);
+
+collect('persistent_cache_requests_total', 'SQLite LLM cache lookups by result.', 'counter', () => {
+  const { hits, misses } = persistentCache.stats();
+  return [
+    [{ result: 'hit' }, hits],
+    [{ result: 'miss' }, misses],
+  ];
+});
+collect('persistent_cache_pending_writes', 'Cache entries waiting to be flushed to SQLite.', 'gauge', () => [
+  [{}, persistentCache.stats().pendingWrites],
+]);
+
+collect('translation_memory_requests_total', 'Translation memory lookups by language and result.', 'counter', () => {
+  const samples: Sample[] = [];
+  for (const [lang, counter] of Object.entries(translationMemory.stats().languages)) {
+    samples.push([{ lang, result: 'memory_hit' }, counter.memoryHits]);
+    samples.push([{ lang, result: 'disk_hit' }, counter.diskHits]);
+    samples.push([{ lang, result: 'miss' }, counter.misses]);
+  }
+  return samples;
+});
+collect('translation_memory_evictions_total', 'Translations evicted from the in-memory LRU.', 'counter', () => [
+  [{}, translationMemory.stats().memory.evictions],
+]);
+collect('translation_memory_entries', 'Translations held in memory.', 'gauge', () => [
+  [{}, translationMemory.stats().memory.entries],
+]);
+
+collect('similarity_lookups_total', 'Recipe query lookups by outcome.', 'counter', () => {
+  const { exactHits, similarHits, misses } = similarityIndex.stats();
+  return [
+    [{ outcome: 'exact' }, exactHits],
+    [{ outcome: 'similar' }, similarHits],
+    [{ outcome: 'miss' }, misses],
+  ];
+});
+collect('recipe_corpus_lookups_total', 'Suggestion queries looked up in the local recipe corpus, by result.', 'counter', () => {
+  const { hits, misses } = recipeCorpus.stats();
+  return [
+    [{ result: 'hit' }, hits],
+    [{ result: 'miss' }, misses],
+  ];
+});
+collect('recipe_corpus_recipes', 'Recipes in the local recipe corpus.', 'gauge', () => [[{}, recipeCorpus.stats().recipes]]);
+collect('recipe_vector_recipes', 'Recipes in the similarity index.', 'gauge', () => [[{}, recipeVectors.stats().recipes]]);
+collect('recipe_vector_bytes', 'Memory held by the similarity index vectors.', 'gauge', () => [[{}, recipeVectors.stats().bytes]]);
+collect('recipe_vector_queries_total', 'Similarity searches served.', 'counter', () => [[{}, recipeVectors.stats().queries]]);
+collect('recipe_search_queries_total', 'Full-text recipe searches served.', 'counter', () => [[{}, recipeSearch.stats().queries]]);
+collect('single_flight_calls_total', 'LLM calls that led a flight or joined one.', 'counter', () => {
+  const { leaders, coalesced } = singleFlight.stats();
+  return [
+    [{ role: 'leader' }, leaders],
+    [{ role: 'coalesced' }, coalesced],
+  ];
+});
+collect('prefetch_jobs_total', 'Speculative details prefetches by outcome.', 'counter', () => {
+  const { completed, skipped, failed, cancelled, used } = prefetch.stats();
+  return [
+    [{ outcome: 'completed' }, completed],
+    [{ outcome: 'skipped' }, skipped],
+    [{ outcome: 'failed' }, failed],
+    [{ outcome: 'cancelled' }, cancelled],
+    [{ outcome: 'used' }, used],
+  ];
+});
+collect('revalidations_total', 'Background refreshes of stale cache entries by outcome.', 'counter', () => {
+  const { succeeded, failed, dropped } = revalidator.stats();
+  return [
+    [{ outcome: 'succeeded' }, succeeded],
+    [{ outcome: 'failed' }, failed],
+    [{ outcome: 'dropped' }, dropped],
+  ];
+});
+
+collect('llm_queue_depth', 'Groq calls waiting for a slot or a token, by lane.', 'gauge', () =>
+  groqTransport.GROQ_LANES.map((lane): Sample => [{ lane }, groqTransport.stats().lanes[lane].queued]),
+);
+collect('llm_queue_wait_seconds_total', 'Total time Groq calls spent queued, by lane.', 'counter', () =>
+  groqTransport.GROQ_LANES.map((lane): Sample => [{ lane }, groqTransport.stats().lanes[lane].totalWaitMs / 1000]),
+);
+collect('llm_in_flight', 'Groq calls currently in flight.', 'gauge', () => [[{}, groqTransport.stats().inFlight]]);
+collect('llm_rate_per_minute', 'Current Groq request rate allowed by the adaptive limiter.', 'gauge', () => [
+  [{}, groqTransport.stats().ratePerMinute],
+]);
+
+collect('llm_endpoint_tokens_total', 'Tokens used per LLM endpoint (estimated when Groq reports none), by kind.', 'counter', () =>
+  Object.entries(llmUsage.stats()).flatMap(([endpoint, usage]): Sample[] => [
+    [{ endpoint, kind: 'prompt' }, usage.promptTokens],
+    [{ endpoint, kind: 'completion' }, usage.completionTokens],
+  ]),
+);
+collect('llm_prompt_static_tokens', 'Estimated tokens in the static part of each prompt template.', 'gauge', () =>
+  prompts.stats().map((prompt): Sample => [{ prompt: prompt.name }, prompt.staticTokens]),
+);
+collect('llm_prompt_over_budget_total', 'Prompts whose estimated size exceeded their template budget.', 'counter', () =>
+  prompts.stats().map((prompt): Sample => [{ prompt: prompt.name }, prompt.overBudget]),
+);
+
+collect('cluster_flights_total', 'LLM calls coalesced across cluster workers, by role.', 'counter', () => {
+  const { led, joined, fallbacks } = clusterService.stats();
+  return [
+    [{ role: 'leader' }, led],
+    [{ role: 'joined' }, joined],
+    [{ role: 'fallback' }, fallbacks],
+  ];
+});
+
+collect('sqlite_write_batches_total', 'Transactions committed by the SQLite write queue.', 'counter', () => [
+  [{}, db.stats().writeBatches],
+]);
+collect('sqlite_pending_writes', 'Writes waiting in the SQLite write queue.', 'gauge', () => [[{}, db.stats().pendingWrites]]);
+collect('sqlite_errors_total', 'Failed SQLite queries and write batches.', 'counter', () => [[{}, db.stats().errors]]);
+collect('sqlite_wal_frames_pending', 'WAL frames not copied back by the last checkpoint.', 'gauge', () => [
+  [{}, db.stats().walFramesPending],
+]);
+
+collect('maintenance_runs_total', 'Maintenance job runs by job and outcome.', 'counter', () =>
+  Object.entries(maintenance.stats()).flatMap(([job, { runs, failures }]): Sample[] => [
+    [{ job, outcome: 'ok' }, runs - failures],
+    [{ job, outcome: 'failed' }, failures],
+  ]),
+);
+collect('maintenance_duration_seconds_total', 'Total time spent in each maintenance job.', 'counter', () =>
+  Object.entries(maintenance.stats()).map(([job, { totalDurationMs }]): Sample => [{ job }, totalDurationMs / 1000]),
+);
+collect('maintenance_last_duration_seconds', 'Duration of the last run of each maintenance job.', 'gauge', () =>
+  Object.entries(maintenance.stats()).map(([job, { lastDurationMs }]): Sample => [{ job }, lastDurationMs / 1000]),
+);
+collect('maintenance_removed_total', 'Rows or cache entries removed by each maintenance job.', 'counter', () =>
+  Object.entries(maintenance.stats()).map(([job, { totalRemoved }]): Sample => [{ job }, totalRemoved]),
+);
+
+collect('http_not_modified_total', 'Responses answered with 304 Not Modified.', 'counter', () => [
+  [{}, httpCache.stats().notModified],
+]);
+collect('http_response_bytes_total', 'JSON response body bytes before and after compression.', 'counter', () => {
+  const { bytesIn, bytesOut } = httpCache.stats();
+  return [
+    [{ stage: 'uncompressed' }, bytesIn],
+    [{ stage: 'sent' }, bytesOut],
+  ];
+});
+
+router.get('/', (_req, res) => {
+  res.type('text/plain; version=0.0.4');
+  res.send(render());
+});
+
+export default router;
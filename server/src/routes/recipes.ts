@@ -0,0 +1,112 @@
+import { Router } from 'express';
+import { findSimilar, get, MAX_RESULTS } from '../services/recipeVectors';
+import { MAX_SEARCH_LIMIT, MAX_SEARCH_OFFSET, searchRecipes } from '../services/recipeSearch';
+import { sendJson } from '../services/httpCache';
+import { RecipeSuggestion } from '../types/recipes';
+
+const router = Router();
+
+const DEFAULT_RESULTS = 10;
+const DEFAULT_SEARCH_LIMIT = 20;
+const DIFFICULTIES = ['easy', 'medium', 'hard'];
+
+/**
+ * Parses the ?k= query parameter.
+ * @param value - The raw parameter.
+ * @returns The number of results, or undefined if the value is invalid.
+ */
+function parseK(value: unknown): number | undefined {
+  if (value === undefined) return DEFAULT_RESULTS;
+  const k = Number(value);
+  return Number.isInteger(k) && k >= 1 && k <= MAX_RESULTS ? k : undefined;
+}
+
+// Recipes similar to an indexed recipe (generated or favorited), by id:
+// GET /recipes/similar?id=<recipe id>&k=10. Returns { results: [{ recipe, score }] }, best first.
+router.get('/similar', async (req, res) => {
+  try {
+    const { id } = req.query;
+    const k = parseK(req.query.k);
+    if (typeof id !== 'string' || !id) {
+      return res.status(400).json({ message: 'id is required' });
+    }
+    if (k === undefined) {
+      return res.status(400).json({ message: `k must be an integer between 1 and ${MAX_RESULTS}` });
+    }
+
+    const recipe = get(id);
+    if (!recipe) {
+      return res.status(404).json({ message: 'Recipe not found' });
+    }
+    await sendJson(req, res, { results: findSimilar(recipe, k) });
+  } catch (err: any) {
+    console.error('Error in GET /recipes/similar:', err?.message || err);
+    res.status(500).json({ message: 'Failed to find similar recipes' });
+  }
+});
+
+// Recipes similar to a recipe sent in the body, which does not have to be indexed.
+router.post('/similar', async (req, res) => {
+  try {
+    const recipe = req.body as Partial<RecipeSuggestion>;
+    const k = parseK(req.query.k);
+    if (!recipe || !recipe.title) {
+      return res.status(400).json({ message: 'title is required' });
+    }
+    if (k === undefined) {
+      return res.status(400).json({ message: `k must be an integer between 1 and ${MAX_RESULTS}` });
+    }
+    await sendJson(req, res, { results: findSimilar(recipe, k) });
+  } catch (err: any) {
+    console.error('Error in POST /recipes/similar:', err?.message || err);
+    res.status(500).json({ message: 'Failed to find similar recipes' });
+  }
+});
+
+/**
+ * Reads an optional string query parameter.
+ */
+function optionalString(value: unknown): string | undefined {
+  return typeof value === 'string' && value.trim() ? value.trim() : undefined;
+}
+
+// Full-text search over stored recipes (favorites and the recipe corpus):
+// GET /recipes/search?q=&category=&cuisine=&difficulty=&vegetarian=&limit=&offset=
+// Returns { results, total, nextOffset, facets: { cuisine, difficulty, vegetarian } }.
+router.get('/search', async (req, res) => {
+  try {
+    const { vegetarian } = req.query;
+    const limit = req.query.limit === undefined ? DEFAULT_SEARCH_LIMIT : Number(req.query.limit);
+    const offset = req.query.offset === undefined ? 0 : Number(req.query.offset);
+    const difficulty = optionalString(req.query.difficulty);
+
+    if (!Number.isInteger(limit) || limit < 1 || limit > MAX_SEARCH_LIMIT) {
+      return res.status(400).json({ message: `limit must be an integer between 1 and ${MAX_SEARCH_LIMIT}` });
+    }
+    if (!Number.isInteger(offset) || offset < 0 || offset > MAX_SEARCH_OFFSET) {
+      return res.status(400).json({ message: `offset must be an integer between 0 and ${MAX_SEARCH_OFFSET}` });
+    }
+    if (difficulty && !DIFFICULTIES.includes(difficulty)) {
+      return res.status(400).json({ message: `difficulty must be one of ${DIFFICULTIES.join(', ')}` });
+    }
+    if (vegetarian !== undefined && vegetarian !== 'true' && vegetarian !== 'false') {
+      return res.status(400).json({ message: 'vegetarian must be true or false' });
+    }
+
+    const result = await searchRecipes({
+      q: optionalString(req.query.q),
+      category: optionalString(req.query.category),
+      cuisine: optionalString(req.query.cuisine),
+      difficulty,
+      vegetarian: vegetarian === undefined ? undefined : vegetarian === 'true',
+      limit,
+      offset,
+    });
+    await sendJson(req, res, result);
+  } catch (err: any) {
+    console.error('Error in GET /recipes/search:', err?.message || err);
+    res.status(500).json({ message: 'Failed to search recipes' });
+  }
+});
+
+export default router;
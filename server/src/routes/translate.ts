@@ -0,0 +1,85 @@
+import { Router } from 'express';
+import {
+  translateText,
+  translateBatch,
+  TranslationLanguage,
+  TRANSLATION_LANGUAGES,
+} from '../services/llmClient';
+import { exportJsonl, stats as translationMemoryStats } from '../services/translationMemory';
+import { TIMEOUT_HEADER, deadlineFromTimeoutHeader } from '../services/groqTransport';
+
+const router = Router();
+
+const MAX_BATCH_SIZE = 200;
+
+/**
+ * Checks that a requested target language is supported.
+ * @param lang - The requested language code.
+ * @returns True for 'en', 'hi' and 'mr'.
+ */
+function isSupportedLanguage(lang: unknown): lang is TranslationLanguage {
+  return TRANSLATION_LANGUAGES.includes(lang as TranslationLanguage);
+}
+
+router.post('/', async (req, res) => {
+  try {
+    const { text, targetLang } = req.body ?? {};
+    if (typeof text !== 'string') {
+      return res.status(400).json({ message: 'text is required' });
+    }
+    if (!isSupportedLanguage(targetLang)) {
+      return res.status(400).json({ message: `targetLang must be one of ${TRANSLATION_LANGUAGES.join(', ')}` });
+    }
+
+    const translation = await translateText(text, targetLang, {
+      deadline: deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER)),
+    });
+    return res.json({ translation });
+  } catch (err: any) {
+    console.error('Error in /translate:', err?.message || err);
+    return res.status(500).json({ message: 'Failed to translate text' });
+  }
+});
+
+// Translates many strings in one request. The response holds one result per input string,
+// in input order, each with status 'ok' (and the translation) or 'error' (and a message).
+router.post('/batch', async (req, res) => {
+  try {
+    const { texts, targetLang } = req.body ?? {};
+    if (!Array.isArray(texts) || texts.length === 0 || texts.some((text) => typeof text !== 'string')) {
+      return res.status(400).json({ message: 'texts[] of strings is required' });
+    }
+    if (texts.length > MAX_BATCH_SIZE) {
+      return res.status(400).json({ message: `At most ${MAX_BATCH_SIZE} texts per batch` });
+    }
+    if (!isSupportedLanguage(targetLang)) {
+      return res.status(400).json({ message: `targetLang must be one of ${TRANSLATION_LANGUAGES.join(', ')}` });
+    }
+
+    const results = await translateBatch(texts, targetLang, {
+      deadline: deadlineFromTimeoutHeader(req.get(TIMEOUT_HEADER)),
+    });
+    return res.json({ results });
+  } catch (err: any) {
+    console.error('Error in /translate/batch:', err?.message || err);
+    return res.status(500).json({ message: 'Failed to translate texts' });
+  }
+});
+
+// Downloads the translation memory as JSON Lines, for shipping a warmed memory with a deploy
+// (load it at startup with TRANSLATION_MEMORY_SEED=<file>).
+router.get('/memory/export', async (_req, res) => {
+  try {
+    res.type('application/x-ndjson');
+    res.send(await exportJsonl());
+  } catch (err: any) {
+    console.error('Error in GET /translate/memory/export:', err?.message || err);
+    res.status(500).json({ message: 'Failed to export translation memory' });
+  }
+});
+
+router.get('/memory/stats', (_req, res) => {
+  res.json(translationMemoryStats());
+});
+
+export default router;
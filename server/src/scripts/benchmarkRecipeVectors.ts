@@ -0,0 +1,133 @@
+import { addAll, findSimilar, stats } from '../services/recipeVectors';
+import { RecipeSuggestion } from '../types/recipes';
+
+// Benchmarks the recipe similarity index on synthetic recipes: build time, memory and query
+// latency percentiles. Exits non-zero when the p95 query latency exceeds --budget-ms.
+//
+//   npm run bench:vectors -- --recipes 100000 --queries 1000 --k 10 --budget-ms 10
+
+const INGREDIENTS = [
+  'rice', 'basmati rice', 'toor dal', 'moong dal', 'chana dal', 'urad dal', 'masoor dal', 'rajma',
+  'chickpeas', 'paneer', 'curd', 'milk', 'cream', 'butter', 'ghee', 'onion', 'tomato', 'potato',
+  'cauliflower', 'cabbage', 'spinach', 'fenugreek leaves', 'peas', 'carrot', 'beans', 'okra',
+  'brinjal', 'bottle gourd', 'capsicum', 'mushroom', 'corn', 'coconut', 'garlic', 'ginger',
+  'green chilli', 'red chilli powder', 'coriander leaves', 'mint', 'curry leaves', 'mustard seeds',
+  'cumin seeds', 'turmeric', 'garam masala', 'kasuri methi', 'tamarind', 'jaggery', 'lemon',
+  'chicken', 'mutton', 'fish', 'prawns', 'egg', 'wheat flour', 'gram flour', 'semolina', 'poha',
+  'vermicelli', 'bread', 'cashews', 'raisins', 'cardamom', 'saffron', 'sugar', 'oil', 'salt',
+];
+const DISHES = [
+  'curry', 'masala', 'dal', 'pulao', 'biryani', 'khichdi', 'sabzi', 'paratha', 'tikka', 'korma',
+  'kheer', 'halwa', 'upma', 'dosa', 'idli', 'chaat', 'kebab', 'raita', 'soup', 'bhaji', 'fry',
+];
+const STYLES = ['spicy', 'creamy', 'quick', 'home style', 'dhaba', 'tangy', 'smoky', 'light', 'festive'];
+const CUISINES = [
+  'Punjabi', 'Gujarati', 'Maharashtrian', 'Bengali', 'South Indian', 'Kerala', 'Rajasthani',
+  'Hyderabadi', 'Kashmiri', 'Goan', 'Mughlai', 'Chettinad',
+];
+const TAGS = ['vegetarian', 'high protein', 'one pot', 'kids', 'breakfast', 'dinner', 'festive', 'healthy', 'quick'];
+
+/**
+ * Returns the value of a `--name value` command line option.
+ */
+function option(name: string, fallback: number): number {
+  const index = process.argv.indexOf(`--${name}`);
+  const value = index >= 0 ? Number(process.argv[index + 1]) : NaN;
+  return Number.isFinite(value) && value > 0 ? value : fallback;
+}
+
+/**
+ * Small deterministic PRNG (mulberry32) so runs are comparable.
+ */
+function createRandom(seed: number): () => number {
+  let state = seed >>> 0;
+  return () => {
+    state = (state + 0x6d2b79f5) >>> 0;
+    let t = state;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+/**
+ * Builds one synthetic recipe.
+ */
+function syntheticRecipe(id: number, random: () => number): RecipeSuggestion {
+  const pick = <T>(items: T[]): T => items[Math.floor(random() * items.length)];
+  const ingredients = new Set<string>();
+  const ingredientCount = 5 + Math.floor(random() * 8);
+  while (ingredients.size < ingredientCount) ingredients.add(pick(INGREDIENTS));
+  const main = [...ingredients][0];
+
+  return {
+    id: `bench-${id}`,
+    title: `${pick(STYLES)} ${main} ${pick(DISHES)}`,
+    shortDescription: '',
+    cuisineRegion: pick(CUISINES),
+    isVegetarian: random() < 0.7,
+    tags: [pick(TAGS), pick(TAGS)],
+    estimatedTimeMinutes: 10 + Math.floor(random() * 80),
+    difficulty: 'easy',
+    ingredients: [...ingredients].map((name) => ({ name, quantity: '1 cup', isFromUserKitchen: false })),
+    steps: [],
+    tips: [],
+  };
+}
+
+/**
+ * Returns a percentile of an ascending list of latencies.
+ */
+function percentile(sorted: number[], p: number): number {
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))];
+}
+
+function main(): void {
+  const recipeCount = option('recipes', 100000);
+  const queryCount = option('queries', 1000);
+  const k = option('k', 10);
+  const budgetMs = option('budget-ms', 10);
+  const random = createRandom(option('seed', 42));
+
+  const recipes = Array.from({ length: recipeCount }, (_, i) => syntheticRecipe(i, random));
+  const heapBefore = process.memoryUsage().heapUsed;
+  const buildStart = performance.now();
+  addAll(recipes);
+  const buildMs = performance.now() - buildStart;
+
+  // Warm up the JIT before measuring.
+  for (let i = 0; i < 20; i++) findSimilar(recipes[i], k);
+
+  const latencies: number[] = [];
+  for (let i = 0; i < queryCount; i++) {
+    const query = recipes[Math.floor(random() * recipes.length)];
+    const start = performance.now();
+    findSimilar(query, k);
+    latencies.push(performance.now() - start);
+  }
+  latencies.sort((a, b) => a - b);
+
+  const index = stats();
+  const report = {
+    recipes: index.recipes,
+    dimensions: index.dimensions,
+    buildMs: Math.round(buildMs),
+    vectorBytes: index.bytes,
+    heapGrowthBytes: process.memoryUsage().heapUsed - heapBefore,
+    queries: queryCount,
+    k,
+    p50Ms: Number(percentile(latencies, 0.5).toFixed(3)),
+    p95Ms: Number(percentile(latencies, 0.95).toFixed(3)),
+    p99Ms: Number(percentile(latencies, 0.99).toFixed(3)),
+    maxMs: Number(latencies[latencies.length - 1].toFixed(3)),
+    budgetMs,
+  };
+  console.log(JSON.stringify(report, null, 2));
+
+  if (report.p95Ms > budgetMs) {
+    console.error(`p95 query latency ${report.p95Ms} ms exceeds the budget of ${budgetMs} ms.`);
+    process.exit(1);
+  }
+}
+
+main();
@@ -1,44 +1,330 @@
-// This service provides a simple in-memory cache with a Time-to-Live (TTL) for each entry.
+// This service provides a bounded in-memory LRU cache with per-entry Time-to-Live (TTL).
 // It is used to cache results from the AI service to improve performance and reduce API costs.
+// Entries are evicted when the cache exceeds its entry count or approximate byte budget,
+// and a background sweeper removes expired entries even if nobody reads them again.
+// Each entry has a soft TTL, after which it is stale but can still be served while it is
+// revalidated, and a hard TTL, after which it is gone.
 
 interface CacheEntry<T> {
   data: T;
-  timestamp: number;
+  staleAt: number;
+  expiresAt: number;
+  bytes: number;
 }
 
-const cache = new Map<string, CacheEntry<any>>();
-const TTL = 1000 * 60 * 60; // 1 hour
+export interface CacheLookup<T> {
+  data: T;
+  /** True once the soft TTL has passed; the caller should serve it and revalidate. */
+  stale: boolean;
+}
+
+export interface CacheOptions {
+  /** Maximum number of entries kept before the least recently used one is evicted. */
+  maxEntries: number;
+  /** Approximate upper bound on the memory used by cached values, in bytes. */
+  maxBytes: number;
+  /** Soft TTL applied when `set` is called without an explicit one. */
+  defaultTtlMs: number;
+  /** How long past its soft TTL an entry may still be served as stale. 0 disables stale serving. */
+  maxStaleMs: number;
+  /** How often expired entries are actively removed. Use 0 to disable the sweeper. */
+  sweepIntervalMs: number;
+}
+
+export interface CacheStats {
+  hits: number;
+  staleHits: number;
+  misses: number;
+  evictions: number;
+  expirations: number;
+  entries: number;
+  bytes: number;
+}
+
+/**
+ * Estimates how much memory a cached value occupies.
+ * JSON length is a cheap, stable approximation for the plain objects we cache.
+ * @param key - The cache key.
+ * @param data - The value being cached.
+ * @returns The approximate size in bytes.
+ */
+function estimateBytes(key: string, data: unknown): number {
+  let serialized: string | undefined;
+  try {
+    serialized = typeof data === 'string' ? data : JSON.stringify(data);
+  } catch {
+    serialized = undefined;
+  }
+  // JS strings are UTF-16, so each code unit costs roughly two bytes.
+  return (key.length + (serialized?.length ?? 0)) * 2;
+}
+
+/**
+ * A least-recently-used cache bounded by entry count and approximate byte size.
+ * A `Map` keeps insertion order, so re-inserting on access moves an entry to the
+ * most recently used end and the first key is always the eviction candidate.
+ */
+export class LruCache<T = any> {
+  private readonly entries = new Map<string, CacheEntry<T>>();
+  private readonly options: CacheOptions;
+  private sweeper?: NodeJS.Timeout;
+  private totalBytes = 0;
+  private hits = 0;
+  private staleHits = 0;
+  private misses = 0;
+  private evictions = 0;
+  private expirations = 0;
+
+  constructor(options: Partial<CacheOptions> = {}) {
+    this.options = {
+      maxEntries: options.maxEntries ?? 500,
+      maxBytes: options.maxBytes ?? 50 * 1024 * 1024,
+      defaultTtlMs: options.defaultTtlMs ?? 1000 * 60 * 60,
+      maxStaleMs: options.maxStaleMs ?? 0,
+      sweepIntervalMs: options.sweepIntervalMs ?? 1000 * 60,
+    };
+    this.startSweeper();
+  }
+
+  /**
+   * Retrieves a fresh entry and marks it as most recently used.
+   * Stale entries are kept for `lookup` callers but reported here as a miss.
+   * @param key - The key of the entry to retrieve.
+   * @returns The cached data or undefined if the entry does not exist, is stale or is expired.
+   */
+  get(key: string): T | undefined {
+    const entry = this.touch(key);
+    if (!entry || entry.staleAt <= Date.now()) {
+      this.misses++;
+      return undefined;
+    }
+    this.hits++;
+    return entry.data;
+  }
+
+  /**
+   * Retrieves an entry, fresh or stale, and marks it as most recently used.
+   * @param key - The key of the entry to retrieve.
+   * @returns The cached data with its staleness, or undefined if absent or past its hard TTL.
+   */
+  lookup(key: string): CacheLookup<T> | undefined {
+    const entry = this.touch(key);
+    if (!entry) {
+      this.misses++;
+      return undefined;
+    }
+    const stale = entry.staleAt <= Date.now();
+    if (stale) this.staleHits++;
+    else this.hits++;
+    return { data: entry.data, stale };
+  }
+
+  /**
+   * Adds or updates an entry, evicting least recently used entries if over budget.
+   * Values larger than the whole byte budget are not cached at all.
+   * @param key - The key of the entry to set.
+   * @param data - The data to cache.
+   * @param ttlMs - Optional soft TTL for this entry; defaults to the cache-wide TTL.
+   * @param hardTtlMs - Optional hard TTL; defaults to the soft TTL plus `maxStaleMs`.
+   */
+  set(key: string, data: T, ttlMs = this.options.defaultTtlMs, hardTtlMs = ttlMs + this.options.maxStaleMs): void {
+    const existing = this.entries.get(key);
+    if (existing) {
+      this.remove(key, existing);
+    }
+
+    const bytes = estimateBytes(key, data);
+    if (bytes > this.options.maxBytes) {
+      return;
+    }
+
+    const now = Date.now();
+    this.entries.set(key, {
+      data,
+      staleAt: now + ttlMs,
+      expiresAt: now + Math.max(ttlMs, hardTtlMs),
+      bytes,
+    });
+    this.totalBytes += bytes;
+    this.evictOverflow();
+  }
+
+  /**
+   * Checks for a fresh entry without counting a hit or miss or changing its LRU position.
+   * @param key - The key to check.
+   * @returns True if a fresh entry exists.
+   */
+  has(key: string): boolean {
+    const entry = this.entries.get(key);
+    return !!entry && entry.staleAt > Date.now();
+  }
+
+  /**
+   * Removes an entry from the cache.
+   * @param key - The key of the entry to remove.
+   * @returns True if an entry was removed.
+   */
+  delete(key: string): boolean {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.remove(key, entry);
+    return true;
+  }
+
+  /**
+   * Removes every entry whose TTL has passed.
+   * @returns The number of entries removed.
+   */
+  sweep(): number {
+    const now = Date.now();
+    let removed = 0;
+    for (const [key, entry] of this.entries) {
+      if (entry.expiresAt <= now) {
+        this.remove(key, entry);
+        removed++;
+      }
+    }
+    this.expirations += removed;
+    return removed;
+  }
+
+  /** Removes all entries. Counters are kept. */
+  clear(): void {
+    this.entries.clear();
+    this.totalBytes = 0;
+  }
+
+  /**
+   * Returns a snapshot of the cache counters and current size.
+   * @returns The current cache statistics.
+   */
+  stats(): CacheStats {
+    return {
+      hits: this.hits,
+      staleHits: this.staleHits,
+      misses: this.misses,
+      evictions: this.evictions,
+      expirations: this.expirations,
+      entries: this.entries.size,
+      bytes: this.totalBytes,
+    };
+  }
+
+  /** Stops the background sweeper, e.g. during shutdown. */
+  stopSweeper(): void {
+    if (this.sweeper) {
+      clearInterval(this.sweeper);
+      this.sweeper = undefined;
+    }
+  }
+
+  private startSweeper(): void {
+    if (this.options.sweepIntervalMs <= 0) return;
+    this.sweeper = setInterval(() => this.sweep(), this.options.sweepIntervalMs);
+    // Do not keep the process alive just for the sweeper.
+    this.sweeper.unref();
+  }
+
+  /**
+   * Finds a live entry and moves it to the most recently used end.
+   * Entries past their hard TTL are removed.
+   */
+  private touch(key: string): CacheEntry<T> | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+
+    if (entry.expiresAt <= Date.now()) {
+      this.remove(key, entry);
+      this.expirations++;
+      return undefined;
+    }
+
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry;
+  }
+
+  private remove(key: string, entry: CacheEntry<T>): void {
+    this.entries.delete(key);
+    this.totalBytes -= entry.bytes;
+  }
+
+  private evictOverflow(): void {
+    while (
+      this.entries.size > this.options.maxEntries ||
+      this.totalBytes > this.options.maxBytes
+    ) {
+      const oldestKey = this.entries.keys().next().value as string | undefined;
+      if (oldestKey === undefined) break;
+      this.remove(oldestKey, this.entries.get(oldestKey)!);
+      this.evictions++;
+    }
+  }
+}
+
+export const DEFAULT_TTL_MS = Number(process.env.CACHE_TTL_MS) || 1000 * 60 * 60; // 1 hour
+export const MAX_STALE_MS = Number(process.env.CACHE_MAX_STALE_MS) || 1000 * 60 * 60 * 6; // 6 hours
+
+const cache = new LruCache({
+  maxEntries: Number(process.env.CACHE_MAX_ENTRIES) || undefined,
+  maxBytes: Number(process.env.CACHE_MAX_BYTES) || undefined,
+  defaultTtlMs: DEFAULT_TTL_MS,
+  maxStaleMs: MAX_STALE_MS,
+  // Swept by the maintenance scheduler instead, so its runs are timed and reported.
+  sweepIntervalMs: 0,
+});
 
 /**
- * Retrieves an entry from the cache.
+ * Retrieves a fresh entry from the shared cache.
  * If the entry is expired, it is removed from the cache and undefined is returned.
  * @param key - The key of the entry to retrieve.
- * @returns The cached data or undefined if the entry does not exist or is expired.
+ * @returns The cached data or undefined if the entry does not exist, is stale or is expired.
  */
 export function get<T>(key: string): T | undefined {
-  const entry = cache.get(key);
-  if (!entry) {
-    return undefined;
-  }
+  return cache.get(key) as T | undefined;
+}
 
-  const isExpired = Date.now() - entry.timestamp > TTL;
-  if (isExpired) {
-    cache.delete(key);
-    return undefined;
-  }
+/**
+ * Retrieves an entry from the shared cache even if it is stale, for stale-while-revalidate callers.
+ * @param key - The key of the entry to retrieve.
+ * @returns The cached data and whether it is stale, or undefined if the entry is gone.
+ */
+export function lookup<T>(key: string): CacheLookup<T> | undefined {
+  return cache.lookup(key) as CacheLookup<T> | undefined;
+}
 
-  return entry.data as T;
+/**
+ * Checks whether the shared cache holds a fresh entry, without affecting its statistics.
+ * @param key - The key to check.
+ * @returns True if a fresh entry exists.
+ */
+export function has(key: string): boolean {
+  return cache.has(key);
 }
 
 /**
- * Adds or updates an entry in the cache.
+ * Adds or updates an entry in the shared cache.
  * @param key - The key of the entry to set.
  * @param data - The data to cache.
+ * @param ttlMs - Optional soft TTL for this entry; defaults to DEFAULT_TTL_MS.
+ * @param hardTtlMs - Optional hard TTL; defaults to the soft TTL plus MAX_STALE_MS.
+ */
+export function set<T>(key: string, data: T, ttlMs?: number, hardTtlMs?: number): void {
+  cache.set(key, data, ttlMs, hardTtlMs);
+}
+
+/**
+ * Removes expired entries from the shared cache.
+ * @returns The number of entries removed.
+ */
+export function sweep(): number {
+  return cache.sweep();
+}
+
+/**
+ * Returns hit/miss/eviction counters and the current size of the shared cache.
+ * @returns The current cache statistics.
  */
-export function set<T>(key: string, data: T): void {
-  const entry: CacheEntry<T> = {
-    data,
-    timestamp: Date.now(),
-  };
-  cache.set(key, entry);
+export function stats(): CacheStats {
+  return cache.stats();
 }
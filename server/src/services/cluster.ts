@@ -0,0 +1,266 @@
+import cluster, { Worker } from 'cluster';
+import os from 'os';
+
+// This service runs the API on several cores. The primary process forks CLUSTER_WORKERS workers
+// (Node's cluster module spreads incoming connections across them), restarts any worker that
+// exits unexpectedly, and relays messages between workers over IPC so that:
+//  - an LLM result cached by one worker is pushed into every other worker's in-memory cache
+//    (the SQLite tier is shared by all workers anyway, so a restarted worker still comes up warm);
+//  - identical LLM calls in different workers are coalesced: the primary grants one worker the
+//    lead for a key and hands its result to every other worker waiting on the same key.
+// Outside cluster mode every helper here is a no-op or calls straight through.
+
+const RESTART_DELAY_MS = 1000;
+const MAX_RESTART_DELAY_MS = 30000;
+// A worker that dies sooner than this after starting is treated as crash-looping and restarted more slowly.
+const MIN_HEALTHY_UPTIME_MS = 10000;
+const FLIGHT_WAIT_MS = Number(process.env.CLUSTER_FLIGHT_WAIT_MS) || 60000;
+
+type ClusterMessage =
+  | { type: 'cache-set'; key: string; data: unknown }
+  | { type: 'flight-acquire'; id: number; key: string }
+  | { type: 'flight-grant'; id: number; role: 'leader' | 'fallback' }
+  | { type: 'flight-done'; key: string; ok: boolean; data?: unknown; error?: string; code?: string }
+  | { type: 'flight-result'; id: number; ok: boolean; data?: unknown; error?: string; code?: string };
+
+export interface ClusterStats {
+  /** Cross-worker flights this worker led. */
+  led: number;
+  /** Calls answered by another worker's flight. */
+  joined: number;
+  /** Calls that ran locally because the leader died, took too long or ran out of time. */
+  fallbacks: number;
+  cacheBroadcasts: number;
+  cacheUpdatesReceived: number;
+}
+
+const counters = { led: 0, joined: 0, fallbacks: 0, cacheBroadcasts: 0, cacheUpdatesReceived: 0 };
+
+/**
+ * Number of workers requested by CLUSTER_WORKERS ('auto' uses every available core).
+ * @returns The worker count; 1 means cluster mode is off.
+ */
+export function workerCount(): number {
+  const setting = process.env.CLUSTER_WORKERS;
+  if (setting === 'auto') {
+    return os.availableParallelism();
+  }
+  return Math.max(1, Number(setting) || 1);
+}
+
+/**
+ * Whether this process is a worker of a running cluster.
+ */
+export function isClusterWorker(): boolean {
+  return cluster.isWorker && typeof process.send === 'function';
+}
+
+// ---------------------------------------------------------------------------------------------
+// Primary process
+
+/**
+ * Forks the workers and keeps them running until the primary receives SIGTERM or SIGINT.
+ * @param count - The number of workers to run.
+ */
+export function runPrimary(count: number): void {
+  // key -> leading worker and the requests waiting on it
+  const flights = new Map<string, { leader: number; waiters: Array<{ worker: Worker; id: number }> }>();
+  const startedAt = new Map<number, number>();
+  let restartDelay = RESTART_DELAY_MS;
+  let shuttingDown = false;
+
+  const fork = () => {
+    const worker = cluster.fork();
+    startedAt.set(worker.id, Date.now());
+    worker.on('message', (message: ClusterMessage) => onWorkerMessage(worker, message));
+  };
+
+  const onWorkerMessage = (worker: Worker, message: ClusterMessage) => {
+    switch (message?.type) {
+      case 'cache-set':
+        for (const other of Object.values(cluster.workers ?? {})) {
+          if (other && other !== worker && other.isConnected()) other.send(message);
+        }
+        break;
+      case 'flight-acquire': {
+        const flight = flights.get(message.key);
+        if (flight) {
+          flight.waiters.push({ worker, id: message.id });
+        } else {
+          flights.set(message.key, { leader: worker.id, waiters: [] });
+          worker.send({ type: 'flight-grant', id: message.id, role: 'leader' });
+        }
+        break;
+      }
+      case 'flight-done': {
+        const flight = flights.get(message.key);
+        if (!flight || flight.leader !== worker.id) break;
+        flights.delete(message.key);
+        for (const waiter of flight.waiters) {
+          if (waiter.worker.isConnected()) {
+            waiter.worker.send({
+              type: 'flight-result',
+              id: waiter.id,
+              ok: message.ok,
+              data: message.data,
+              error: message.error,
+              code: message.code,
+            });
+          }
+        }
+        break;
+      }
+      default:
+        break;
+    }
+  };
+
+  cluster.on('exit', (worker, code, signal) => {
+    const uptime = Date.now() - (startedAt.get(worker.id) ?? Date.now());
+    startedAt.delete(worker.id);
+
+    // Anyone waiting on a flight led by the dead worker runs the call itself.
+    for (const [key, flight] of flights) {
+      flight.waiters = flight.waiters.filter((waiter) => waiter.worker !== worker);
+      if (flight.leader !== worker.id) continue;
+      flights.delete(key);
+      for (const waiter of flight.waiters) {
+        if (waiter.worker.isConnected()) waiter.worker.send({ type: 'flight-grant', id: waiter.id, role: 'fallback' });
+      }
+    }
+
+    if (shuttingDown) {
+      if (Object.keys(cluster.workers ?? {}).length === 0) process.exit(0);
+      return;
+    }
+    restartDelay = uptime < MIN_HEALTHY_UPTIME_MS ? Math.min(restartDelay * 2, MAX_RESTART_DELAY_MS) : RESTART_DELAY_MS;
+    console.error(`Worker ${worker.process.pid} exited (${signal ?? code}); restarting in ${restartDelay} ms.`);
+    setTimeout(fork, restartDelay);
+  });
+
+  for (const signal of ['SIGTERM', 'SIGINT'] as const) {
+    process.once(signal, () => {
+      shuttingDown = true;
+      const workers = Object.values(cluster.workers ?? {});
+      if (workers.length === 0) process.exit(0);
+      // Workers flush their caches on SIGTERM before exiting.
+      workers.forEach((worker) => worker?.process.kill('SIGTERM'));
+    });
+  }
+
+  console.log(`Cluster primary ${process.pid} starting ${count} workers.`);
+  for (let i = 0; i < count; i++) fork();
+}
+
+// ---------------------------------------------------------------------------------------------
+// Worker process
+
+let nextRequestId = 0;
+const pendingFlights = new Map<number, (message: ClusterMessage) => void>();
+const cacheSetHandlers: Array<(key: string, data: unknown) => void> = [];
+
+if (isClusterWorker()) {
+  process.on('message', (message: ClusterMessage) => {
+    switch (message?.type) {
+      case 'cache-set':
+        counters.cacheUpdatesReceived++;
+        cacheSetHandlers.forEach((handler) => handler(message.key, message.data));
+        break;
+      case 'flight-grant':
+      case 'flight-result': {
+        const resolve = pendingFlights.get(message.id);
+        if (resolve) {
+          pendingFlights.delete(message.id);
+          resolve(message);
+        }
+        break;
+      }
+      default:
+        break;
+    }
+  });
+}
+
+/**
+ * Sends a message to the primary, ignoring a closed IPC channel (e.g. during shutdown).
+ */
+function sendToPrimary(message: ClusterMessage): void {
+  try {
+    process.send?.(message);
+  } catch (err: any) {
+    console.warn('Failed to message the cluster primary:', err?.message || err);
+  }
+}
+
+/**
+ * Tells the other workers about a freshly cached LLM result.
+ * @param key - The cache key.
+ * @param data - The cached value (must be JSON-serializable).
+ */
+export function publishCacheSet(key: string, data: unknown): void {
+  if (!isClusterWorker()) return;
+  counters.cacheBroadcasts++;
+  sendToPrimary({ type: 'cache-set', key, data });
+}
+
+/**
+ * Registers a handler for results cached by other workers.
+ * @param handler - Called with each key and value published by another worker.
+ */
+export function onCacheSet(handler: (key: string, data: unknown) => void): void {
+  cacheSetHandlers.push(handler);
+}
+
+/**
+ * Runs `fn` unless another worker is already running the call with the same key, in which case
+ * that worker's result is returned. If the leading worker dies, does not answer within
+ * CLUSTER_FLIGHT_WAIT_MS, or its call only failed on a deadline (which says nothing about this
+ * worker's chances), the call runs locally instead.
+ * @param key - The coalescing key.
+ * @param fn - Produces the result; it must be JSON-serializable to reach other workers.
+ * @returns A promise for the shared result.
+ */
+export async function clusterFlight<T>(key: string, fn: () => Promise<T>): Promise<T> {
+  if (!isClusterWorker()) return fn();
+
+  const id = ++nextRequestId;
+  const reply = await new Promise<ClusterMessage | undefined>((resolve) => {
+    const timer = setTimeout(() => {
+      pendingFlights.delete(id);
+      resolve(undefined);
+    }, FLIGHT_WAIT_MS);
+    pendingFlights.set(id, (message) => {
+      clearTimeout(timer);
+      resolve(message);
+    });
+    sendToPrimary({ type: 'flight-acquire', id, key });
+  });
+
+  if (reply?.type === 'flight-result' && reply.code !== 'DEADLINE_EXCEEDED') {
+    counters.joined++;
+    if (reply.ok) return reply.data as T;
+    throw new Error(reply.error || 'LLM call failed in another worker');
+  }
+  if (reply?.type !== 'flight-grant' || reply.role !== 'leader') {
+    counters.fallbacks++;
+    return fn();
+  }
+
+  counters.led++;
+  try {
+    const data = await fn();
+    sendToPrimary({ type: 'flight-done', key, ok: true, data });
+    return data;
+  } catch (err: any) {
+    sendToPrimary({ type: 'flight-done', key, ok: false, error: err?.message || String(err), code: err?.code });
+    throw err;
+  }
+}
+
+/**
+ * Returns this worker's cross-worker coalescing and cache replication counters.
+ * @returns The current cluster statistics.
+ */
+export function stats(): ClusterStats {
+  return { ...counters };
+}
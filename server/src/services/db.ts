@@ -1,10 +1,59 @@
+import { AsyncLocalStorage } from 'node:async_hooks';
 import sqlite3 from 'sqlite3';
-import { open, Database } from 'sqlite';
+import { open, Database, ISqlite, Statement } from 'sqlite';
+import { sqliteQueryDuration } from './metrics';
 
 // This service sets up a new SQLite database connection and exports it for use in other services.
-// It includes a function to initialize the database and create the 'favorites' table if it doesn't exist.
+// It includes a function to initialize the database and create the 'favorites', 'llm_cache', 'translation_memory' and 'recipe_corpus' tables if they don't exist,
+// together with the 'recipe_search' full-text index over the recipes stored in favorites and the corpus.
+// The connection runs in WAL mode so readers are not blocked by a writer. Hot queries go through
+// a cache of prepared statements (`queryAll`, `queryOne`, `execute`), small writes from concurrent
+// requests are grouped into one transaction by a write queue (`enqueueWrite`), and the WAL is
+// checkpointed on a timer so it does not grow without bound between automatic checkpoints.
+// Every write runs inside `withTransaction`, which serializes transactions on the shared
+// connection, so no statement can end up inside (and be rolled back with) another caller's.
+
+const CACHE_SIZE_KB = Number(process.env.SQLITE_CACHE_SIZE_KB) || 16000;
+const MMAP_SIZE_BYTES = Number(process.env.SQLITE_MMAP_SIZE_BYTES) || 64 * 1024 * 1024;
+// How long a write waits for others to join its transaction, and the most a transaction takes.
+const WRITE_BATCH_WINDOW_MS = Number(process.env.SQLITE_WRITE_BATCH_WINDOW_MS) || 2;
+const WRITE_BATCH_MAX = Number(process.env.SQLITE_WRITE_BATCH_MAX) || 100;
+const CHECKPOINT_INTERVAL_MS = Number(process.env.SQLITE_CHECKPOINT_INTERVAL_MS) || 1000 * 60 * 5;
+
+export interface DbStats {
+  reads: number;
+  writes: number;
+  /** Transactions committed by the write queue. */
+  writeBatches: number;
+  /** Largest number of writes committed in one transaction. */
+  largestWriteBatch: number;
+  pendingWrites: number;
+  preparedStatements: number;
+  checkpoints: number;
+  /** WAL frames not yet copied back into the database file after the last checkpoint. */
+  walFramesPending: number;
+  errors: number;
+}
+
+interface QueuedWrite {
+  name: string;
+  sql: string;
+  params: unknown[];
+  stopTimer: (extra?: Record<string, string>) => void;
+  resolve: (result: ISqlite.RunResult) => void;
+  reject: (err: unknown) => void;
+}
 
 let db: Database;
+const statements = new Map<string, Promise<Statement>>();
+const writeQueue: QueuedWrite[] = [];
+const counters = { reads: 0, writes: 0, writeBatches: 0, largestWriteBatch: 0, checkpoints: 0, walFramesPending: 0, errors: 0 };
+let writeTimer: NodeJS.Timeout | undefined;
+let draining: Promise<void> | undefined;
+let transactionTail: Promise<unknown> = Promise.resolve();
+// The connection of the transaction the current async call chain runs in, if any.
+const activeTransaction = new AsyncLocalStorage<Database>();
+let checkpointTimer: NodeJS.Timeout | undefined;
 
 /**
  * Initializes the SQLite database.
@@ -18,14 +67,71 @@ export async function initDb(): Promise<void> {
       driver: sqlite3.Database,
     });
 
+    // In cluster mode several workers share this file; wait for a lock instead of failing with SQLITE_BUSY.
+    await db.exec('PRAGMA busy_timeout = 5000');
+    // WAL lets reads proceed during a write; with WAL, synchronous=NORMAL is still safe against
+    // corruption and only risks the last transactions on power loss, not on a process crash.
+    await db.exec(`
+      PRAGMA journal_mode = WAL;
+      PRAGMA synchronous = NORMAL;
+      PRAGMA cache_size = -${CACHE_SIZE_KB};
+      PRAGMA mmap_size = ${MMAP_SIZE_BYTES};
+      PRAGMA temp_store = MEMORY;
+    `);
+
     // Create the 'favorites' table if it doesn't exist.
-    // The 'recipe' column will store the full recipe object as a JSON string.
+    // The 'recipe' column will store the full recipe object as a JSON string;
+    // 'created_at' is an ISO-8601 UTC timestamp, so it sorts chronologically as text.
     await db.exec(`
       CREATE TABLE IF NOT EXISTS favorites (
         id TEXT PRIMARY KEY,
-        recipe TEXT NOT NULL
+        recipe TEXT NOT NULL,
+        created_at TEXT NOT NULL
+      )
+    `);
+    await migrateFavoritesCreatedAt();
+    // Serves both the 15-day expiry filter and newest-first keyset pagination.
+    await db.exec('CREATE INDEX IF NOT EXISTS idx_favorites_created_at ON favorites (created_at, id)');
+
+    // Second-tier cache for LLM responses so restarted instances come up warm.
+    // 'value' holds the cached result as a JSON string; 'stale_at' (the end of the soft TTL, after
+    // which the entry is revalidated) and 'expires_at' are epoch milliseconds.
+    await db.exec(`
+      CREATE TABLE IF NOT EXISTS llm_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        stale_at INTEGER NOT NULL DEFAULT 0,
+        expires_at INTEGER NOT NULL
+      );
+      CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache (expires_at);
+    `);
+    await migrateLlmCacheStaleAt();
+
+    // Translation memory: one row per (target language, normalized source text).
+    await db.exec(`
+      CREATE TABLE IF NOT EXISTS translation_memory (
+        lang TEXT NOT NULL,
+        source TEXT NOT NULL,
+        translation TEXT NOT NULL,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (lang, source)
       )
     `);
+
+    // Local corpus of generated recipes. 'recipe' holds the normalized recipe as a JSON string;
+    // 'title_key' (diet plus normalized title) keeps one copy of each dish per diet.
+    await db.exec(`
+      CREATE TABLE IF NOT EXISTS recipe_corpus (
+        id TEXT PRIMARY KEY,
+        title_key TEXT NOT NULL UNIQUE,
+        diet TEXT NOT NULL,
+        recipe TEXT NOT NULL,
+        created_at INTEGER NOT NULL
+      );
+      CREATE INDEX IF NOT EXISTS idx_recipe_corpus_created_at ON recipe_corpus (created_at);
+    `);
+    await createRecipeSearch();
+    startCheckpointTimer();
     console.log('Database initialized successfully.');
   } catch (error) {
     console.error('Failed to initialize database:', error);
@@ -33,6 +139,138 @@ export async function initDb(): Promise<void> {
   }
 }
 
+/**
+ * Returns the column values of a 'recipe_search' row, extracted from the JSON recipe of a
+ * favorites or recipe_corpus row.
+ * @param row - The trigger row reference, e.g. `NEW`.
+ */
+function searchDocument(row: string): string {
+  return `
+    ${row}.id,
+    json_extract(${row}.recipe, '$.title'),
+    json_extract(${row}.recipe, '$.shortDescription'),
+    (SELECT group_concat(value, ' ') FROM json_each(${row}.recipe, '$.tags')),
+    (SELECT group_concat(json_extract(value, '$.name'), ' ') FROM json_each(${row}.recipe, '$.ingredients')),
+    json_extract(${row}.recipe, '$.cuisineRegion'),
+    json_extract(${row}.recipe, '$.difficulty'),
+    json_extract(${row}.recipe, '$.isVegetarian'),
+    ${row}.recipe,
+    CAST(strftime('%s', 'now') AS INTEGER)`;
+}
+
+const SEARCH_COLUMNS =
+  'id, title, description, tags, ingredients, cuisine_region, difficulty, is_vegetarian, recipe, updated_at';
+const FTS_COLUMNS = 'title, description, tags, ingredients, cuisine_region';
+
+/**
+ * Creates the recipe search index: 'recipe_search' holds one row per recipe stored in favorites or
+ * the recipe corpus, and 'recipe_fts' is an FTS5 index over its text columns. Triggers keep both up
+ * to date on every insert, update and delete of the source tables, so the index is maintained
+ * incrementally by the same transactions that store the recipes. On first creation the index is
+ * filled from the recipes already stored.
+ */
+async function createRecipeSearch(): Promise<void> {
+  const existing = await db.get("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipe_search'");
+
+  await db.exec(`
+    CREATE TABLE IF NOT EXISTS recipe_search (
+      rowid INTEGER PRIMARY KEY,
+      id TEXT NOT NULL UNIQUE,
+      title TEXT,
+      description TEXT,
+      tags TEXT,
+      ingredients TEXT,
+      cuisine_region TEXT,
+      difficulty TEXT,
+      is_vegetarian INTEGER,
+      recipe TEXT NOT NULL,
+      updated_at INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_recipe_search_cuisine ON recipe_search (cuisine_region COLLATE NOCASE);
+    CREATE INDEX IF NOT EXISTS idx_recipe_search_difficulty ON recipe_search (difficulty);
+    CREATE INDEX IF NOT EXISTS idx_recipe_search_vegetarian ON recipe_search (is_vegetarian);
+    CREATE INDEX IF NOT EXISTS idx_recipe_search_updated_at ON recipe_search (updated_at);
+    CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5(
+      ${FTS_COLUMNS},
+      content = 'recipe_search',
+      content_rowid = 'rowid',
+      tokenize = 'porter unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS recipe_search_fts_insert AFTER INSERT ON recipe_search BEGIN
+      INSERT INTO recipe_fts (rowid, ${FTS_COLUMNS})
+      VALUES (NEW.rowid, NEW.title, NEW.description, NEW.tags, NEW.ingredients, NEW.cuisine_region);
+    END;
+    CREATE TRIGGER IF NOT EXISTS recipe_search_fts_delete AFTER DELETE ON recipe_search BEGIN
+      INSERT INTO recipe_fts (recipe_fts, rowid, ${FTS_COLUMNS})
+      VALUES ('delete', OLD.rowid, OLD.title, OLD.description, OLD.tags, OLD.ingredients, OLD.cuisine_region);
+    END;
+    CREATE TRIGGER IF NOT EXISTS recipe_search_fts_update AFTER UPDATE ON recipe_search BEGIN
+      INSERT INTO recipe_fts (recipe_fts, rowid, ${FTS_COLUMNS})
+      VALUES ('delete', OLD.rowid, OLD.title, OLD.description, OLD.tags, OLD.ingredients, OLD.cuisine_region);
+      INSERT INTO recipe_fts (rowid, ${FTS_COLUMNS})
+      VALUES (NEW.rowid, NEW.title, NEW.description, NEW.tags, NEW.ingredients, NEW.cuisine_region);
+    END;
+  `);
+
+  // recipe_search rows are only ever upserted, never REPLACEd: a REPLACE would delete the old row
+  // without firing the delete trigger and leave it in the FTS index.
+  const upsert = `
+    INSERT INTO recipe_search (${SEARCH_COLUMNS}) VALUES (${searchDocument('NEW')})
+    ON CONFLICT (id) DO UPDATE SET
+      title = excluded.title, description = excluded.description, tags = excluded.tags,
+      ingredients = excluded.ingredients, cuisine_region = excluded.cuisine_region,
+      difficulty = excluded.difficulty, is_vegetarian = excluded.is_vegetarian,
+      recipe = excluded.recipe, updated_at = excluded.updated_at;`;
+  for (const [source, other] of [['favorites', 'recipe_corpus'], ['recipe_corpus', 'favorites']]) {
+    await db.exec(`
+      CREATE TRIGGER IF NOT EXISTS ${source}_search_insert AFTER INSERT ON ${source}
+      WHEN json_valid(NEW.recipe) BEGIN ${upsert} END;
+      CREATE TRIGGER IF NOT EXISTS ${source}_search_update AFTER UPDATE OF recipe ON ${source}
+      WHEN json_valid(NEW.recipe) BEGIN ${upsert} END;
+      CREATE TRIGGER IF NOT EXISTS ${source}_search_delete AFTER DELETE ON ${source} BEGIN
+        DELETE FROM recipe_search WHERE id = OLD.id AND NOT EXISTS (SELECT 1 FROM ${other} WHERE id = OLD.id);
+      END;
+    `);
+  }
+
+  if (!existing) {
+    for (const source of ['recipe_corpus', 'favorites']) {
+      await db.run(
+        `INSERT OR IGNORE INTO recipe_search (${SEARCH_COLUMNS})
+         SELECT ${searchDocument(source)} FROM ${source} WHERE json_valid(${source}.recipe)`,
+      );
+    }
+    const row = await db.get<{ count: number }>('SELECT COUNT(*) AS count FROM recipe_search');
+    console.log(`Built the recipe search index for ${row?.count ?? 0} stored recipes.`);
+  }
+}
+
+/**
+ * Adds the 'created_at' column to favorites tables created before it existed.
+ * Existing rows are stamped with the migration time so they get a full 15-day window.
+ */
+async function migrateFavoritesCreatedAt(): Promise<void> {
+  const columns = await db.all<{ name: string }[]>('PRAGMA table_info(favorites)');
+  if (columns.some((column) => column.name === 'created_at')) return;
+
+  await db.exec('ALTER TABLE favorites ADD COLUMN created_at TEXT');
+  const result = await db.run('UPDATE favorites SET created_at = ? WHERE created_at IS NULL', new Date().toISOString());
+  console.log(`Added favorites.created_at; stamped ${result.changes ?? 0} existing favorites.`);
+}
+
+/**
+ * Adds the `stale_at` column to an `llm_cache` table created before it existed. Existing rows get
+ * 0, so they are served as stale and revalidated on their next hit.
+ */
+async function migrateLlmCacheStaleAt(): Promise<void> {
+  const columns = await db.all<{ name: string }[]>('PRAGMA table_info(llm_cache)');
+  if (columns.some((column) => column.name === 'stale_at')) return;
+
+  await db.exec('ALTER TABLE llm_cache ADD COLUMN stale_at INTEGER NOT NULL DEFAULT 0');
+  console.log('Added llm_cache.stale_at; existing entries will be revalidated on their next hit.');
+}
+
 /**
  * Returns the database instance.
  * Throws an error if the database has not been initialized.
@@ -44,3 +282,257 @@ export function getDb(): Database {
   }
   return db;
 }
+
+/**
+ * Returns the prepared statement for `sql`, preparing it on first use.
+ * Statements are kept for the life of the connection; node-sqlite3 queues calls on a
+ * statement, so concurrent callers can share one.
+ */
+function prepared(sql: string): Promise<Statement> {
+  let statement = statements.get(sql);
+  if (!statement) {
+    statement = getDb().prepare(sql);
+    // Do not cache a statement that failed to prepare (e.g. a typo); the caller sees the error.
+    statement.catch(() => statements.delete(sql));
+    statements.set(sql, statement);
+  }
+  return statement;
+}
+
+/**
+ * Runs a read query through the prepared statement cache.
+ * @param name - A short name for the query, used to label its latency.
+ * @param sql - The SQL text.
+ * @param params - The bound parameters.
+ * @returns A promise that resolves to all result rows.
+ */
+export async function queryAll<T>(name: string, sql: string, ...params: unknown[]): Promise<T[]> {
+  const stopTimer = sqliteQueryDuration.startTimer({ query: name, kind: 'read' });
+  try {
+    counters.reads++;
+    const statement = await prepared(sql);
+    const rows = await statement.all<T[]>(...params);
+    stopTimer({ status: 'ok' });
+    return rows;
+  } catch (err) {
+    counters.errors++;
+    stopTimer({ status: 'error' });
+    throw err;
+  }
+}
+
+/**
+ * Runs a read query through the prepared statement cache and returns its first row.
+ * @param name - A short name for the query, used to label its latency.
+ * @param sql - The SQL text.
+ * @param params - The bound parameters.
+ * @returns A promise that resolves to the first row, or undefined if there is none.
+ */
+export async function queryOne<T>(name: string, sql: string, ...params: unknown[]): Promise<T | undefined> {
+  const stopTimer = sqliteQueryDuration.startTimer({ query: name, kind: 'read' });
+  try {
+    counters.reads++;
+    const statement = await prepared(sql);
+    const row = await statement.get<T>(...params);
+    // An unfinished statement keeps its read snapshot open, which would hold back WAL checkpoints.
+    await statement.reset();
+    stopTimer({ status: 'ok' });
+    return row;
+  } catch (err) {
+    counters.errors++;
+    stopTimer({ status: 'error' });
+    throw err;
+  }
+}
+
+/**
+ * Runs a write outside the write queue, in its own transaction or in the caller's if it is
+ * called from inside `withTransaction`. Meant for bulk statements (cleanups, compaction) that
+ * should not hold up the small writes batched by the queue.
+ * @param name - A short name for the statement, used to label its latency.
+ * @param sql - The SQL text.
+ * @param params - The bound parameters.
+ * @returns A promise that resolves to the run result (`changes`, `lastID`).
+ */
+export async function execute(name: string, sql: string, ...params: unknown[]): Promise<ISqlite.RunResult> {
+  const stopTimer = sqliteQueryDuration.startTimer({ query: name, kind: 'write' });
+  try {
+    const result = await withTransaction(async () => {
+      const statement = await prepared(sql);
+      return statement.run(...params);
+    });
+    counters.writes++;
+    stopTimer({ status: 'ok' });
+    return result;
+  } catch (err) {
+    counters.errors++;
+    stopTimer({ status: 'error' });
+    throw err;
+  }
+}
+
+/**
+ * Runs `fn` once every transaction queued before it has finished, without opening one itself.
+ * @param fn - The work to do.
+ * @returns A promise that resolves to the result of `fn`.
+ */
+function serialized<T>(fn: () => Promise<T>): Promise<T> {
+  const run = transactionTail.then(fn);
+  transactionTail = run.catch(() => undefined);
+  return run;
+}
+
+/**
+ * Runs `fn` inside a transaction. Transactions on the shared connection are serialized, so
+ * callers never hit "cannot start a transaction within a transaction"; a call made from inside
+ * another transaction's `fn` joins that transaction instead of waiting behind it.
+ * @param fn - The work to do; it receives the database.
+ * @returns A promise that resolves to the result of `fn` once committed.
+ */
+export function withTransaction<T>(fn: (db: Database) => Promise<T>): Promise<T> {
+  const current = activeTransaction.getStore();
+  if (current) return fn(current);
+
+  return serialized(async () => {
+    const database = getDb();
+    await database.exec('BEGIN IMMEDIATE');
+    try {
+      const result = await activeTransaction.run(database, () => fn(database));
+      await database.exec('COMMIT');
+      return result;
+    } catch (err) {
+      await database.exec('ROLLBACK').catch(() => undefined);
+      throw err;
+    }
+  });
+}
+
+/**
+ * Queues a small write (insert, update or delete of a few rows). Writes arriving within
+ * SQLITE_WRITE_BATCH_WINDOW_MS of each other are committed together in one transaction, so a
+ * burst of requests costs one fsync instead of one each.
+ * @param name - A short name for the statement, used to label its latency.
+ * @param sql - The SQL text.
+ * @param params - The bound parameters.
+ * @returns A promise that resolves to the statement's run result once its transaction commits.
+ */
+export function enqueueWrite(name: string, sql: string, ...params: unknown[]): Promise<ISqlite.RunResult> {
+  return new Promise((resolve, reject) => {
+    // Latency covers the wait in the queue, which is what the caller experiences.
+    const stopTimer = sqliteQueryDuration.startTimer({ query: name, kind: 'write' });
+    writeQueue.push({ name, sql, params, stopTimer, resolve, reject });
+    if (writeQueue.length >= WRITE_BATCH_MAX) {
+      void drainWrites();
+    } else if (!writeTimer) {
+      writeTimer = setTimeout(() => void drainWrites(), WRITE_BATCH_WINDOW_MS);
+    }
+  });
+}
+
+/**
+ * Commits queued writes, WRITE_BATCH_MAX per transaction, until the queue is empty.
+ * A statement that fails is rejected on its own; the rest of its batch still commits.
+ */
+function drainWrites(): Promise<void> {
+  if (writeTimer) {
+    clearTimeout(writeTimer);
+    writeTimer = undefined;
+  }
+  if (draining) return draining;
+
+  draining = (async () => {
+    while (writeQueue.length > 0) {
+      const batch = writeQueue.splice(0, WRITE_BATCH_MAX);
+      const results = new Map<QueuedWrite, ISqlite.RunResult>();
+      const unsettled = new Set(batch);
+      const fail = (write: QueuedWrite, err: unknown) => {
+        unsettled.delete(write);
+        counters.errors++;
+        write.stopTimer({ status: 'error' });
+        write.reject(err);
+      };
+      try {
+        await withTransaction(async () => {
+          for (const write of batch) {
+            try {
+              const statement = await prepared(write.sql);
+              results.set(write, await statement.run(...write.params));
+            } catch (err) {
+              fail(write, err);
+            }
+          }
+        });
+      } catch (err: any) {
+        console.error('SQLite write batch failed:', err?.message || err);
+        // Nothing in the batch was committed.
+        for (const write of unsettled) fail(write, err);
+        continue;
+      }
+
+      counters.writeBatches++;
+      counters.largestWriteBatch = Math.max(counters.largestWriteBatch, batch.length);
+      for (const [write, result] of results) {
+        counters.writes++;
+        write.stopTimer({ status: 'ok' });
+        write.resolve(result);
+      }
+    }
+  })().finally(() => {
+    draining = undefined;
+  });
+  return draining;
+}
+
+/**
+ * Commits every queued write now, e.g. before the process exits.
+ * @returns A promise that resolves when the queue is empty.
+ */
+export async function flushWrites(): Promise<void> {
+  while (writeQueue.length > 0 || draining) {
+    await drainWrites();
+  }
+}
+
+/**
+ * Copies WAL frames back into the database file.
+ * @param mode - PASSIVE never blocks readers or writers; TRUNCATE also empties the WAL file.
+ * @returns A promise that resolves when the checkpoint has run.
+ */
+export async function checkpoint(mode: 'PASSIVE' | 'TRUNCATE' = 'PASSIVE'): Promise<void> {
+  try {
+    // A checkpoint cannot run inside a transaction, so it waits for the open one to finish.
+    const row = await serialized(() =>
+      getDb().get<{ busy: number; log: number; checkpointed: number }>(`PRAGMA wal_checkpoint(${mode})`),
+    );
+    counters.checkpoints++;
+    counters.walFramesPending = Math.max(0, (row?.log ?? 0) - (row?.checkpointed ?? 0));
+  } catch (err: any) {
+    counters.errors++;
+    console.error('SQLite checkpoint failed:', err?.message || err);
+  }
+}
+
+/**
+ * Lets SQLite refresh the query planner statistics it considers out of date.
+ * Cheap when nothing has changed, so it can run on a schedule.
+ */
+export async function optimize(): Promise<void> {
+  await withTransaction((database) => database.exec('PRAGMA optimize'));
+}
+
+/**
+ * Starts the periodic WAL checkpoint. The timer is unref'd so it never keeps the process alive.
+ */
+function startCheckpointTimer(): void {
+  if (checkpointTimer) return;
+  checkpointTimer = setInterval(() => void checkpoint(), CHECKPOINT_INTERVAL_MS);
+  checkpointTimer.unref();
+}
+
+/**
+ * Returns query, write batching and checkpoint counters for the database layer.
+ * @returns The current database statistics.
+ */
+export function stats(): DbStats {
+  return { ...counters, pendingWrites: writeQueue.length, preparedStatements: statements.size };
+}
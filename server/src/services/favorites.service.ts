@@ -1,33 +1,121 @@
-import { getDb } from './db';
+import { enqueueWrite, execute, queryAll, withTransaction } from './db';
+import * as recipeCorpus from './recipeCorpus';
+import * as recipeVectors from './recipeVectors';
 import { RecipeSuggestion } from '../types/recipes';
 
-const FIFTEEN_DAYS_MS = 15 * 24 * 60 * 60 * 1000;
+export const FIFTEEN_DAYS_MS = 15 * 24 * 60 * 60 * 1000;
+const PURGE_BATCH_SIZE = Number(process.env.FAVORITES_PURGE_BATCH_SIZE) || 500;
+const PURGE_MAX_ROWS = Number(process.env.FAVORITES_PURGE_MAX_ROWS) || 10000;
+
+export interface FavoritesPage {
+  favorites: RecipeSuggestion[];
+  /** Cursor for the next page, or undefined on the last page. */
+  nextCursor?: string;
+}
+
+interface FavoriteRow {
+  id: string;
+  recipe: string;
+  created_at: string;
+}
 
 /**
- * Retrieves all non-expired favorite recipes from the database.
- * Filters out entries older than 15 days.
- * @returns A promise that resolves to an array of favorite recipes.
+ * Parses the stored recipe JSON of each row, dropping rows that are not valid recipes.
  */
-export async function getFavorites(): Promise<RecipeSuggestion[]> {
-  const db = getDb();
-  
-  // Select all rows from the 'favorites' table with their creation timestamp
-  const rows = await db.all('SELECT recipe, created_at FROM favorites');
-  
-  const now = Date.now();
-  
-  // Parse and filter recipes
+function parseRows(rows: FavoriteRow[]): RecipeSuggestion[] {
   return rows
-    .filter((row) => {
-      const createdAt = row.created_at ? new Date(row.created_at).getTime() : 0;
-      return createdAt && now - createdAt <= FIFTEEN_DAYS_MS;
+    .map((row) => {
+      try {
+        return JSON.parse(row.recipe) as RecipeSuggestion;
+      } catch {
+        return undefined;
+      }
     })
-    .map((row) => JSON.parse(row.recipe) as RecipeSuggestion)
-    .filter((recipe): recipe is RecipeSuggestion => 
+    .filter((recipe): recipe is RecipeSuggestion =>
       !!recipe && !!recipe.id && !!recipe.title
     );
 }
 
+/**
+ * Encodes the position of a row as an opaque pagination cursor.
+ */
+function encodeCursor(row: FavoriteRow): string {
+  return Buffer.from(JSON.stringify([row.created_at, row.id])).toString('base64url');
+}
+
+/**
+ * Decodes a cursor produced by `getFavoritesPage`.
+ * @param cursor - The cursor from the X-Next-Cursor header.
+ * @returns The creation time and id of the last row of the previous page, or undefined if the cursor is invalid.
+ */
+export function parseCursor(cursor: string): { createdAt: string; id: string } | undefined {
+  try {
+    const [createdAt, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    return typeof createdAt === 'string' && typeof id === 'string' ? { createdAt, id } : undefined;
+  } catch {
+    return undefined;
+  }
+}
+
+/**
+ * Retrieves all non-expired favorite recipes from the database, newest first.
+ * Entries older than 15 days are filtered out in SQL, using the created_at index.
+ * @returns A promise that resolves to an array of favorite recipes.
+ */
+export async function getFavorites(): Promise<RecipeSuggestion[]> {
+  const cutoff = new Date(Date.now() - FIFTEEN_DAYS_MS).toISOString();
+
+  const rows = await queryAll<FavoriteRow>(
+    'favorites_select',
+    'SELECT id, recipe, created_at FROM favorites WHERE created_at >= ? ORDER BY created_at DESC, id DESC',
+    cutoff
+  );
+
+  return parseRows(rows);
+}
+
+/**
+ * Retrieves one page of non-expired favorites, newest first, using keyset pagination:
+ * each page continues strictly after the (created_at, id) of the previous page's last row,
+ * so pages stay cheap and stable however deep the client reads.
+ * @param limit - The maximum number of favorites to return.
+ * @param after - The cursor returned with the previous page, if any.
+ * @returns A promise that resolves to the page and the cursor of the next one.
+ */
+export async function getFavoritesPage(limit: number, after?: string): Promise<FavoritesPage> {
+  const cutoff = new Date(Date.now() - FIFTEEN_DAYS_MS).toISOString();
+  const position = after ? parseCursor(after) : undefined;
+  if (after && !position) {
+    throw new Error('Invalid cursor');
+  }
+
+  // Fetch one extra row to learn whether another page follows.
+  const rows = await (position
+    ? queryAll<FavoriteRow>(
+        'favorites_select_page',
+        `SELECT id, recipe, created_at FROM favorites
+         WHERE created_at >= ? AND (created_at < ? OR (created_at = ? AND id < ?))
+         ORDER BY created_at DESC, id DESC LIMIT ?`,
+        cutoff,
+        position.createdAt,
+        position.createdAt,
+        position.id,
+        limit + 1
+      )
+    : queryAll<FavoriteRow>(
+        'favorites_select_first_page',
+        'SELECT id, recipe, created_at FROM favorites WHERE created_at >= ? ORDER BY created_at DESC, id DESC LIMIT ?',
+        cutoff,
+        limit + 1
+      ));
+
+  const pageRows = rows.slice(0, limit);
+  return {
+    favorites: parseRows(pageRows),
+    nextCursor: rows.length > limit ? encodeCursor(pageRows[pageRows.length - 1]) : undefined,
+  };
+}
+
 /**
  * Adds a new favorite recipe to the database.
  * If the recipe already exists, it will not be added again.
@@ -35,16 +123,18 @@ export async function getFavorites(): Promise<RecipeSuggestion[]> {
  * @returns A promise that resolves to the added recipe.
  */
 export async function addFavorite(recipe: RecipeSuggestion): Promise<RecipeSuggestion> {
-  const db = getDb();
   const now = new Date().toISOString();
   
-  // Use INSERT OR REPLACE to update timestamp if recipe exists
-  await db.run(
+  // Use INSERT OR REPLACE to update timestamp if recipe exists.
+  // Queued so that a burst of saves is committed in one transaction.
+  await enqueueWrite(
+    'favorites_upsert',
     'INSERT OR REPLACE INTO favorites (id, recipe, created_at) VALUES (?, ?, ?)',
     recipe.id,
     JSON.stringify(recipe),
     now
   );
+  recipeVectors.add(recipe);
   
   return recipe;
 }
@@ -55,24 +145,58 @@ export async function addFavorite(recipe: RecipeSuggestion): Promise<RecipeSugge
  * @returns A promise that resolves when the recipe has been removed.
  */
 export async function removeFavorite(id: string): Promise<void> {
-  const db = getDb();
   // Delete the recipe with the matching ID
-  await db.run('DELETE FROM favorites WHERE id = ?', id);
+  await enqueueWrite('favorites_delete', 'DELETE FROM favorites WHERE id = ?', id);
+  forgetVector(id);
 }
 
 /**
- * Removes all expired favorites (older than 15 days) from the database.
- * This should be called periodically to clean up old entries.
+ * Drops a recipe that is no longer a favorite from the similarity index, unless the recipe
+ * corpus still holds it.
+ * @param id - The ID of the removed recipe.
+ */
+function forgetVector(id: string): void {
+  if (!recipeCorpus.has(id)) recipeVectors.remove(id);
+}
+
+/**
+ * Removes expired favorites (older than 15 days) from the database.
+ * Rows are deleted oldest first in short transactions of at most `batchSize` rows, yielding to
+ * the event loop between batches so a large purge never holds the write lock for long.
+ * Called periodically by the maintenance scheduler.
+ * @param batchSize - The maximum number of rows deleted per transaction.
+ * @param maxRows - The maximum number of rows deleted by this call; the rest wait for the next run.
  * @returns A promise that resolves to the number of deleted entries.
  */
-export async function cleanupExpiredFavorites(): Promise<number> {
-  const db = getDb();
+export async function cleanupExpiredFavorites(batchSize = PURGE_BATCH_SIZE, maxRows = PURGE_MAX_ROWS): Promise<number> {
   const fifteenDaysAgo = new Date(Date.now() - FIFTEEN_DAYS_MS).toISOString();
-  
-  const result = await db.run(
-    'DELETE FROM favorites WHERE created_at < ?',
-    fifteenDaysAgo
-  );
-  
-  return result.changes || 0;
-}
\ No newline at end of file
+  let removed = 0;
+
+  while (removed < maxRows) {
+    const limit = Math.min(batchSize, maxRows - removed);
+    // Read the ids first, in the same transaction, so their vectors can be dropped too.
+    const ids = await withTransaction(async () => {
+      const rows = await queryAll<{ id: string }>(
+        'favorites_cleanup_select',
+        'SELECT id FROM favorites WHERE created_at < ? ORDER BY created_at LIMIT ?',
+        fifteenDaysAgo,
+        limit
+      );
+      if (rows.length) {
+        await execute(
+          'favorites_cleanup',
+          'DELETE FROM favorites WHERE id IN (SELECT id FROM favorites WHERE created_at < ? ORDER BY created_at LIMIT ?)',
+          fifteenDaysAgo,
+          limit
+        );
+      }
+      return rows.map((row) => row.id);
+    });
+    ids.forEach(forgetVector);
+    removed += ids.length;
+    if (ids.length < limit) break;
+    await new Promise((resolve) => setImmediate(resolve));
+  }
+
+  return removed;
+}
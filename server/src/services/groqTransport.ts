@@ -0,0 +1,529 @@
+import http from 'http';
+import https from 'https';
+import { AxiosResponse } from 'axios';
+import { llmRateLimited, llmRequestDuration, llmRetries, llmTokens } from './metrics';
+import { isClusterWorker, workerCount } from './cluster';
+
+// This service is the transport layer for every Groq call. It keeps a pool of keep-alive sockets,
+// caps the number of requests in flight, and paces requests with a token bucket that adapts to the
+// rate-limit headers Groq returns (backing off on 429 / retry-after and recovering on success).
+// Waiting calls are queued per lane (suggest, details, translate) and served round-robin, so a burst
+// of translations cannot starve recipe suggestions. Background calls (prefetches) wait behind every
+// foreground call, whatever their lane.
+//
+// Every call also has a deadline: the lane timeout, shortened by the caller (usually from the
+// incoming request). Failed attempts are retried with jittered backoff while the deadline leaves
+// room, and a lane can opt into hedging, which sends a second attempt once the first has taken
+// longer than the lane's recent p95 latency and keeps whichever answers first.
+
+const MAX_IN_FLIGHT = Number(process.env.GROQ_MAX_IN_FLIGHT) || 8;
+const MAX_QUEUED = Number(process.env.GROQ_MAX_QUEUED) || 200;
+// In cluster mode every worker has its own limiter, so each gets an equal share of the account's rate.
+const RATE_SHARE = isClusterWorker() ? workerCount() : 1;
+const RATE_PER_MINUTE = (Number(process.env.GROQ_RATE_PER_MINUTE) || 30) / RATE_SHARE;
+const BURST = Math.max(1, Math.floor((Number(process.env.GROQ_RATE_BURST) || 10) / RATE_SHARE));
+// The bucket never refills slower than this share of the configured rate, however often Groq pushes back.
+const MIN_RATE_FACTOR = 0.1;
+const DEFAULT_RETRY_AFTER_MS = 5000;
+const RETRY_BASE_MS = Number(process.env.GROQ_RETRY_BASE_MS) || 250;
+const MAX_BACKOFF_MS = 4000;
+// Hedging needs enough latency samples for the p95 to mean something.
+const MIN_HEDGE_SAMPLES = 20;
+const LATENCY_SAMPLES = 200;
+
+export type GroqLane = 'suggest' | 'details' | 'translate';
+export const GROQ_LANES: GroqLane[] = ['suggest', 'details', 'translate'];
+
+export interface GroqCallOptions {
+  /** Epoch milliseconds after which the call is abandoned; the lane timeout still applies. */
+  deadline?: number;
+  /** Aborts the call, e.g. when the client disconnects. */
+  signal?: AbortSignal;
+  /** Set to false to never hedge this call (e.g. for streamed responses). */
+  hedge?: boolean;
+  /** Filled in with the call's queue wait, upstream latency and attempt count. */
+  trace?: GroqCallTrace;
+  /**
+   * While this returns true the call waits behind every foreground call, e.g. for a speculative
+   * prefetch. It is checked each time a queued call is picked, so a call can be promoted while it waits.
+   */
+  background?: () => boolean;
+}
+
+export interface GroqCallTrace {
+  /** Time spent waiting for a slot and a token, summed over all attempts. */
+  queueWaitMs: number;
+  /** Time from sending the successful attempt until its response (headers, for streams) arrived. */
+  upstreamMs: number;
+  /** Attempts started, including retries and hedges. */
+  attempts: number;
+}
+
+interface LanePolicy {
+  timeoutMs: number;
+  retries: number;
+  hedge: boolean;
+}
+
+/**
+ * Reads the timeout, retry and hedging settings of a lane, e.g. GROQ_SUGGEST_TIMEOUT_MS,
+ * GROQ_SUGGEST_RETRIES and GROQ_SUGGEST_HEDGE.
+ */
+function lanePolicy(lane: GroqLane, defaultTimeoutMs: number): LanePolicy {
+  const prefix = `GROQ_${lane.toUpperCase()}`;
+  const retries = process.env[`${prefix}_RETRIES`];
+  return {
+    timeoutMs: Number(process.env[`${prefix}_TIMEOUT_MS`]) || defaultTimeoutMs,
+    retries: retries !== undefined && retries !== '' ? Math.max(0, Number(retries) || 0) : 2,
+    hedge: ['1', 'true'].includes(String(process.env[`${prefix}_HEDGE`]).toLowerCase()),
+  };
+}
+
+const POLICIES: Record<GroqLane, LanePolicy> = {
+  suggest: lanePolicy('suggest', 20000),
+  details: lanePolicy('details', 20000),
+  translate: lanePolicy('translate', 10000),
+};
+
+export interface LaneStats {
+  queued: number;
+  started: number;
+  rejected: number;
+  totalWaitMs: number;
+  maxWaitMs: number;
+  avgWaitMs: number;
+  retries: number;
+  timeouts: number;
+  hedged: number;
+  hedgeWins: number;
+  p95Ms: number | undefined;
+}
+
+export interface TransportStats {
+  inFlight: number;
+  queued: number;
+  tokens: number;
+  /** Current refill rate in requests per minute, after adapting to Groq's feedback. */
+  ratePerMinute: number;
+  rateLimited: number;
+  pausedForMs: number;
+  lanes: Record<GroqLane, LaneStats>;
+}
+
+interface Waiter {
+  lane: GroqLane;
+  enqueuedAt: number;
+  background?: () => boolean;
+  start: () => void;
+  cancel: (err: Error) => void;
+}
+
+// Keep-alive agents shared by every Groq request; the socket pool is sized to the in-flight cap.
+export const httpAgent = new http.Agent({ keepAlive: true, maxSockets: MAX_IN_FLIGHT, maxFreeSockets: MAX_IN_FLIGHT });
+export const httpsAgent = new https.Agent({ keepAlive: true, maxSockets: MAX_IN_FLIGHT, maxFreeSockets: MAX_IN_FLIGHT });
+
+const lanes = new Map<GroqLane, Waiter[]>(GROQ_LANES.map((lane) => [lane, []]));
+const laneCounters = new Map(
+  GROQ_LANES.map((lane) => [
+    lane,
+    { started: 0, rejected: 0, totalWaitMs: 0, maxWaitMs: 0, retries: 0, timeouts: 0, hedged: 0, hedgeWins: 0 },
+  ]),
+);
+const latencies = new Map<GroqLane, number[]>(GROQ_LANES.map((lane) => [lane, []]));
+let nextLane = 0;
+let inFlight = 0;
+let rateLimited = 0;
+
+let tokens = BURST;
+let ratePerMs = RATE_PER_MINUTE / 60_000;
+let lastRefill = Date.now();
+let pausedUntil = 0;
+let wakeTimer: NodeJS.Timeout | undefined;
+
+/**
+ * Adds the tokens earned since the last refill, up to the burst size.
+ */
+function refill(now: number): void {
+  tokens = Math.min(BURST, tokens + (now - lastRefill) * ratePerMs);
+  lastRefill = now;
+}
+
+/**
+ * Number of queued calls across every lane.
+ */
+function queuedCount(): number {
+  let count = 0;
+  for (const queue of lanes.values()) count += queue.length;
+  return count;
+}
+
+/**
+ * Takes the next waiter, rotating across lanes so each lane gets a fair share. Background
+ * waiters are only taken once no lane has a foreground waiter left.
+ */
+function nextWaiter(): Waiter | undefined {
+  for (const foreground of [true, false]) {
+    for (let i = 0; i < GROQ_LANES.length; i++) {
+      const lane = GROQ_LANES[(nextLane + i) % GROQ_LANES.length];
+      const queue = lanes.get(lane)!;
+      const index = foreground ? queue.findIndex((waiter) => !waiter.background?.()) : 0;
+      if (index >= 0 && index < queue.length) {
+        nextLane = (nextLane + i + 1) % GROQ_LANES.length;
+        return queue.splice(index, 1)[0];
+      }
+    }
+  }
+  return undefined;
+}
+
+/**
+ * Starts queued calls while there is a free slot and a token, and schedules a wake-up
+ * for when the next token (or the end of a rate-limit pause) is due.
+ */
+function drain(): void {
+  const now = Date.now();
+  refill(now);
+
+  while (inFlight < MAX_IN_FLIGHT && now >= pausedUntil && tokens >= 1) {
+    const waiter = nextWaiter();
+    if (!waiter) break;
+    tokens -= 1;
+    inFlight++;
+    const counter = laneCounters.get(waiter.lane)!;
+    const waited = now - waiter.enqueuedAt;
+    counter.started++;
+    counter.totalWaitMs += waited;
+    counter.maxWaitMs = Math.max(counter.maxWaitMs, waited);
+    waiter.start();
+  }
+
+  if (wakeTimer || inFlight >= MAX_IN_FLIGHT || queuedCount() === 0) return;
+  const delay = Math.max(pausedUntil - now, tokens >= 1 ? 0 : (1 - tokens) / ratePerMs, 1);
+  wakeTimer = setTimeout(() => {
+    wakeTimer = undefined;
+    drain();
+  }, delay);
+}
+
+/**
+ * Waits for a slot and a token in the given lane.
+ * @param lane - The call site the request belongs to.
+ * @param signal - Aborts the wait (the call is then never started).
+ * @returns A promise that resolves once the caller may send its request.
+ */
+function acquire(lane: GroqLane, signal?: AbortSignal, background?: () => boolean): Promise<void> {
+  if (signal?.aborted) {
+    return Promise.reject(new Error('Groq request aborted before it was sent'));
+  }
+  if (queuedCount() >= MAX_QUEUED) {
+    laneCounters.get(lane)!.rejected++;
+    return Promise.reject(Object.assign(new Error('Groq request queue is full'), { code: 'QUEUE_FULL' }));
+  }
+
+  return new Promise<void>((resolve, reject) => {
+    const queue = lanes.get(lane)!;
+    const onAbort = () => waiter.cancel(new Error('Groq request aborted before it was sent'));
+    const waiter: Waiter = {
+      lane,
+      enqueuedAt: Date.now(),
+      background,
+      start: () => {
+        signal?.removeEventListener('abort', onAbort);
+        resolve();
+      },
+      cancel: (err) => {
+        const index = queue.indexOf(waiter);
+        if (index >= 0) queue.splice(index, 1);
+        reject(err);
+      },
+    };
+    signal?.addEventListener('abort', onAbort, { once: true });
+    queue.push(waiter);
+    drain();
+  });
+}
+
+/**
+ * Releases the slot held by a finished call.
+ */
+function release(): void {
+  inFlight--;
+  drain();
+}
+
+/**
+ * Parses a retry-after value (seconds or an HTTP date) or a Groq reset duration such as "2m59.5s".
+ * @returns The delay in milliseconds, or undefined if the header is missing or malformed.
+ */
+function parseDelay(value: unknown): number | undefined {
+  if (typeof value !== 'string' || !value.trim()) return undefined;
+  const trimmed = value.trim();
+  if (/^\d+(\.\d+)?$/.test(trimmed)) return Number(trimmed) * 1000;
+
+  const duration = trimmed.match(/^(?:(\d+)h)?(?:(\d+)m(?!s))?(?:(\d+(?:\.\d+)?)s)?(?:(\d+(?:\.\d+)?)ms)?$/);
+  if (duration && duration.slice(1).some(Boolean)) {
+    const [, h, m, s, ms] = duration;
+    return (Number(h) || 0) * 3_600_000 + (Number(m) || 0) * 60_000 + (Number(s) || 0) * 1000 + (Number(ms) || 0);
+  }
+
+  const date = Date.parse(trimmed);
+  return Number.isNaN(date) ? undefined : Math.max(0, date - Date.now());
+}
+
+/**
+ * Adapts the limiter to the headers of a Groq response. A 429 halves the refill rate and pauses
+ * every lane for the retry-after delay; an exhausted request quota pauses until it resets; any
+ * other response slowly restores the configured rate.
+ * @param status - The HTTP status of the response.
+ * @param headers - The response headers.
+ */
+function observe(status: number | undefined, headers: Record<string, unknown> | undefined): void {
+  const now = Date.now();
+  const configured = RATE_PER_MINUTE / 60_000;
+
+  if (status === 429) {
+    rateLimited++;
+    ratePerMs = Math.max(configured * MIN_RATE_FACTOR, ratePerMs / 2);
+    const delay = parseDelay(headers?.['retry-after']) ?? parseDelay(headers?.['x-ratelimit-reset-requests']);
+    pausedUntil = Math.max(pausedUntil, now + (delay ?? DEFAULT_RETRY_AFTER_MS));
+    tokens = 0;
+    return;
+  }
+
+  ratePerMs = Math.min(configured, ratePerMs + configured * 0.05);
+  if (headers?.['x-ratelimit-remaining-requests'] === '0') {
+    const delay = parseDelay(headers['x-ratelimit-reset-requests']);
+    if (delay !== undefined) pausedUntil = Math.max(pausedUntil, now + delay);
+  }
+}
+
+/**
+ * Records the latency of a successful attempt, keeping the most recent samples.
+ */
+function recordLatency(lane: GroqLane, ms: number): void {
+  const samples = latencies.get(lane)!;
+  samples.push(ms);
+  if (samples.length > LATENCY_SAMPLES) samples.shift();
+}
+
+/**
+ * The 95th percentile of recent attempt latencies in a lane.
+ * @returns The p95 in milliseconds, or undefined while there are too few samples.
+ */
+function p95(lane: GroqLane): number | undefined {
+  const samples = latencies.get(lane)!;
+  if (samples.length < MIN_HEDGE_SAMPLES) return undefined;
+  const sorted = [...samples].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * 0.95))];
+}
+
+/**
+ * Counts the tokens reported in the `usage` field of a (non-streamed) completion.
+ */
+function recordUsage(lane: GroqLane, data: unknown): void {
+  const usage = (data as { usage?: { prompt_tokens?: number; completion_tokens?: number } } | undefined)?.usage;
+  if (!usage) return;
+  if (usage.prompt_tokens) llmTokens.inc({ lane, kind: 'prompt' }, usage.prompt_tokens);
+  if (usage.completion_tokens) llmTokens.inc({ lane, kind: 'completion' }, usage.completion_tokens);
+}
+
+function deadlineError(lane: GroqLane): Error {
+  return Object.assign(new Error(`Groq ${lane} call exceeded its deadline`), { code: 'DEADLINE_EXCEEDED' });
+}
+
+/**
+ * Whether a failed attempt is worth retrying: network errors, 429s and 5xx responses are;
+ * client errors, a full queue and an exhausted deadline are not.
+ */
+function isRetryable(err: any): boolean {
+  if (err?.code === 'DEADLINE_EXCEEDED' || err?.code === 'QUEUE_FULL' || err?.code === 'ERR_CANCELED') return false;
+  const status = err?.response?.status;
+  return status === undefined || status === 429 || status >= 500;
+}
+
+/**
+ * Runs one attempt: waits for a slot and a token, then sends the request with a signal that
+ * aborts at the deadline (or when the caller or a winning hedge aborts it).
+ */
+async function attempt<T>(
+  lane: GroqLane,
+  send: (signal: AbortSignal) => Promise<AxiosResponse<T>>,
+  deadline: number,
+  signals: (AbortSignal | undefined)[],
+  trace?: GroqCallTrace,
+  background?: () => boolean,
+): Promise<AxiosResponse<T>> {
+  const remaining = deadline - Date.now();
+  if (remaining <= 0) throw deadlineError(lane);
+  const timeout = AbortSignal.timeout(remaining);
+  const signal = AbortSignal.any([timeout, ...signals.filter((s): s is AbortSignal => !!s)]);
+
+  const queuedAt = Date.now();
+  try {
+    await acquire(lane, signal, background);
+  } catch (err) {
+    if (timeout.aborted) throw deadlineError(lane);
+    throw err;
+  }
+
+  const sentAt = Date.now();
+  if (trace) {
+    trace.queueWaitMs += sentAt - queuedAt;
+    trace.attempts++;
+  }
+  const stopTimer = llmRequestDuration.startTimer({ lane });
+  try {
+    const response = await send(signal);
+    stopTimer({ outcome: response.status });
+    observe(response.status, response.headers as Record<string, unknown>);
+    recordLatency(lane, Date.now() - sentAt);
+    recordUsage(lane, response.data);
+    if (trace) trace.upstreamMs = Date.now() - sentAt;
+    return response;
+  } catch (err: any) {
+    if (timeout.aborted) {
+      stopTimer({ outcome: 'timeout' });
+      laneCounters.get(lane)!.timeouts++;
+      throw deadlineError(lane);
+    }
+    stopTimer({ outcome: err.response?.status ?? (signal.aborted ? 'aborted' : 'error') });
+    if (err.response?.status === 429) llmRateLimited.inc({ lane });
+    observe(err.response?.status, err.response?.headers);
+    throw err;
+  } finally {
+    release();
+  }
+}
+
+/**
+ * Runs an attempt and, if it has not answered within the lane's p95 latency, a second one;
+ * the first success wins and the other attempt is aborted.
+ */
+function hedgedAttempt<T>(
+  lane: GroqLane,
+  send: (signal: AbortSignal) => Promise<AxiosResponse<T>>,
+  deadline: number,
+  external: AbortSignal | undefined,
+  trace?: GroqCallTrace,
+  background?: () => boolean,
+): Promise<AxiosResponse<T>> {
+  const delay = p95(lane);
+  if (delay === undefined || Date.now() + delay >= deadline) {
+    return attempt(lane, send, deadline, [external], trace, background);
+  }
+
+  const counter = laneCounters.get(lane)!;
+  return new Promise((resolve, reject) => {
+    const controllers: AbortController[] = [];
+    let pending = 0;
+    let settled = false;
+
+    const launch = () => {
+      const controller = new AbortController();
+      controllers.push(controller);
+      pending++;
+      attempt(lane, send, deadline, [external, controller.signal], trace, background).then(
+        (response) => {
+          if (settled) return;
+          settled = true;
+          clearTimeout(timer);
+          if (controller !== controllers[0]) counter.hedgeWins++;
+          controllers.forEach((other) => other !== controller && other.abort());
+          resolve(response);
+        },
+        (err) => {
+          pending--;
+          if (settled || pending > 0) return;
+          settled = true;
+          clearTimeout(timer);
+          reject(err);
+        },
+      );
+    };
+
+    const timer = setTimeout(() => {
+      if (settled) return;
+      counter.hedged++;
+      launch();
+    }, delay);
+    launch();
+  });
+}
+
+/**
+ * Sends a Groq request through the shared limiter. The call waits in its lane for a slot and a
+ * token, is abandoned at its deadline, and failed attempts are retried with jittered exponential
+ * backoff (GROQ_<LANE>_RETRIES times) as long as the backoff still fits before the deadline.
+ * For streamed responses the slot is released once the response headers have arrived, while the
+ * deadline keeps applying to the body.
+ * @param lane - The call site the request belongs to.
+ * @param send - Sends the request with the given abort signal; called once per attempt.
+ * @param options - The caller's deadline, abort signal and hedging preference.
+ * @returns A promise for the Groq response.
+ */
+export async function groqRequest<T = any>(
+  lane: GroqLane,
+  send: (signal: AbortSignal) => Promise<AxiosResponse<T>>,
+  options: GroqCallOptions = {},
+): Promise<AxiosResponse<T>> {
+  const policy = POLICIES[lane];
+  const deadline = Math.min(Date.now() + policy.timeoutMs, options.deadline ?? Infinity);
+  const hedge = policy.hedge && options.hedge !== false;
+
+  for (let retry = 0; ; retry++) {
+    try {
+      return hedge
+        ? await hedgedAttempt(lane, send, deadline, options.signal, options.trace, options.background)
+        : await attempt(lane, send, deadline, [options.signal], options.trace, options.background);
+    } catch (err: any) {
+      if (options.signal?.aborted || retry >= policy.retries || !isRetryable(err)) throw err;
+      const backoff = Math.random() * Math.min(MAX_BACKOFF_MS, RETRY_BASE_MS * 2 ** retry);
+      if (Date.now() + backoff >= deadline) throw err;
+      laneCounters.get(lane)!.retries++;
+      llmRetries.inc({ lane });
+      console.warn(`Retrying Groq ${lane} call (${err.response?.status ?? err.message}), attempt ${retry + 2}.`);
+      await new Promise((resolve) => setTimeout(resolve, backoff));
+    }
+  }
+}
+
+// Clients may bound how long an AI call can take with this header; the per-lane Groq timeouts
+// apply either way.
+export const TIMEOUT_HEADER = 'X-Request-Timeout-Ms';
+
+/**
+ * Turns a client-supplied timeout (the TIMEOUT_HEADER header) into a call deadline.
+ * @param header - The header value, in milliseconds.
+ * @returns The deadline in epoch milliseconds, or undefined if the header is absent or invalid.
+ */
+export function deadlineFromTimeoutHeader(header: string | undefined): number | undefined {
+  const ms = Number(header);
+  return ms > 0 ? Date.now() + ms : undefined;
+}
+
+/**
+ * Returns the limiter state plus queue depth and wait times per lane.
+ * @returns The current transport statistics.
+ */
+export function stats(): TransportStats {
+  refill(Date.now());
+  const laneStats = {} as Record<GroqLane, LaneStats>;
+  for (const lane of GROQ_LANES) {
+    const counter = laneCounters.get(lane)!;
+    laneStats[lane] = {
+      queued: lanes.get(lane)!.length,
+      ...counter,
+      avgWaitMs: counter.started ? counter.totalWaitMs / counter.started : 0,
+      p95Ms: p95(lane),
+    };
+  }
+  return {
+    inFlight,
+    queued: queuedCount(),
+    tokens: Math.floor(tokens),
+    ratePerMinute: ratePerMs * 60_000,
+    rateLimited,
+    pausedForMs: Math.max(0, pausedUntil - Date.now()),
+    lanes: laneStats,
+  };
+}
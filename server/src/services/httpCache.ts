@@ -0,0 +1,175 @@
+import { createHash } from 'crypto';
+import { promisify } from 'util';
+import zlib from 'zlib';
+import { Request, Response } from 'express';
+
+// This service sends JSON responses with HTTP caching and compression:
+//  - every body gets a content-hash ETag, and a request whose If-None-Match matches it is
+//    answered with 304 and no body;
+//  - bodies above COMPRESSION_THRESHOLD_BYTES are compressed with brotli or gzip, whichever the
+//    client accepts (brotli preferred);
+//  - a Cache-Control header tells the client how it may reuse the response.
+// Values served from the LLM caches are the same objects on every hit, so their serialized,
+// hashed and compressed forms are remembered per object and reused instead of being rebuilt.
+
+const COMPRESSION_THRESHOLD_BYTES = Number(process.env.COMPRESSION_THRESHOLD_BYTES) || 1024;
+// Favour speed: these levels compress JSON well at a fraction of the cost of the maximum settings.
+const BROTLI_QUALITY = 4;
+const GZIP_LEVEL = 6;
+
+const brotliCompress = promisify(zlib.brotliCompress);
+const gzip = promisify(zlib.gzip);
+
+type Encoding = 'br' | 'gzip';
+
+interface Representation {
+  body: Buffer;
+  etag: string;
+  encoded: Partial<Record<Encoding, Promise<Buffer>>>;
+}
+
+export interface SendJsonOptions {
+  /** Cache-Control value; defaults to `private, no-cache` (reusable, but revalidate first). */
+  cacheControl?: string;
+  /**
+   * Remember the encoded forms of `payload` for later calls with the same object. Only for values
+   * that are never mutated, such as entries of the LLM caches.
+   */
+  memoize?: boolean;
+}
+
+export interface HttpCacheStats {
+  responses: number;
+  /** Requests answered with 304 Not Modified. */
+  notModified: number;
+  compressed: number;
+  /** Body bytes before compression. */
+  bytesIn: number;
+  /** Body bytes actually sent. */
+  bytesOut: number;
+  /** Responses whose encoded forms were reused from an earlier response. */
+  memoHits: number;
+}
+
+const memo = new WeakMap<object, Representation>();
+const counters = { responses: 0, notModified: 0, compressed: 0, bytesIn: 0, bytesOut: 0, memoHits: 0 };
+
+/**
+ * Computes a weak ETag from the response body. Weak, because the same ETag is sent for the
+ * identity, gzip and brotli encodings of the body.
+ * @param body - The serialized body.
+ * @returns The ETag header value.
+ */
+export function etagFor(body: Buffer | string): string {
+  return `W/"${createHash('sha1').update(body).digest('base64url')}"`;
+}
+
+/**
+ * Checks whether an If-None-Match header matches an ETag (weak comparison, as RFC 9110 requires).
+ * @param header - The If-None-Match header value.
+ * @param etag - The current ETag.
+ * @returns True if the client already holds this representation.
+ */
+export function matchesIfNoneMatch(header: string | undefined, etag: string): boolean {
+  if (!header) return false;
+  const opaque = etag.replace(/^W\//, '');
+  return header.split(',').some((candidate) => {
+    const tag = candidate.trim();
+    return tag === '*' || tag.replace(/^W\//, '') === opaque;
+  });
+}
+
+/**
+ * Picks the content coding for a response from the Accept-Encoding header.
+ */
+function chooseEncoding(req: Request): Encoding | undefined {
+  const accepted = req.acceptsEncodings('br', 'gzip', 'identity');
+  return accepted === 'br' || accepted === 'gzip' ? accepted : undefined;
+}
+
+/**
+ * Serializes and hashes a payload, or returns the remembered result for a memoized object.
+ */
+function representationOf(payload: unknown, memoize: boolean): Representation {
+  const key = memoize && typeof payload === 'object' && payload !== null ? payload : undefined;
+  const existing = key && memo.get(key);
+  if (existing) {
+    counters.memoHits++;
+    return existing;
+  }
+  const body = Buffer.from(JSON.stringify(payload));
+  const representation: Representation = { body, etag: etagFor(body), encoded: {} };
+  if (key) memo.set(key, representation);
+  return representation;
+}
+
+/**
+ * Compresses a body once per encoding; concurrent requests share the same pending compression.
+ */
+function encode(representation: Representation, encoding: Encoding): Promise<Buffer> {
+  let encoded = representation.encoded[encoding];
+  if (!encoded) {
+    encoded =
+      encoding === 'br'
+        ? brotliCompress(representation.body, {
+            params: {
+              [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY,
+              [zlib.constants.BROTLI_PARAM_SIZE_HINT]: representation.body.length,
+            },
+          })
+        : gzip(representation.body, { level: GZIP_LEVEL });
+    representation.encoded[encoding] = encoded;
+    // Do not keep a failed compression around; the next request tries again.
+    encoded.catch(() => delete representation.encoded[encoding]);
+  }
+  return encoded;
+}
+
+/**
+ * Sends `payload` as JSON with an ETag and Cache-Control header, answering 304 when the client's
+ * If-None-Match matches and compressing large bodies. Use in place of `res.json`.
+ * @param req - The request (for If-None-Match and Accept-Encoding).
+ * @param res - The response.
+ * @param payload - The JSON-serializable body.
+ * @param options - Caching options.
+ * @returns A promise that resolves when the response has been handed to Express.
+ */
+export async function sendJson(req: Request, res: Response, payload: unknown, options: SendJsonOptions = {}): Promise<void> {
+  const representation = representationOf(payload, options.memoize ?? false);
+  counters.responses++;
+
+  res.set({
+    ETag: representation.etag,
+    'Cache-Control': options.cacheControl ?? 'private, no-cache',
+    Vary: 'Accept-Encoding',
+  });
+  if (matchesIfNoneMatch(req.get('If-None-Match'), representation.etag)) {
+    counters.notModified++;
+    res.status(304).end();
+    return;
+  }
+
+  res.type('application/json');
+  let body = representation.body;
+  const encoding = body.length >= COMPRESSION_THRESHOLD_BYTES ? chooseEncoding(req) : undefined;
+  if (encoding) {
+    try {
+      body = await encode(representation, encoding);
+      res.set('Content-Encoding', encoding);
+      counters.compressed++;
+    } catch (err: any) {
+      console.error(`Failed to ${encoding}-compress a response:`, err?.message || err);
+    }
+  }
+  counters.bytesIn += representation.body.length;
+  counters.bytesOut += body.length;
+  res.send(body);
+}
+
+/**
+ * Returns conditional request and compression counters.
+ * @returns The current HTTP cache statistics.
+ */
+export function stats(): HttpCacheStats {
+  return { ...counters };
+}
@@ -0,0 +1,64 @@
+import assert from 'node:assert/strict';
+import { describe, it } from 'node:test';
+import { RecipeStreamParser, repairJson, truncatedMembers } from './jsonStream';
+
+describe('repairJson', () => {
+  it('parses valid JSON without repairing it', () => {
+    assert.deepEqual(repairJson('{"a":[1,2]}'), { value: { a: [1, 2] }, repaired: false, truncated: [] });
+  });
+
+  it('strips code fences, surrounding prose and trailing commas', () => {
+    const result = repairJson('Here you go:\n```json\n{"a":[1,2,],}\n```\nEnjoy!');
+    assert.deepEqual(result?.value, { a: [1, 2] });
+    assert.equal(result?.repaired, true);
+    assert.deepEqual(result?.truncated, []);
+  });
+
+  it('returns undefined when there is no JSON', () => {
+    assert.equal(repairJson('Sorry, I cannot help with that.'), undefined);
+  });
+
+  it('drops a string value that was cut off instead of closing it', () => {
+    const result = repairJson('{"translations":{"0":"नमस्ते","1":"धन');
+    assert.deepEqual(result?.value, { translations: { '0': 'नमस्ते' } });
+    assert.deepEqual(result?.truncated, [[], ['translations']]);
+  });
+
+  it('drops an array element that was cut off and reports the array as truncated', () => {
+    const result = repairJson('{"title":"Dal","steps":["boil","ser');
+    assert.deepEqual(result?.value, { title: 'Dal', steps: ['boil'] });
+    assert.deepEqual(truncatedMembers(result!, []), ['steps']);
+  });
+
+  it('drops a key whose value was cut off', () => {
+    const result = repairJson('{"title":"Dal","tips":["stir"],"nutrition":');
+    assert.deepEqual(result?.value, { title: 'Dal', tips: ['stir'] });
+    assert.deepEqual(truncatedMembers(result!, []), []);
+  });
+
+  it('does not keep a number that may have been cut short', () => {
+    const result = repairJson('{"nutrition":{"calories":12');
+    assert.deepEqual(result?.value, { nutrition: {} });
+    assert.deepEqual(truncatedMembers(result!, []), ['nutrition']);
+  });
+
+  it('reports truncated array elements by position', () => {
+    const result = repairJson('{"recipes":[{"title":"A"},{"title":"B","steps":["x"');
+    assert.deepEqual(result?.value, { recipes: [{ title: 'A' }, { title: 'B', steps: ['x'] }] });
+    assert.deepEqual(truncatedMembers(result!, ['recipes']), [1]);
+    assert.deepEqual(truncatedMembers(result!, ['recipes', 1]), ['steps']);
+  });
+
+  it('keeps escaped quotes inside complete strings', () => {
+    const result = repairJson('["say \\"hi\\"","cut \\"');
+    assert.deepEqual(result?.value, ['say "hi"']);
+  });
+});
+
+describe('RecipeStreamParser', () => {
+  it('emits each recipe once its object closes, across chunks', () => {
+    const parser = new RecipeStreamParser();
+    assert.deepEqual(parser.push('{"recipes":[{"title":"A"},{"ti'), [{ title: 'A' }]);
+    assert.deepEqual(parser.push('tle":"B {x}"}]}'), [{ title: 'B {x}' }]);
+  });
+});
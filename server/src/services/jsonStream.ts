@@ -0,0 +1,290 @@
+// This service incrementally scans streamed LLM output for a JSON `recipes` array and returns
+// each array element as soon as its closing brace arrives, so recipes can be sent to the client
+// before the whole completion has been generated. Text outside the JSON (e.g. code fences) is ignored.
+// It also repairs model output that is truncated or slightly malformed (`repairJson`), so that
+// what was generated completely can be used instead of failing the whole response.
+
+/**
+ * Incremental extractor for the objects of a `{"recipes": [...]}` (or bare `[...]`) document.
+ * Feed it chunks with `push`; each call returns the objects completed by that chunk.
+ */
+export class RecipeStreamParser {
+  private buffer = '';
+  private position = 0;
+  private readonly stack: string[] = [];
+  private inString = false;
+  private escaped = false;
+  private stringStart = -1;
+  private expectingKey = false;
+  private lastKey: string | undefined;
+  private targetDepth = -1;
+  private objectStart = -1;
+
+  /**
+   * Appends a chunk of streamed text and returns the recipe objects it completed.
+   * Objects that fail to parse are skipped.
+   * @param chunk - The next piece of model output.
+   * @returns The newly completed recipe objects, in order.
+   */
+  push(chunk: string): any[] {
+    this.buffer += chunk;
+    const completed: any[] = [];
+
+    for (; this.position < this.buffer.length; this.position++) {
+      const ch = this.buffer[this.position];
+
+      if (this.inString) {
+        if (this.escaped) {
+          this.escaped = false;
+        } else if (ch === '\\') {
+          this.escaped = true;
+        } else if (ch === '"') {
+          this.inString = false;
+          if (this.expectingKey && this.stack[this.stack.length - 1] === '{') {
+            this.lastKey = this.buffer.slice(this.stringStart + 1, this.position);
+          }
+        }
+        continue;
+      }
+
+      switch (ch) {
+        case '"':
+          this.inString = true;
+          this.stringStart = this.position;
+          break;
+        case '{':
+          if (this.stack.length === this.targetDepth) {
+            this.objectStart = this.position;
+          }
+          this.stack.push('{');
+          this.expectingKey = true;
+          break;
+        case '[':
+          this.stack.push('[');
+          if (this.isRecipesArray()) {
+            this.targetDepth = this.stack.length;
+          }
+          this.expectingKey = false;
+          break;
+        case ':':
+          this.expectingKey = false;
+          break;
+        case ',':
+          this.expectingKey = this.stack[this.stack.length - 1] === '{';
+          break;
+        case '}':
+        case ']':
+          this.stack.pop();
+          if (ch === '}' && this.stack.length === this.targetDepth && this.objectStart >= 0) {
+            const parsed = this.tryParse(this.buffer.slice(this.objectStart, this.position + 1));
+            if (parsed !== undefined) completed.push(parsed);
+            this.objectStart = -1;
+          }
+          if (ch === ']' && this.stack.length === this.targetDepth - 1) {
+            this.targetDepth = -1;
+          }
+          this.expectingKey = false;
+          break;
+        default:
+          break;
+      }
+    }
+
+    return completed;
+  }
+
+  /** The full text received so far. */
+  get text(): string {
+    return this.buffer;
+  }
+
+  /**
+   * Whether the array that was just opened is the one holding the recipes: either a bare
+   * top-level array or the value of the top-level `recipes` key.
+   */
+  private isRecipesArray(): boolean {
+    if (this.targetDepth !== -1) return false;
+    if (this.stack.length === 1) return true;
+    return this.stack.length === 2 && this.stack[0] === '{' && this.lastKey === 'recipes';
+  }
+
+  private tryParse(text: string): any {
+    try {
+      return JSON.parse(text);
+    } catch {
+      return undefined;
+    }
+  }
+}
+
+export type JsonPath = Array<string | number>;
+
+export interface RepairedJson {
+  value: any;
+  /** False if the text parsed as is; true if it had to be cut back and/or closed. */
+  repaired: boolean;
+  /**
+   * Paths of the objects and arrays that were cut off and closed by the repair, outermost first
+   * (`[]` is the document itself). Their contents are incomplete: members after the cut are gone.
+   */
+  truncated: JsonPath[];
+}
+
+interface OpenContainer {
+  open: string;
+  path: JsonPath;
+  /** The last key read in an object. */
+  key: string;
+  /** The position of the current element in an array. */
+  index: number;
+}
+
+// Upper bound on truncation points tried before giving up on a document.
+const MAX_REPAIR_ATTEMPTS = 64;
+
+/**
+ * Removes commas that directly precede a closing brace or bracket (outside strings),
+ * a common slip in model-written JSON.
+ */
+function stripTrailingCommas(text: string): string {
+  let out = '';
+  let inString = false;
+  let escaped = false;
+  for (let i = 0; i < text.length; i++) {
+    const ch = text[i];
+    if (inString) {
+      if (escaped) escaped = false;
+      else if (ch === '\\') escaped = true;
+      else if (ch === '"') inString = false;
+    } else if (ch === '"') {
+      inString = true;
+    } else if (ch === ',') {
+      let next = i + 1;
+      while (next < text.length && /\s/.test(text[next])) next++;
+      if (text[next] === '}' || text[next] === ']') continue;
+    }
+    out += ch;
+  }
+  return out;
+}
+
+/**
+ * Reads the text of a JSON string token, falling back to the raw characters if it is malformed.
+ */
+function stringToken(token: string): string {
+  try {
+    return JSON.parse(token);
+  } catch {
+    return token.slice(1, -1);
+  }
+}
+
+/**
+ * Parses model output that may be wrapped in prose or code fences, contain trailing commas, or be
+ * cut off mid-document. A truncated document is cut back to the last complete value and its open
+ * arrays and objects are closed, so everything that was fully generated survives. A string that
+ * was cut off is dropped rather than closed, since its text is incomplete; use `truncated` to
+ * tell which containers lost members.
+ * @param text - The raw model output.
+ * @returns The parsed value and what was repaired, or undefined if nothing could be recovered.
+ */
+export function repairJson(text: string): RepairedJson | undefined {
+  const start = text.search(/[{[]/);
+  if (start < 0) return undefined;
+  const body = text.slice(start);
+  try {
+    return { value: JSON.parse(body), repaired: start > 0 && text.slice(0, start).trim() !== '', truncated: [] };
+  } catch {
+    // Fall through to the repair below.
+  }
+
+  const cleaned = stripTrailingCommas(body.replace(/\s*```\s*$/, ''));
+  // Positions where the document can be cut and closed, with the containers still open there.
+  const cuts: Array<{ at: number; open: OpenContainer[] }> = [];
+  const stack: OpenContainer[] = [];
+  let inString = false;
+  let escaped = false;
+  let stringStart = -1;
+  let stringIsKey = false;
+  let expectingKey = false;
+  let end = cleaned.length;
+
+  for (let i = 0; i < cleaned.length; i++) {
+    const ch = cleaned[i];
+    const top = stack[stack.length - 1];
+    if (inString) {
+      if (escaped) escaped = false;
+      else if (ch === '\\') escaped = true;
+      else if (ch === '"') {
+        inString = false;
+        if (stringIsKey) top.key = stringToken(cleaned.slice(stringStart, i + 1));
+        else cuts.push({ at: i + 1, open: [...stack] });
+      }
+      continue;
+    }
+    if (ch === '"') {
+      inString = true;
+      stringStart = i;
+      stringIsKey = expectingKey && top?.open === '{';
+    } else if (ch === '{' || ch === '[') {
+      const path = top ? [...top.path, top.open === '{' ? top.key : top.index] : [];
+      stack.push({ open: ch, path, key: '', index: 0 });
+      expectingKey = ch === '{';
+      cuts.push({ at: i + 1, open: [...stack] });
+    } else if (ch === '}' || ch === ']') {
+      if (stack.length === 0) {
+        end = i;
+        break;
+      }
+      stack.pop();
+      expectingKey = false;
+      cuts.push({ at: i + 1, open: [...stack] });
+      if (stack.length === 0) {
+        // The document is complete; anything after it is trailing prose.
+        end = i + 1;
+        break;
+      }
+    } else if (ch === ',') {
+      // Cutting just before a comma drops nothing that was complete.
+      cuts.push({ at: i, open: [...stack] });
+      if (top?.open === '[') top.index++;
+      expectingKey = top?.open === '{';
+    } else if (ch === ':') {
+      expectingKey = false;
+    }
+  }
+
+  const candidates: Array<{ text: string; truncated: JsonPath[] }> = [];
+  if (stack.length === 0) {
+    candidates.push({ text: cleaned.slice(0, end), truncated: [] });
+  } else {
+    for (let i = cuts.length - 1; i >= 0 && candidates.length < MAX_REPAIR_ATTEMPTS; i--) {
+      const { at, open } = cuts[i];
+      const prefix = cleaned.slice(0, at).replace(/[\s,]+$/, '');
+      const closers = open.map((container) => (container.open === '{' ? '}' : ']')).reverse().join('');
+      candidates.push({ text: prefix + closers, truncated: open.map((container) => container.path) });
+    }
+  }
+
+  for (const candidate of candidates) {
+    try {
+      return { value: JSON.parse(candidate.text), repaired: true, truncated: candidate.truncated };
+    } catch {
+      // Try the next, shorter candidate.
+    }
+  }
+  return undefined;
+}
+
+/**
+ * Lists the members of a container that a repair cut off, i.e. that were closed early and so
+ * hold incomplete values. Members dropped entirely are not listed; they are simply absent.
+ * @param repaired - The result of `repairJson`.
+ * @param path - The path of the container, e.g. `['recipes']`.
+ * @returns The keys (or array positions) of its truncated members.
+ */
+export function truncatedMembers(repaired: RepairedJson, path: JsonPath): Array<string | number> {
+  return repaired.truncated
+    .filter((member) => member.length === path.length + 1 && path.every((part, i) => member[i] === part))
+    .map((member) => member[path.length]);
+}
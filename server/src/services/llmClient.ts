@@ -1,7 +1,29 @@
-import axios, { AxiosInstance } from 'axios';
+import axios, { AxiosInstance, AxiosResponse } from 'axios';
 import { randomUUID } from 'crypto';
+import { StringDecoder } from 'string_decoder';
 import { RecipeQuery, RecipeSuggestion, SuggestRecipesResponse, NutritionalInfo } from '../types/recipes';
 import * as cache from './cache';
+import * as persistentCache from './persistentCache';
+import * as translationMemory from './translationMemory';
+import * as similarityIndex from './similarityIndex';
+import * as recipeCorpus from './recipeCorpus';
+import * as recipeVectors from './recipeVectors';
+import * as prefetch from './prefetch';
+import { revalidate } from './revalidator';
+import { RecipeStreamParser, RepairedJson, repairJson, truncatedMembers } from './jsonStream';
+import { isInFlight, singleFlight } from './singleFlight';
+import { onCacheSet, publishCacheSet } from './cluster';
+import { GroqCallOptions, GroqCallTrace, GroqLane, groqRequest, httpAgent, httpsAgent } from './groqTransport';
+import { CHARS_PER_TOKEN, ChatMessage, PromptTemplate, definePrompt } from './prompts';
+import * as llmUsage from './llmUsage';
+import { llmJsonRepairs } from './metrics';
+import {
+  QueryFingerprint,
+  fingerprintQuery,
+  normalizeIngredient,
+  normalizeIngredients,
+  parseFingerprintKey,
+} from './queryFingerprint';
 
 // This service calls Meta Llama 4 (or similar) via Groq API using values from .env
 // (.env must be placed in the server folder and loaded via dotenv in src/index.ts)
@@ -21,8 +43,19 @@ const groqApi: AxiosInstance = axios.create({
     Authorization: `Bearer ${API_KEY}`,
     'Content-Type': 'application/json',
   },
+  httpAgent,
+  httpsAgent,
 });
 
+export interface LlmCallInfo {
+  /**
+   * How the result was produced: a fresh cache hit, a stale hit that is being refreshed in
+   * the background, a hit on a similar cached query, an answer from the local recipe corpus,
+   * or a call to the LLM.
+   */
+  cacheStatus?: 'hit' | 'stale' | 'similar' | 'corpus' | 'miss';
+}
+
 /**
  * Normalizes a raw recipe object from the AI into a structured RecipeSuggestion.
  * This function handles missing fields, data type conversions, and aliasing.
@@ -95,69 +128,118 @@ function _normalizeRecipe(r: any, base?: RecipeSuggestion, index = 0): RecipeSug
   return normalized;
 }
 
+/**
+ * Looks up an LLM result in memory first and then in the persistent tier.
+ * Entries found on disk are promoted into the in-memory cache with their remaining soft and hard
+ * TTLs, and are reported stale once their soft TTL has passed, so the caller revalidates them.
+ * @param key - The cache key.
+ * @returns The cached value and whether it is stale, or undefined on a miss in both tiers.
+ */
+async function _readThrough<T>(key: string): Promise<cache.CacheLookup<T> | undefined> {
+  const cached = cache.lookup<T>(key);
+  if (cached) return cached;
 
-export async function generateRecipesFromLlama(
-  query: RecipeQuery,
-): Promise<SuggestRecipesResponse> {
-  const cacheKey = `recipes-${JSON.stringify(query)}`;
-  const cached = cache.get<SuggestRecipesResponse>(cacheKey);
-  if (cached) {
-    console.log('Returning cached recipe suggestions');
-    return cached;
-  }
+  const persisted = await persistentCache.load<T>(key);
+  if (!persisted) return undefined;
+  return { data: persisted.data, stale: _promote(key, persisted) };
+}
 
-  console.log('Groq LLM config:', { hasUrl: !!BASE_URL, hasKey: !!API_KEY, model: MODEL });
+/**
+ * Copies a persisted entry into the in-memory cache for the rest of its lifetime.
+ * @param key - The cache key.
+ * @param entry - The persisted entry.
+ * @returns True if the entry is past its soft TTL.
+ */
+function _promote<T>(key: string, entry: persistentCache.PersistedEntry<T>): boolean {
+  const now = Date.now();
+  const fresh = Math.max(0, entry.staleAt - now);
+  cache.set(key, entry.data, fresh, entry.expiresAt - now);
+  return fresh === 0;
+}
 
-  if (!BASE_URL || !API_KEY) {
-    console.warn('Using fallback mock recipes (missing GROQ_API_URL or GROQ_API_KEY)');
-    const mock: RecipeSuggestion[] = [
-      {
-        id: randomUUID(),
-        title: 'Simple Masala Khichdi',
-        shortDescription:
-          'Comforting one-pot rice and dal with spices, perfect for quick Indian dinner.',
-        cuisineRegion: 'North Indian',
-        isVegetarian: true,
-        tags: ['one-pot', 'light', 'comfort'],
-        estimatedTimeMinutes: 25,
-        difficulty: 'easy',
-        ingredients: [
-          {
-            name: 'Rice',
-            quantity: '1 cup',
-            isFromUserKitchen: query.ingredients.includes('rice'),
-          },
-          {
-            name: 'Moong dal',
-            quantity: '1/2 cup',
-            isFromUserKitchen: query.ingredients.includes('dal'),
-          },
-          {
-            name: 'Onion',
-            quantity: '1 small, chopped',
-            isFromUserKitchen: query.ingredients.includes('onion'),
-          },
-        ],
-        steps: [
-          'Wash rice and dal together.',
-          'In a pressure cooker, temper jeera, ginger, and chilli.',
-          'Add onion, tomato, spices, then rice+dal and water.',
-          'Pressure cook for 2–3 whistles until soft.',
-        ],
-        tips: ['Adjust water for softer or drier khichdi.', 'Serve with curd and pickle.'],
-      },
-    ];
+/**
+ * Stores an LLM result in memory and queues it for the persistent tier.
+ * @param key - The cache key.
+ * @param data - The value to cache.
+ */
+function _writeThrough<T>(key: string, data: T): void {
+  cache.set(key, data);
+  persistentCache.persist(key, data);
+  publishCacheSet(key, data);
+}
 
-    return { recipes: mock };
-  }
+// In cluster mode, results cached by other workers land in this worker's memory tier too.
+// They are already persisted by the worker that produced them.
+onCacheSet((key, data) => cache.set(key, data));
+
+/**
+ * Re-derives `isFromUserKitchen` for cached suggestions served to a similar (not identical) query,
+ * so the flags reflect the current user's pantry rather than the one that produced the entry.
+ * @param response - The cached suggestions.
+ * @param query - The query being answered.
+ * @returns A copy of the suggestions with updated ingredient flags.
+ */
+function _markUserKitchenIngredients(response: SuggestRecipesResponse, query: RecipeQuery): SuggestRecipesResponse {
+  const pantry = new Set(normalizeIngredients(query.ingredients));
+  return {
+    recipes: response.recipes.map((recipe) => ({
+      ...recipe,
+      ingredients: recipe.ingredients.map((ing) => {
+        const words = normalizeIngredient(ing.name).split(' ');
+        return { ...ing, isFromUserKitchen: words.some((word) => pantry.has(word)) || pantry.has(words.join(' ')) };
+      }),
+    })),
+  };
+}
+
+const RECIPES_PER_SUGGESTION = 3;
+// Suggestions are cached under this prefix plus the query fingerprint key.
+const RECIPES_KEY_PREFIX = 'recipes-';
+
+const RECIPES_SYSTEM_PROMPT =
+  'You are a helpful Indian chef specializing in diverse regional Indian dishes. ' +
+  'Given ingredients, diet, spice level, and time, suggest practical recipes. ' +
+  'Use commonly available Indian ingredients. Always respect dietary restrictions ' +
+  'and avoid listed ingredients. Respond ONLY with valid JSON matching the schema.';
 
-  const systemPrompt =
-    'You are a helpful Indian chef specializing in diverse regional Indian dishes. ' +
-    'Given ingredients, diet, spice level, and time, suggest practical recipes. ' +
-    'Use commonly available Indian ingredients. Always respect dietary restrictions ' +
-    'and avoid listed ingredients. Respond ONLY with valid JSON matching the schema.';
+const RECIPES_PROMPT = definePrompt({
+  name: 'suggest',
+  system: RECIPES_SYSTEM_PROMPT,
+  instructions:
+    `Generate ${RECIPES_PER_SUGGESTION} Indian recipes as JSON object with shape {"recipes": RecipeSuggestion[]}. ` +
+    'Return ONLY JSON. Input: ',
+  staticBudgetTokens: 120,
+  promptBudgetTokens: 400,
+});
+
+// Asks for the recipes that were lost when a suggestion response was cut off. The prefix
+// carries the number of recipes still needed.
+const RECIPES_MORE_PROMPT = definePrompt({
+  name: 'suggest_more',
+  system: RECIPES_SYSTEM_PROMPT,
+  instructions:
+    'more Indian recipes as JSON object with shape {"recipes": RecipeSuggestion[]}, different from the ' +
+    'already suggested titles listed below. Return ONLY JSON. Input: ',
+  staticBudgetTokens: 120,
+  promptBudgetTokens: 450,
+});
+
+/**
+ * Builds the chat messages for a recipe suggestion request.
+ * @param query - The recipe query.
+ * @returns The system and user messages.
+ */
+function _recipesMessages(query: RecipeQuery): ChatMessage[] {
+  return RECIPES_PROMPT.messages(JSON.stringify(_recipesPromptPayload(query)));
+}
 
-  const userPrompt = {
+/**
+ * Builds the query description that is sent to the LLM for suggestions.
+ * @param query - The recipe query.
+ * @returns The prompt payload.
+ */
+function _recipesPromptPayload(query: RecipeQuery) {
+  return {
     ingredients: query.ingredients,
     diet: query.diet,
     spiceLevel: query.spiceLevel,
@@ -166,123 +248,887 @@ export async function generateRecipesFromLlama(
     servings: query.servings,
     avoidIngredients: query.avoidIngredients,
   };
+}
 
+/**
+ * Sends a chat completion and records its token usage, queue wait and upstream latency.
+ * @param prompt - The template the messages were built from; its name labels the usage.
+ * @param lane - The transport lane.
+ * @param messages - The chat messages.
+ * @param body - Other request fields, e.g. `response_format`.
+ * @param options - The deadline of the Groq call.
+ * @returns The Groq response.
+ */
+async function _complete(
+  prompt: PromptTemplate,
+  lane: GroqLane,
+  messages: ChatMessage[],
+  body: Record<string, unknown>,
+  options: GroqCallOptions = {},
+): Promise<AxiosResponse<any>> {
+  const trace: GroqCallTrace = { queueWaitMs: 0, upstreamMs: 0, attempts: 0 };
   try {
-    const response = await groqApi.post('', {
+    const response = await groqRequest(lane, (signal) => groqApi.post('', {
       model: MODEL,
-      messages: [
-        { role: 'system', content: systemPrompt },
+      messages,
+      ...body,
+    }, { signal }), { ...options, trace });
+    const content = response.data?.choices?.[0]?.message?.content;
+    llmUsage.recordCall({
+      endpoint: prompt.name,
+      model: response.data?.model ?? MODEL,
+      usage: response.data?.usage,
+      promptChars: _messagesLength(messages),
+      completionChars: typeof content === 'string' ? content.length : 0,
+      ...trace,
+    });
+    return response;
+  } catch (err) {
+    llmUsage.recordFailure(prompt.name);
+    throw err;
+  }
+}
+
+function _messagesLength(messages: ChatMessage[]): number {
+  return messages.reduce((total, message) => total + message.content.length, 0);
+}
+
+/**
+ * Returns the offline fallback suggestion used when the Groq configuration is missing.
+ * @param query - The recipe query.
+ * @returns A single mock recipe.
+ */
+function _mockRecipes(query: RecipeQuery): SuggestRecipesResponse {
+  console.warn('Using fallback mock recipes (missing GROQ_API_URL or GROQ_API_KEY)');
+  const mock: RecipeSuggestion[] = [
+    {
+      id: randomUUID(),
+      title: 'Simple Masala Khichdi',
+      shortDescription:
+        'Comforting one-pot rice and dal with spices, perfect for quick Indian dinner.',
+      cuisineRegion: 'North Indian',
+      isVegetarian: true,
+      tags: ['one-pot', 'light', 'comfort'],
+      estimatedTimeMinutes: 25,
+      difficulty: 'easy',
+      ingredients: [
+        {
+          name: 'Rice',
+          quantity: '1 cup',
+          isFromUserKitchen: query.ingredients.includes('rice'),
+        },
+        {
+          name: 'Moong dal',
+          quantity: '1/2 cup',
+          isFromUserKitchen: query.ingredients.includes('dal'),
+        },
         {
-          role: 'user',
-          content:
-            'Generate 3 Indian recipes as JSON object with shape {"recipes": RecipeSuggestion[]}. ' +
-            'Return ONLY JSON. Input: ' + JSON.stringify(userPrompt),
+          name: 'Onion',
+          quantity: '1 small, chopped',
+          isFromUserKitchen: query.ingredients.includes('onion'),
         },
       ],
-      response_format: { type: 'json_object' },
-    });
+      steps: [
+        'Wash rice and dal together.',
+        'In a pressure cooker, temper jeera, ginger, and chilli.',
+        'Add onion, tomato, spices, then rice+dal and water.',
+        'Pressure cook for 2–3 whistles until soft.',
+      ],
+      tips: ['Adjust water for softer or drier khichdi.', 'Serve with curd and pickle.'],
+    },
+  ];
+
+  return { recipes: mock };
+}
 
-    const choice = response.data?.choices?.[0]?.message?.content;
-    if (!choice) {
-      throw new Error('No content from LLM');
+/**
+ * Looks up cached suggestions for a query: an exact (possibly stale) hit first, then a
+ * similar cached query, then recipes from the local corpus that cover the pantry well.
+ * Stale exact hits are refreshed in the background.
+ * @param query - The recipe query.
+ * @param fingerprint - The canonical fingerprint of the query.
+ * @param cacheKey - The cache key derived from the fingerprint.
+ * @param info - Receives the cache status.
+ * @returns The cached suggestions, or undefined on a miss.
+ */
+async function _findCachedRecipes(
+  query: RecipeQuery,
+  fingerprint: QueryFingerprint,
+  cacheKey: string,
+  info: LlmCallInfo,
+): Promise<SuggestRecipesResponse | undefined> {
+  const cached = await _readThrough<SuggestRecipesResponse>(cacheKey);
+  if (cached) {
+    similarityIndex.recordLookup('exact');
+    if (cached.stale) {
+      info.cacheStatus = 'stale';
+      console.log('Returning stale cached recipe suggestions, refreshing in background');
+      revalidate(cacheKey, () => _requestRecipes(query, fingerprint, cacheKey));
+    } else {
+      info.cacheStatus = 'hit';
+      console.log('Returning cached recipe suggestions');
     }
+    return cached.data;
+  }
 
-    let raw: any;
-    try {
-      raw = typeof choice === 'string' ? JSON.parse(choice) : choice;
-    } catch {
-      throw new Error('Failed to parse LLM JSON');
+  for (const match of similarityIndex.findSimilar(fingerprint)) {
+    const similar = await _readThrough<SuggestRecipesResponse>(match.cacheKey);
+    if (!similar) {
+      similarityIndex.remove(match.cacheKey);
+      continue;
     }
+    similarityIndex.recordLookup('similar');
+    info.cacheStatus = 'similar';
+    console.log(`Returning similar cached recipe suggestions (similarity ${match.similarity.toFixed(2)})`);
+    return _markUserKitchenIngredients(similar.data, query);
+  }
+
+  similarityIndex.recordLookup('miss');
+  const fromCorpus = recipeCorpus.search(query, RECIPES_PER_SUGGESTION);
+  if (fromCorpus) {
+    info.cacheStatus = 'corpus';
+    console.log('Returning recipe suggestions from the local corpus');
+    return _markUserKitchenIngredients({ recipes: fromCorpus }, query);
+  }
+
+  info.cacheStatus = 'miss';
+  return undefined;
+}
 
-    const recipesSource: any[] = Array.isArray(raw.recipes) ? raw.recipes : Array.isArray(raw) ? raw : [];
-    if (!recipesSource.length) {
-      throw new Error('Invalid AI response format: no recipes array');
+export async function generateRecipesFromLlama(
+  query: RecipeQuery,
+  info: LlmCallInfo = {},
+  options: GroqCallOptions = {},
+): Promise<SuggestRecipesResponse> {
+  const fingerprint = fingerprintQuery(query);
+  const cacheKey = `${RECIPES_KEY_PREFIX}${fingerprint.key}`;
+  const cached = await _findCachedRecipes(query, fingerprint, cacheKey, info);
+  if (cached) {
+    return cached;
+  }
+
+  return _requestRecipes(query, fingerprint, cacheKey, options);
+}
+
+/**
+ * Asks the LLM for recipe suggestions and caches the normalized result.
+ * Concurrent requests for the same cache key share one LLM call, which runs with the lane's own
+ * deadline; the caller's deadline only bounds how long it waits for the shared call.
+ * @param query - The recipe query.
+ * @param fingerprint - The canonical fingerprint of the query.
+ * @param cacheKey - The cache key derived from the fingerprint.
+ * @param options - The caller's deadline.
+ * @returns The normalized suggestions.
+ */
+async function _requestRecipes(
+  query: RecipeQuery,
+  fingerprint: QueryFingerprint,
+  cacheKey: string,
+  options: GroqCallOptions = {},
+): Promise<SuggestRecipesResponse> {
+  console.log('Groq LLM config:', { hasUrl: !!BASE_URL, hasKey: !!API_KEY, model: MODEL });
+
+  if (!BASE_URL || !API_KEY) {
+    return _mockRecipes(query);
+  }
+
+  return singleFlight(cacheKey, async () => {
+    try {
+      const response = await _complete(RECIPES_PROMPT, 'suggest', _recipesMessages(query), {
+        response_format: { type: 'json_object' },
+      });
+
+      const choice = response.data?.choices?.[0]?.message?.content;
+      if (!choice) {
+        throw new Error('No content from LLM');
+      }
+
+      const { recipes: recipesSource, complete } = await _parseRecipes(choice, query);
+      if (!recipesSource.length) {
+        throw new Error('Invalid AI response format: no recipes array');
+      }
+
+      const result = {
+        recipes: recipesSource.map((r: any, index: number) => _normalizeRecipe(r, undefined, index)),
+      };
+      
+      // A partly salvaged answer is served, but not cached, so the next request tries for a full one.
+      if (complete) {
+        _writeThrough(cacheKey, result);
+        similarityIndex.add(fingerprint, cacheKey);
+        recipeCorpus.add(result.recipes, query);
+        recipeVectors.addAll(result.recipes);
+      }
+      return result;
+    } catch (err: any) {
+      console.error('Groq API error:', err.response?.status, err.response?.data || err.message);
+      throw Object.assign(new Error('LLM request failed'), { code: err?.code });
     }
+  }, options);
+}
 
-    const result = {
-      recipes: recipesSource.map((r: any, index: number) => _normalizeRecipe(r, undefined, index)),
-    };
-    
-    cache.set(cacheKey, result);
-    return result;
+/**
+ * Returns the recipes array of a parsed suggestion response.
+ */
+function _recipesArray(raw: any): any[] {
+  return Array.isArray(raw?.recipes) ? raw.recipes : Array.isArray(raw) ? raw : [];
+}
+
+/**
+ * Returns the recipes of a repaired suggestion response that were not cut off.
+ */
+function _completeRecipes(repaired: RepairedJson | undefined): any[] {
+  if (!repaired) return [];
+  const path = Array.isArray(repaired.value?.recipes) ? ['recipes'] : [];
+  const cut = new Set(truncatedMembers(repaired, path));
+  return _recipesArray(repaired.value).filter((r, index) => !cut.has(index) && r && r.title);
+}
+
+/**
+ * Extracts the recipes from a suggestion completion. When the JSON is truncated or malformed,
+ * every complete recipe object is salvaged and only the missing recipes are requested again.
+ * @param content - The completion content.
+ * @param query - The recipe query, for the follow-up request.
+ * @returns The raw recipes, and whether the response is complete enough to cache.
+ */
+async function _parseRecipes(
+  content: unknown,
+  query: RecipeQuery,
+): Promise<{ recipes: any[]; complete: boolean }> {
+  if (typeof content !== 'string') {
+    return { recipes: _recipesArray(content), complete: true };
+  }
+  try {
+    return { recipes: _recipesArray(JSON.parse(content)), complete: true };
+  } catch {
+    // Salvage below.
+  }
+
+  // Recipe objects that were closed before the output broke off are intact.
+  let salvaged = new RecipeStreamParser().push(content).filter((r) => r && r.title);
+  if (!salvaged.length) {
+    salvaged = _completeRecipes(repairJson(content));
+  }
+  if (!salvaged.length) {
+    llmJsonRepairs.inc({ endpoint: 'suggest', outcome: 'failed' });
+    throw new Error('Failed to parse LLM JSON');
+  }
+  if (salvaged.length >= RECIPES_PER_SUGGESTION) {
+    llmJsonRepairs.inc({ endpoint: 'suggest', outcome: 'repaired' });
+    return { recipes: salvaged, complete: true };
+  }
+
+  const missing = RECIPES_PER_SUGGESTION - salvaged.length;
+  try {
+    const more = await _requestMoreRecipes(query, salvaged, missing);
+    const complete = more.length >= missing;
+    llmJsonRepairs.inc({ endpoint: 'suggest', outcome: complete ? 'completed' : 'partial' });
+    return { recipes: [...salvaged, ...more.slice(0, missing)], complete };
   } catch (err: any) {
-    console.error('Groq API error:', err.response?.status, err.response?.data || err.message);
-    throw new Error('LLM request failed');
+    console.warn(`Could not complete a truncated suggestion (${salvaged.length} salvaged):`, err?.message || err);
+    llmJsonRepairs.inc({ endpoint: 'suggest', outcome: 'partial' });
+    return { recipes: salvaged, complete: false };
   }
 }
 
-const translateCache = new Map<string, string>();
+/**
+ * Asks the LLM for the recipes missing from a truncated suggestion response.
+ * @param query - The recipe query.
+ * @param existing - The recipes already salvaged, which must not be repeated.
+ * @param count - How many recipes are missing.
+ * @returns The additional raw recipes.
+ */
+async function _requestMoreRecipes(query: RecipeQuery, existing: any[], count: number): Promise<any[]> {
+  const input = { alreadySuggested: existing.map((r) => String(r.title)), ..._recipesPromptPayload(query) };
+  const messages = RECIPES_MORE_PROMPT.messages(JSON.stringify(input), `Generate ${count} `);
+  const response = await _complete(RECIPES_MORE_PROMPT, 'suggest', messages, {
+    response_format: { type: 'json_object' },
+  });
+  const choice = response.data?.choices?.[0]?.message?.content;
+  if (typeof choice !== 'string') return _recipesArray(choice).filter((r) => r && r.title);
+  return _completeRecipes(repairJson(choice));
+}
+
+/**
+ * The recipes a shared suggestion stream has produced so far, and the callers following it.
+ */
+interface LiveRecipes {
+  recipes: RecipeSuggestion[];
+  listeners: Set<(recipe: RecipeSuggestion) => void>;
+}
+
+// Live recipes of the streams in flight, by cache key, so callers that join a stream can replay it.
+const liveStreams = new Map<string, LiveRecipes>();
+
+/**
+ * Generates recipe suggestions like `generateRecipesFromLlama`, but calls `onRecipe` for each
+ * recipe as soon as it is available. Cached results are replayed immediately; otherwise the
+ * completion is streamed and every recipe is emitted once its JSON object has closed.
+ * Concurrent requests for the same cache key share one LLM call: a caller that joins a stream
+ * replays the recipes emitted so far and then follows it, and one that joins a plain suggestion
+ * call gets its recipes when it finishes.
+ * @param query - The recipe query.
+ * @param onRecipe - Called with each normalized recipe, in order.
+ * @param info - Receives the cache status.
+ * @param options - The caller's deadline and a signal that stops its wait, e.g. when the client
+ * disconnects. Neither stops the shared call.
+ * @returns All suggestions once the stream has finished.
+ */
+export async function streamRecipesFromLlama(
+  query: RecipeQuery,
+  onRecipe: (recipe: RecipeSuggestion) => void,
+  info: LlmCallInfo = {},
+  options: GroqCallOptions = {},
+): Promise<SuggestRecipesResponse> {
+  const fingerprint = fingerprintQuery(query);
+  const cacheKey = `${RECIPES_KEY_PREFIX}${fingerprint.key}`;
+  const cached = await _findCachedRecipes(query, fingerprint, cacheKey, info);
+  if (cached) {
+    cached.recipes.forEach((recipe) => onRecipe(recipe));
+    return cached;
+  }
 
-export async function translateText(text: string, targetLang: 'en' | 'hi' | 'mr'): Promise<string> {
   if (!BASE_URL || !API_KEY) {
-    throw new Error('GROQ config missing');
+    const mock = _mockRecipes(query);
+    mock.recipes.forEach((recipe) => onRecipe(recipe));
+    return mock;
   }
 
-  const trimmed = text.trim();
-  if (!trimmed) return '';
+  const leader = !isInFlight(cacheKey);
+  if (leader) liveStreams.set(cacheKey, { recipes: [], listeners: new Set() });
+  // Undefined when joining a plain suggestion call, which has nothing to replay.
+  const live = liveStreams.get(cacheKey);
 
-  const cacheKey = `${targetLang}:${trimmed}`;
-  const cached = translateCache.get(cacheKey);
-  if (cached) return cached;
+  let sent = 0;
+  const forward = (recipe: RecipeSuggestion) => {
+    sent++;
+    onRecipe(recipe);
+  };
+  live?.recipes.forEach(forward);
+  live?.listeners.add(forward);
+  try {
+    const result = await singleFlight(
+      cacheKey,
+      () => _streamRecipes(query, fingerprint, cacheKey, live ?? { recipes: [], listeners: new Set() }),
+      options,
+    );
+    // Recipes this caller has not seen yet, e.g. from a call that did not stream.
+    result.recipes.slice(sent).forEach(forward);
+    return result;
+  } catch (err: any) {
+    if (options.signal?.aborted) {
+      throw new Error('Recipe stream aborted by client');
+    }
+    throw err;
+  } finally {
+    live?.listeners.delete(forward);
+    if (leader && liveStreams.get(cacheKey) === live) liveStreams.delete(cacheKey);
+  }
+}
 
-  const systemPrompt =
-    'You are a precise translator for short app UI and recipe-related text. ' +
-    'Supported languages: English (en), Hindi (hi), Marathi (mr). ' +
-    'Return ONLY the translated text, no quotes, no JSON, no extra commentary.';
+/**
+ * Streams recipe suggestions from the LLM, tops up a stream that ended short and caches the result
+ * once it is complete. This is the shared call behind `streamRecipesFromLlama`, so it runs with
+ * the lane's own deadline and no client signal.
+ * @param query - The recipe query.
+ * @param fingerprint - The canonical fingerprint of the query.
+ * @param cacheKey - The cache key derived from the fingerprint.
+ * @param live - Receives each recipe as it is parsed and passes it on to the callers following it.
+ * @returns All suggestions once the stream has finished.
+ */
+async function _streamRecipes(
+  query: RecipeQuery,
+  fingerprint: QueryFingerprint,
+  cacheKey: string,
+  live: LiveRecipes,
+): Promise<SuggestRecipesResponse> {
+  const parser = new RecipeStreamParser();
+  const decoder = new StringDecoder('utf8');
+  const recipes: RecipeSuggestion[] = [];
+  let pendingLine = '';
+
+  let completionChars = 0;
+  let usage: llmUsage.GroqUsage | undefined;
+  const publish = (raw: any) => {
+    const recipe = _normalizeRecipe(raw, undefined, recipes.length);
+    recipes.push(recipe);
+    live.recipes.push(recipe);
+    for (const listener of live.listeners) {
+      try {
+        listener(recipe);
+      } catch (err: any) {
+        // One caller's failure (e.g. a closed response) must not end the stream for the others.
+        console.error('Recipe stream listener failed:', err?.message || err);
+      }
+    }
+  };
+  const emit = (content: string) => {
+    completionChars += content.length;
+    parser.push(content).forEach(publish);
+  };
 
-  const langLabel = targetLang === 'en' ? 'English' : targetLang === 'hi' ? 'Hindi' : 'Marathi';
+  const onLine = (line: string) => {
+    emit(_streamDelta(line));
+    usage = _streamUsage(line) ?? usage;
+  };
 
+  const messages = _recipesMessages(query);
+  const trace: GroqCallTrace = { queueWaitMs: 0, upstreamMs: 0, attempts: 0 };
   try {
-    const response = await groqApi.post('', {
+    // JSON mode cannot be combined with streaming, so the prompt alone asks for JSON here.
+    // A hedged stream would emit recipes from two completions, so streams are never hedged.
+    const response = await groqRequest('suggest', (attemptSignal) => groqApi.post(
+      '',
+      { model: MODEL, messages, stream: true },
+      { responseType: 'stream', signal: attemptSignal },
+    ), { hedge: false, trace });
+    const headersAt = Date.now();
+
+    for await (const chunk of response.data as AsyncIterable<Buffer>) {
+      const lines = (pendingLine + decoder.write(chunk)).split('\n');
+      pendingLine = lines.pop() ?? '';
+      lines.forEach(onLine);
+    }
+    onLine(pendingLine + decoder.end());
+    llmUsage.recordCall({
+      endpoint: `${RECIPES_PROMPT.name}_stream`,
       model: MODEL,
-      messages: [
-        { role: 'system', content: systemPrompt },
-        {
-          role: 'user',
-          content:
-            `Translate this text into ${langLabel}. If it is already in that language, return it unchanged. Text: "${trimmed}"`,
-        },
-      ],
+      usage,
+      promptChars: _messagesLength(messages),
+      completionChars,
+      ...trace,
+      // For a stream, upstream time runs until the last chunk rather than the response headers.
+      upstreamMs: trace.upstreamMs + (Date.now() - headersAt),
     });
+  } catch (err: any) {
+    llmUsage.recordFailure(`${RECIPES_PROMPT.name}_stream`);
+    console.error('Groq streaming error:', err.response?.status, err.message);
+    throw Object.assign(new Error('LLM request failed'), { code: err?.code });
+  }
 
-    const choice = response.data?.choices?.[0]?.message?.content;
-    if (!choice || typeof choice !== 'string') {
-      throw new Error('No content from Groq for translation');
-    }
+  if (!recipes.length) {
+    throw new Error('Invalid AI response format: no recipes array');
+  }
 
-    const translated = choice.trim();
-    translateCache.set(cacheKey, translated);
-    return translated;
-  } catch (err: any) {
-    if (err.response?.status === 429) {
-      console.warn('Groq translation rate limit hit');
-      throw new Error('Translation rate limit reached, please wait and try again.');
+  // A stream that was cut off short is topped up like a truncated plain answer.
+  const missing = RECIPES_PER_SUGGESTION - recipes.length;
+  if (missing > 0) {
+    try {
+      const more = await _requestMoreRecipes(query, recipes, missing);
+      more.slice(0, missing).forEach(publish);
+    } catch (err: any) {
+      console.warn(`Could not complete a truncated stream (${recipes.length} received):`, err?.message || err);
     }
-    console.error('Groq translate error:', err.response?.status, err.response?.data || err.message);
-    throw new Error('Translation failed');
+    llmJsonRepairs.inc({
+      endpoint: 'suggest_stream',
+      outcome: recipes.length >= RECIPES_PER_SUGGESTION ? 'completed' : 'partial',
+    });
+  }
+
+  const result = { recipes };
+  // A partial answer is served, but not cached, so the next request tries for a full one.
+  if (recipes.length >= RECIPES_PER_SUGGESTION) {
+    _writeThrough(cacheKey, result);
+    similarityIndex.add(fingerprint, cacheKey);
+    recipeCorpus.add(recipes, query);
+    recipeVectors.addAll(recipes);
   }
+  return result;
 }
 
-export async function generateRecipeDetailsFromGroq(base: RecipeSuggestion): Promise<RecipeSuggestion> {
-  const cacheKey = `recipe-details-${base.id}-${base.title}-${base.cuisineRegion}`;
-  const cached = cache.get<RecipeSuggestion>(cacheKey);
-  if (cached) {
-    console.log(`Returning cached recipe details for ${base.id}`);
-    return cached;
+/**
+ * Extracts the content delta from one server-sent-events line of a streamed completion.
+ * @param line - A raw line such as `data: {"choices":[{"delta":{"content":"..."}}]}`.
+ * @returns The content fragment, or an empty string for keep-alives, `[DONE]` and bad lines.
+ */
+function _streamDelta(line: string): string {
+  const trimmed = line.trim();
+  if (!trimmed.startsWith('data:')) return '';
+  const payload = trimmed.slice('data:'.length).trim();
+  if (payload === '[DONE]') return '';
+  try {
+    return JSON.parse(payload)?.choices?.[0]?.delta?.content ?? '';
+  } catch {
+    return '';
   }
+}
+
+/**
+ * Extracts the token usage from the final chunk of a streamed completion. Groq reports it in
+ * `x_groq.usage`; OpenAI-compatible servers in a top-level `usage` field.
+ * @param line - A raw server-sent-events line.
+ * @returns The usage block, or undefined if the line has none.
+ */
+function _streamUsage(line: string): llmUsage.GroqUsage | undefined {
+  // Only the last chunk carries usage; skip parsing every content chunk a second time.
+  if (!line.includes('"usage"')) return undefined;
+  try {
+    const chunk = JSON.parse(line.trim().slice('data:'.length));
+    return chunk?.x_groq?.usage ?? chunk?.usage ?? undefined;
+  } catch {
+    return undefined;
+  }
+}
+
+export type TranslationLanguage = 'en' | 'hi' | 'mr';
+export const TRANSLATION_LANGUAGES: TranslationLanguage[] = ['en', 'hi', 'mr'];
+
+const TRANSLATE_PROMPT = definePrompt({
+  name: 'translate',
+  system:
+    'You are a precise translator for short app UI and recipe-related text. ' +
+    'Supported languages: English (en), Hindi (hi), Marathi (mr). ' +
+    'Return ONLY the translated text, no quotes, no JSON, no extra commentary.',
+  instructions: 'If it is already in that language, return it unchanged. Text: "',
+  staticBudgetTokens: 80,
+  promptBudgetTokens: 300,
+});
+
+const TRANSLATE_BATCH_TOKEN_BUDGET = Number(process.env.TRANSLATE_BATCH_TOKEN_BUDGET) || 1500;
+
+const TRANSLATE_BATCH_PROMPT = definePrompt({
+  name: 'translate_batch',
+  system:
+    'You are a precise translator for short app UI and recipe-related text. ' +
+    'Supported languages: English (en), Hindi (hi), Marathi (mr). ' +
+    'You receive a JSON object mapping ids to texts and respond ONLY with a JSON object ' +
+    '{"translations": {id: translatedText}} containing every id exactly once.',
+  instructions: 'Return any value already in that language unchanged. Input: ',
+  staticBudgetTokens: 100,
+  promptBudgetTokens: TRANSLATE_BATCH_TOKEN_BUDGET,
+});
+
+/**
+ * Returns the English name of a supported language, as used in prompts.
+ * @param targetLang - The language code.
+ * @returns The language name.
+ */
+function _languageLabel(targetLang: TranslationLanguage): string {
+  return targetLang === 'en' ? 'English' : targetLang === 'hi' ? 'Hindi' : 'Marathi';
+}
+
+export async function translateText(
+  text: string,
+  targetLang: TranslationLanguage,
+  options: GroqCallOptions = {},
+): Promise<string> {
+  const trimmed = text.trim();
+  if (!trimmed) return '';
+
+  const cached = await translationMemory.lookup(targetLang, trimmed);
+  if (cached) return cached;
 
   if (!BASE_URL || !API_KEY) {
     throw new Error('GROQ config missing');
   }
 
-  const systemPrompt =
-    'You are an expert Indian chef and nutritionist. Respond ONLY with strict JSON for a single detailed recipe. ' +
-    'Use friendly text and you MAY include relevant food emojis INSIDE string values (ingredients, steps, tips), ' +
-    'but never add text outside JSON. Follow the RecipeSuggestion schema exactly. ' +
-    'CRITICAL: You MUST generate ALL required fields: ingredients (array), steps (array), tips (array), and nutrition (object). ' +
-    'Do not omit any of these fields. Each should have meaningful content.';
+  const langLabel = _languageLabel(targetLang);
+
+  const flightKey = `translate-${targetLang}:${translationMemory.normalizeSource(trimmed)}`;
+  return singleFlight(flightKey, async () => {
+    try {
+      const messages = TRANSLATE_PROMPT.messages(`${trimmed}"`, `Translate this text into ${langLabel}. `);
+      const response = await _complete(TRANSLATE_PROMPT, 'translate', messages, {});
+
+      const choice = response.data?.choices?.[0]?.message?.content;
+      if (!choice || typeof choice !== 'string') {
+        throw new Error('No content from Groq for translation');
+      }
+
+      const translated = choice.trim();
+      translationMemory.store(targetLang, trimmed, translated);
+      return translated;
+    } catch (err: any) {
+      if (err.response?.status === 429) {
+        console.warn('Groq translation rate limit hit');
+        throw new Error('Translation rate limit reached, please wait and try again.');
+      }
+      console.error('Groq translate error:', err.response?.status, err.response?.data || err.message);
+      throw Object.assign(new Error('Translation failed'), { code: err?.code });
+    }
+  }, options);
+}
+
+export interface TranslationBatchItem {
+  text: string;
+  status: 'ok' | 'error';
+  translation?: string;
+  error?: string;
+}
+
+/**
+ * Translates many strings with as few LLM calls as possible. Inputs are deduplicated, translation
+ * memory hits are served directly, and the misses are packed into JSON-indexed prompts that fit
+ * TRANSLATE_BATCH_TOKEN_BUDGET. Items missing or unusable in a batched answer are retried one by one.
+ * @param texts - The strings to translate.
+ * @param targetLang - The target language.
+ * @param options - The deadline shared by the Groq calls.
+ * @returns One result per input string, in input order.
+ */
+export async function translateBatch(
+  texts: string[],
+  targetLang: TranslationLanguage,
+  options: GroqCallOptions = {},
+): Promise<TranslationBatchItem[]> {
+  const unique = [...new Set(texts.map((text) => String(text ?? '').trim()).filter(Boolean))];
+  const translations = new Map<string, string>();
+  const errors = new Map<string, string>();
+  const misses: string[] = [];
+
+  await Promise.all(
+    unique.map(async (text) => {
+      const cached = await translationMemory.lookup(targetLang, text);
+      if (cached) translations.set(text, cached);
+      else misses.push(text);
+    }),
+  );
+
+  const retries: string[] = [];
+  await Promise.all(
+    _packTranslations(misses).map(async (group) => {
+      try {
+        const translated = await _requestTranslationGroup(group, targetLang, options);
+        group.forEach((text, index) => {
+          const value = translated[String(index)];
+          if (typeof value === 'string' && value.trim()) {
+            translations.set(text, value.trim());
+            translationMemory.store(targetLang, text, value.trim());
+          } else {
+            retries.push(text);
+          }
+        });
+      } catch (err: any) {
+        console.warn('Batched translation failed, retrying items individually:', err?.message || err);
+        retries.push(...group);
+      }
+    }),
+  );
+
+  await Promise.all(
+    retries.map(async (text) => {
+      try {
+        translations.set(text, await translateText(text, targetLang, options));
+      } catch (err: any) {
+        errors.set(text, err?.message || 'Translation failed');
+      }
+    }),
+  );
+
+  return texts.map((text): TranslationBatchItem => {
+    const trimmed = String(text ?? '').trim();
+    if (!trimmed) return { text, status: 'ok', translation: '' };
+    const translation = translations.get(trimmed);
+    return translation !== undefined
+      ? { text, status: 'ok', translation }
+      : { text, status: 'error', error: errors.get(trimmed) ?? 'Translation failed' };
+  });
+}
+
+/**
+ * Packs strings into groups whose estimated prompt and completion size fits the token budget.
+ * @param texts - The strings to pack.
+ * @returns The groups, each with at least one string.
+ */
+function _packTranslations(texts: string[]): string[][] {
+  const fixedTokens = TRANSLATE_BATCH_PROMPT.staticTokens + 50;
+  const groups: string[][] = [];
+  let current: string[] = [];
+  let used = fixedTokens;
+
+  for (const text of texts) {
+    // The source once in the prompt, twice for the translated output, plus the JSON index overhead.
+    // Translations are roughly as long as their source, but Devanagari output costs more tokens
+    // per character, hence the doubled output estimate.
+    const cost = Math.ceil((text.length * 3) / CHARS_PER_TOKEN) + 8;
+    if (current.length > 0 && used + cost > TRANSLATE_BATCH_TOKEN_BUDGET) {
+      groups.push(current);
+      current = [];
+      used = fixedTokens;
+    }
+    current.push(text);
+    used += cost;
+  }
+  if (current.length > 0) groups.push(current);
+  return groups;
+}
+
+/**
+ * Translates a group of strings with one LLM call using a JSON object keyed by position.
+ * @param texts - The strings in the group.
+ * @param targetLang - The target language.
+ * @param options - The deadline of the Groq call.
+ * @returns The parsed `translations` object, keyed by the stringified index.
+ */
+async function _requestTranslationGroup(
+  texts: string[],
+  targetLang: TranslationLanguage,
+  options: GroqCallOptions = {},
+): Promise<Record<string, unknown>> {
+  if (!BASE_URL || !API_KEY) {
+    throw new Error('GROQ config missing');
+  }
+
+  const indexed = Object.fromEntries(texts.map((text, index) => [String(index), text]));
+  const messages = TRANSLATE_BATCH_PROMPT.messages(
+    JSON.stringify(indexed),
+    `Translate every value into ${_languageLabel(targetLang)}. `,
+  );
+  const response = await _complete(TRANSLATE_BATCH_PROMPT, 'translate', messages, {
+    response_format: { type: 'json_object' },
+  }, options);
+
+  const choice = response.data?.choices?.[0]?.message?.content;
+  if (!choice || typeof choice !== 'string') {
+    throw new Error('No content from Groq for translation');
+  }
+
+  // Keys lost to a truncated response are retried one by one by the caller.
+  const raw = _parseOrRepair(choice, 'translate_batch').value;
+  const translated = raw?.translations ?? raw;
+  if (!translated || typeof translated !== 'object') {
+    throw new Error('Invalid batched translation format');
+  }
+  return translated as Record<string, unknown>;
+}
+
+/**
+ * Builds the cache key for the enriched details of a recipe.
+ * @param base - The base recipe.
+ * @returns The details cache key.
+ */
+function _detailsCacheKey(base: RecipeSuggestion): string {
+  return `recipe-details-${base.id}-${base.title}-${base.cuisineRegion}`;
+}
+
+// Details calls started by a prefetch that no user has asked for yet; their Groq calls wait
+// behind every foreground call until a user joins them.
+const backgroundDetails = new Set<string>();
+
+/**
+ * Speculatively enriches the top suggestions in the background so that opening one of them
+ * is served from the details cache. Does nothing unless prefetching is enabled. Recipes that
+ * are already cached (in memory or on disk) or being enriched are skipped when the job runs.
+ * @param recipes - The suggestions just returned to the user, best first.
+ */
+export function prefetchRecipeDetails(recipes: RecipeSuggestion[]): void {
+  if (!prefetch.isEnabled() || !BASE_URL || !API_KEY) return;
+  const jobs = recipes
+    .slice(0, prefetch.TOP_N)
+    .map((base) => ({ base, key: _detailsCacheKey(base) }))
+    .filter(({ key }) => !cache.has(key))
+    .map(({ base, key }) => ({ key, run: () => _prefetchRecipeDetails(base, key) }));
+  prefetch.schedule(jobs);
+}
+
+/**
+ * Runs one prefetch job at background priority.
+ * @param base - The base recipe to enrich.
+ * @param cacheKey - The details cache key for this recipe.
+ * @returns False if the details were already cached or being fetched, true once fetched.
+ */
+async function _prefetchRecipeDetails(base: RecipeSuggestion, cacheKey: string): Promise<boolean> {
+  if ((await _readThrough(cacheKey)) || isInFlight(cacheKey)) return false;
+  backgroundDetails.add(cacheKey);
+  try {
+    await singleFlight(cacheKey, () =>
+      _fetchRecipeDetails(base, cacheKey, { background: () => backgroundDetails.has(cacheKey) }),
+    );
+    return true;
+  } finally {
+    backgroundDetails.delete(cacheKey);
+  }
+}
 
-  const userPrompt = {
+export async function generateRecipeDetailsFromGroq(
+  base: RecipeSuggestion,
+  info: LlmCallInfo = {},
+  options: GroqCallOptions = {},
+): Promise<RecipeSuggestion> {
+  const cacheKey = _detailsCacheKey(base);
+  const cached = await _readThrough<RecipeSuggestion>(cacheKey);
+  if (cached) {
+    prefetch.recordHit(cacheKey);
+    if (cached.stale) {
+      info.cacheStatus = 'stale';
+      console.log(`Returning stale cached recipe details for ${base.id}, refreshing in background`);
+      revalidate(cacheKey, () => _requestRecipeDetails(base, cacheKey));
+    } else {
+      info.cacheStatus = 'hit';
+      console.log(`Returning cached recipe details for ${base.id}`);
+    }
+    return cached.data;
+  }
+
+  info.cacheStatus = 'miss';
+  return _requestRecipeDetails(base, cacheKey, options);
+}
+
+const DETAILS_SYSTEM_PROMPT =
+  'You are an expert Indian chef and nutritionist. Respond ONLY with strict JSON for a single detailed recipe. ' +
+  'Use friendly text and you MAY include relevant food emojis INSIDE string values (ingredients, steps, tips), ' +
+  'but never add text outside JSON. Follow the RecipeSuggestion schema exactly. ' +
+  'CRITICAL: You MUST generate ALL required fields: ingredients (array), steps (array), tips (array), and nutrition (object). ' +
+  'Do not omit any of these fields. Each should have meaningful content.';
+
+const DETAILS_REQUIREMENTS =
+  'CRITICAL REQUIREMENTS: ' +
+  '1. ingredients: Array with 5-10 specific ingredients with quantities ' +
+  '2. steps: Array with 4-8 clear cooking steps ' +
+  '3. tips: Array with 2-4 helpful cooking tips ' +
+  '4. nutrition: Object with estimated nutritional values PER SERVING: ' +
+  '   { calories: number, protein: number (grams), carbs: number (grams), fat: number (grams), fiber: number (grams), sugar: number (grams) } ' +
+  'All fields MUST be populated with meaningful content. Estimate realistic nutritional values based on the ingredients. ';
+
+// Expected size of one enriched recipe in a completion, used when batching details requests.
+const DETAILS_OUTPUT_TOKENS = 700;
+const DETAILS_BATCH_TOKEN_BUDGET = Number(process.env.DETAILS_BATCH_TOKEN_BUDGET) || 6000;
+
+const DETAILS_PROMPT = definePrompt({
+  name: 'details',
+  system: DETAILS_SYSTEM_PROMPT,
+  instructions:
+    'Given this rough recipe idea, return ONE enriched RecipeSuggestion JSON object. ' +
+    DETAILS_REQUIREMENTS +
+    'Base recipe: ',
+  staticBudgetTokens: 300,
+  promptBudgetTokens: 600,
+});
+
+// Asks only for the fields that were missing from a truncated details response.
+const DETAILS_FILL_PROMPT = definePrompt({
+  name: 'details_fill',
+  system: DETAILS_SYSTEM_PROMPT,
+  instructions:
+    'for this recipe as a JSON object with exactly those keys. ' +
+    DETAILS_REQUIREMENTS +
+    'Recipe: ',
+  staticBudgetTokens: 300,
+  promptBudgetTokens: 600,
+});
+
+// The fields a details response must contain; anything else is filled in from the base recipe.
+const DETAILS_REQUIRED_FIELDS = ['ingredients', 'steps', 'tips', 'nutrition'] as const;
+
+// The batch prompt starts with the number of recipes, passed as the message prefix.
+const DETAILS_BATCH_PROMPT = definePrompt({
+  name: 'details_batch',
+  system: DETAILS_SYSTEM_PROMPT,
+  instructions:
+    'rough recipe ideas, return a JSON object {"recipes": RecipeSuggestion[]} ' +
+    'with ONE enriched recipe per idea, in the same order, keeping each "id" unchanged. ' +
+    DETAILS_REQUIREMENTS +
+    'Base recipes: ',
+  staticBudgetTokens: 320,
+  promptBudgetTokens: DETAILS_BATCH_TOKEN_BUDGET,
+});
+
+/**
+ * Builds the compact description of a base recipe that is sent to the LLM for enrichment.
+ * @param base - The base recipe.
+ * @returns The prompt payload.
+ */
+function _detailsPromptPayload(base: RecipeSuggestion) {
+  return {
     id: base.id,
     title: base.title,
     shortDescription: base.shortDescription,
@@ -293,25 +1139,294 @@ export async function generateRecipeDetailsFromGroq(base: RecipeSuggestion): Pro
     difficulty: base.difficulty,
     existingIngredients: base.ingredients,
   };
+}
+
+/**
+ * Asks the LLM to enrich a base recipe with ingredients, steps, tips and nutrition,
+ * and caches the normalized result. Concurrent requests for the same recipe share one call,
+ * which runs with the lane's own deadline.
+ * @param base - The base recipe to enrich.
+ * @param cacheKey - The details cache key for this recipe.
+ * @param options - The caller's deadline, which only bounds its wait for the shared call.
+ * @returns The enriched recipe.
+ */
+async function _requestRecipeDetails(
+  base: RecipeSuggestion,
+  cacheKey: string,
+  options: GroqCallOptions = {},
+): Promise<RecipeSuggestion> {
+  if (!BASE_URL || !API_KEY) {
+    throw new Error('GROQ config missing');
+  }
+
+  // A user now waits for this recipe, so a prefetch already fetching it stops yielding.
+  backgroundDetails.delete(cacheKey);
+  return singleFlight(cacheKey, () => _fetchRecipeDetails(base, cacheKey), options);
+}
+
+/**
+ * Makes the details call for `_requestRecipeDetails`. When the response had to be repaired, the
+ * fields it lost are asked for with a follow-up call, and the result is only cached once they
+ * are complete. Well-formed responses are cached as they are. Prefetches pass `background`
+ * options so that these calls wait behind user traffic.
+ */
+async function _fetchRecipeDetails(
+  base: RecipeSuggestion,
+  cacheKey: string,
+  options: GroqCallOptions = {},
+): Promise<RecipeSuggestion> {
+  const userPrompt = _detailsPromptPayload(base);
+  const response = await _complete(DETAILS_PROMPT, 'details', DETAILS_PROMPT.messages(JSON.stringify(userPrompt)), {
+    response_format: { type: 'json_object' },
+  }, options);
+
+  const choice = response.data?.choices?.[0]?.message?.content;
+  if (!choice) {
+    throw new Error('No content from Groq for details');
+  }
+
+  const parsed = _parseOrRepair(choice, 'details');
+  const { recipe, path } = _detailsRecipe(parsed.value);
+  let r = recipe;
+  if (!r || !r.title) {
+    throw new Error('Invalid detailed recipe format');
+  }
+
+  // A response cut off before its last fields keeps what it has; only the rest is asked for again.
+  let complete = true;
+  const missing = parsed.truncated.length ? _missingDetailFields(r, truncatedMembers(parsed, path)) : [];
+  if (missing.length) {
+    let filled: Record<string, unknown> = {};
+    try {
+      filled = await _requestDetailFields(base, r, missing, options);
+    } catch (err: any) {
+      console.warn(`Could not fill ${missing.join(', ')} for ${base.id}:`, err?.message || err);
+    }
+    r = { ...r, ...filled };
+    complete = missing.every((field) => field in filled);
+    llmJsonRepairs.inc({ endpoint: 'details', outcome: complete ? 'completed' : 'partial' });
+  }
+
+  const result = _normalizeRecipe(r, base);
+  if (complete) {
+    _writeThrough(cacheKey, result);
+    recipeCorpus.enrich(result);
+    recipeVectors.add(result);
+  }
+  return result;
+}
+
+/**
+ * Parses a JSON completion, repairing it when it was truncated or malformed.
+ * @param content - The completion content, or an already parsed value.
+ * @param endpoint - The prompt name, for the repair counters.
+ * @returns The parsed value, and what the repair had to cut off.
+ */
+function _parseOrRepair(content: unknown, endpoint: string): RepairedJson {
+  if (typeof content !== 'string') return { value: content, repaired: false, truncated: [] };
+  try {
+    return { value: JSON.parse(content), repaired: false, truncated: [] };
+  } catch {
+    // Repair below.
+  }
+  const repaired = repairJson(content);
+  llmJsonRepairs.inc({ endpoint, outcome: repaired ? 'repaired' : 'failed' });
+  if (!repaired) {
+    throw new Error(`Failed to parse Groq JSON for ${endpoint}`);
+  }
+  return repaired;
+}
+
+/**
+ * Returns the recipe of a details response, which may be wrapped in a `recipes` array,
+ * and its path in the response.
+ */
+function _detailsRecipe(raw: any): { recipe: any; path: Array<string | number> } {
+  return Array.isArray(raw?.recipes) ? { recipe: raw.recipes[0], path: ['recipes', 0] } : { recipe: raw, path: [] };
+}
+
+/**
+ * Lists the required details fields that are absent, empty or were cut off in a recipe.
+ * @param r - The raw recipe from the LLM.
+ * @param truncated - The fields a JSON repair cut off.
+ * @returns The missing field names.
+ */
+function _missingDetailFields(r: any, truncated: Array<string | number> = []): string[] {
+  return DETAILS_REQUIRED_FIELDS.filter((field) => {
+    if (truncated.includes(field)) return true;
+    const value = r?.[field];
+    if (field === 'nutrition') {
+      return !value || typeof value !== 'object' || Object.keys(value).length === 0;
+    }
+    return !Array.isArray(value) || value.length === 0;
+  });
+}
+
+/**
+ * Asks the LLM for the details fields that were missing from, or cut off in, a truncated response.
+ * @param base - The base recipe.
+ * @param partial - The fields already received.
+ * @param fields - The missing field names.
+ * @param options - The priority of the call, passed on from the details call.
+ * @returns An object with the requested fields that came back non-empty.
+ */
+async function _requestDetailFields(
+  base: RecipeSuggestion,
+  partial: any,
+  fields: string[],
+  options: GroqCallOptions = {},
+): Promise<Record<string, unknown>> {
+  const input = {
+    ..._detailsPromptPayload(base),
+    ingredients: Array.isArray(partial.ingredients) && partial.ingredients.length ? partial.ingredients : base.ingredients,
+  };
+  const messages = DETAILS_FILL_PROMPT.messages(JSON.stringify(input), `Return only ${fields.join(', ')} `);
+  const response = await _complete(DETAILS_FILL_PROMPT, 'details', messages, {
+    response_format: { type: 'json_object' },
+  }, options);
+
+  const choice = response.data?.choices?.[0]?.message?.content;
+  const parsed = _parseOrRepair(choice, 'details_fill');
+  const { recipe: filled, path } = _detailsRecipe(parsed.value);
+  const missingAfter = new Set(_missingDetailFields(filled, truncatedMembers(parsed, path)));
+  return Object.fromEntries(fields.filter((field) => !missingAfter.has(field)).map((field) => [field, filled[field]]));
+}
+
+export interface RecipeDetailsBatchItem {
+  id: string;
+  status: 'ok' | 'error';
+  recipe?: RecipeSuggestion;
+  cacheStatus?: LlmCallInfo['cacheStatus'];
+  error?: string;
+}
+
+/**
+ * Enriches several recipes at once. Cached recipes are served from the cache; the misses are
+ * grouped into as few LLM prompts as fit DETAILS_BATCH_TOKEN_BUDGET, and the returned array is
+ * split back into individual recipes. One failing recipe or group does not fail the others.
+ * @param bases - The base recipes to enrich.
+ * @param options - The deadline shared by the Groq calls.
+ * @returns One result per input recipe, in input order.
+ */
+export async function generateRecipeDetailsBatch(
+  bases: RecipeSuggestion[],
+  options: GroqCallOptions = {},
+): Promise<RecipeDetailsBatchItem[]> {
+  const results: RecipeDetailsBatchItem[] = new Array(bases.length);
+  const misses = new Map<string, { base: RecipeSuggestion; indexes: number[] }>();
+
+  await Promise.all(
+    bases.map(async (base, index) => {
+      const cacheKey = _detailsCacheKey(base);
+      const cached = await _readThrough<RecipeSuggestion>(cacheKey);
+      if (!cached) {
+        const miss = misses.get(cacheKey) ?? { base, indexes: [] };
+        miss.indexes.push(index);
+        misses.set(cacheKey, miss);
+        return;
+      }
+      prefetch.recordHit(cacheKey);
+      if (cached.stale) {
+        revalidate(cacheKey, () => _requestRecipeDetails(base, cacheKey));
+      }
+      results[index] = { id: base.id, status: 'ok', recipe: cached.data, cacheStatus: cached.stale ? 'stale' : 'hit' };
+    }),
+  );
+
+  const settle = (key: string, outcome: Promise<RecipeSuggestion>) =>
+    outcome.then(
+      (recipe) => misses.get(key)!.indexes.forEach((i) => {
+        results[i] = { id: bases[i].id, status: 'ok', recipe, cacheStatus: 'miss' };
+      }),
+      (err: any) => misses.get(key)!.indexes.forEach((i) => {
+        results[i] = { id: bases[i].id, status: 'error', error: err?.message || 'Failed to generate recipe details' };
+      }),
+    );
+
+  // Recipes already being enriched elsewhere join that call instead of being batched again.
+  const pending: Promise<void>[] = [];
+  const toBatch: Array<{ key: string; base: RecipeSuggestion }> = [];
+  for (const [key, { base }] of misses) {
+    if (isInFlight(key)) {
+      pending.push(settle(key, _requestRecipeDetails(base, key, options)));
+    } else {
+      toBatch.push({ key, base });
+    }
+  }
 
-  const response = await groqApi.post('', {
-    model: MODEL,
-    messages: [
-      { role: 'system', content: systemPrompt },
-      {
-        role: 'user',
-        content:
-          'Given this rough recipe idea, return ONE enriched RecipeSuggestion JSON object. ' +
-          'CRITICAL REQUIREMENTS: ' +
-          '1. ingredients: Array with 5-10 specific ingredients with quantities ' +
-          '2. steps: Array with 4-8 clear cooking steps ' +
-          '3. tips: Array with 2-4 helpful cooking tips ' +
-          '4. nutrition: Object with estimated nutritional values PER SERVING: ' +
-          '   { calories: number, protein: number (grams), carbs: number (grams), fat: number (grams), fiber: number (grams), sugar: number (grams) } ' +
-          'All fields MUST be populated with meaningful content. Estimate realistic nutritional values based on the ingredients. ' +
-          'Base recipe: ' + JSON.stringify(userPrompt),
-      },
-    ],
+  // Other requests may join these calls, so they run with the lane's deadline rather than this
+  // request's, which only bounds how long this request waits for them.
+  for (const group of _groupByTokenBudget(toBatch)) {
+    // Started by the first of these flights that runs here. In cluster mode a flight may take
+    // another worker's result without running, and then no group call should be made for it.
+    let groupResult: Promise<Map<string, RecipeSuggestion>> | undefined;
+    const groupCall = () => {
+      if (!groupResult) groupResult = _requestRecipeDetailsGroup(group.map(({ base }) => base));
+      return groupResult;
+    };
+    for (const { key, base } of group) {
+      const item = singleFlight(key, () =>
+        groupCall().then((recipes) => {
+          const recipe = recipes.get(base.id);
+          // Left out of the batched answer (e.g. cut off with it): enrich this recipe on its own.
+          if (!recipe) return _fetchRecipeDetails(base, key);
+          _writeThrough(key, recipe);
+          recipeCorpus.enrich(recipe);
+          recipeVectors.add(recipe);
+          return recipe;
+        }),
+        options,
+      );
+      pending.push(settle(key, item));
+    }
+  }
+
+  await Promise.all(pending);
+  return results;
+}
+
+/**
+ * Splits recipes into groups whose estimated prompt plus completion size fits the token budget.
+ * @param items - The recipes to group, with their cache keys.
+ * @returns The groups, each with at least one recipe.
+ */
+function _groupByTokenBudget<T extends { base: RecipeSuggestion }>(items: T[]): T[][] {
+  const fixedTokens = DETAILS_BATCH_PROMPT.staticTokens;
+  const groups: T[][] = [];
+  let current: T[] = [];
+  let used = fixedTokens;
+
+  for (const item of items) {
+    const cost =
+      Math.ceil(JSON.stringify(_detailsPromptPayload(item.base)).length / CHARS_PER_TOKEN) + DETAILS_OUTPUT_TOKENS;
+    if (current.length > 0 && used + cost > DETAILS_BATCH_TOKEN_BUDGET) {
+      groups.push(current);
+      current = [];
+      used = fixedTokens;
+    }
+    current.push(item);
+    used += cost;
+  }
+  if (current.length > 0) groups.push(current);
+  return groups;
+}
+
+/**
+ * Enriches a group of recipes with one LLM call.
+ * Returned recipes are matched to their base by id, falling back to position.
+ * @param bases - The base recipes in the group.
+ * @returns The enriched recipes keyed by base recipe id.
+ */
+async function _requestRecipeDetailsGroup(bases: RecipeSuggestion[]): Promise<Map<string, RecipeSuggestion>> {
+  if (!BASE_URL || !API_KEY) {
+    throw new Error('GROQ config missing');
+  }
+
+  const messages = DETAILS_BATCH_PROMPT.messages(
+    JSON.stringify(bases.map(_detailsPromptPayload)),
+    `Given these ${bases.length} `,
+  );
+  const response = await _complete(DETAILS_BATCH_PROMPT, 'details', messages, {
     response_format: { type: 'json_object' },
   });
 
@@ -320,19 +1435,55 @@ export async function generateRecipeDetailsFromGroq(base: RecipeSuggestion): Pro
     throw new Error('No content from Groq for details');
   }
 
-  let raw: any;
+  const items = _parseDetailsBatch(choice);
+  const byId = new Map(items.filter((r) => r && r.id).map((r) => [String(r.id), r]));
+  const enriched = new Map<string, RecipeSuggestion>();
+  bases.forEach((base, index) => {
+    const r = byId.get(base.id) ?? (items.length === bases.length ? items[index] : undefined);
+    if (r && r.title) {
+      enriched.set(base.id, _normalizeRecipe(r, base));
+    }
+  });
+  return enriched;
+}
+
+/**
+ * Extracts the recipes from a batched details completion. When the JSON is truncated or
+ * malformed, only the recipe objects that were closed before it broke off are kept; the caller
+ * fetches the others one by one.
+ * @param content - The completion content.
+ * @returns The raw recipes.
+ */
+function _parseDetailsBatch(content: unknown): any[] {
+  if (typeof content !== 'string') return _recipesArray(content);
   try {
-    raw = typeof choice === 'string' ? JSON.parse(choice) : choice;
+    return _recipesArray(JSON.parse(content));
   } catch {
+    // Salvage below.
+  }
+  const salvaged = new RecipeStreamParser().push(content);
+  llmJsonRepairs.inc({ endpoint: 'details_batch', outcome: salvaged.length ? 'partial' : 'failed' });
+  if (!salvaged.length) {
     throw new Error('Failed to parse Groq JSON for details');
   }
+  return salvaged;
+}
 
-  const r = raw.recipes && Array.isArray(raw.recipes) ? raw.recipes[0] : raw;
-  if (!r || !r.title) {
-    throw new Error('Invalid detailed recipe format');
+/**
+ * Warms the in-memory recipe and details caches from the persistent tier, and indexes the warmed
+ * suggestions for similar-query lookups. Call once after the database has been initialized.
+ * @param limit - The maximum number of persisted entries to load.
+ * @returns A promise that resolves to the number of entries loaded.
+ */
+export async function warmLlmCaches(limit = Number(process.env.LLM_CACHE_WARM_ROWS) || 200): Promise<number> {
+  const entries = await persistentCache.loadRecent<any>(limit);
+  // Oldest first, so the similarity index keeps the newest entries if it overflows.
+  for (const entry of [...entries].reverse()) {
+    _promote(entry.key, entry);
+    const fingerprint = entry.key.startsWith(RECIPES_KEY_PREFIX)
+      ? parseFingerprintKey(entry.key.slice(RECIPES_KEY_PREFIX.length))
+      : undefined;
+    if (fingerprint) similarityIndex.add(fingerprint, entry.key);
   }
-
-  const result = _normalizeRecipe(r, base);
-  cache.set(cacheKey, result);
-  return result;
-}
\ No newline at end of file
+  return entries.length;
+}
@@ -0,0 +1,160 @@
+import { CHARS_PER_TOKEN } from './prompts';
+
+// This service accounts for every LLM call: prompt, completion and total tokens (from the `usage`
+// block of the Groq response, or estimated from the prompt and completion size when a response
+// has none), the model, the time spent queued in the transport and the upstream latency.
+// Calls are aggregated per endpoint for GET /ai/usage and, unless LLM_USAGE_LOG=0, logged one line each.
+
+const LOG_CALLS = process.env.LLM_USAGE_LOG !== '0';
+// Upstream latencies kept per endpoint for the percentiles.
+const LATENCY_SAMPLES = 200;
+
+export interface GroqUsage {
+  prompt_tokens?: number;
+  completion_tokens?: number;
+  total_tokens?: number;
+}
+
+export interface LlmCallRecord {
+  /** The prompt template used, e.g. `details_batch`. */
+  endpoint: string;
+  model: string;
+  /** The `usage` block from the response, if the response had one. */
+  usage?: GroqUsage;
+  /** Characters sent in the prompt and received in the completion, for the estimate fallback. */
+  promptChars: number;
+  completionChars: number;
+  queueWaitMs: number;
+  upstreamMs: number;
+  attempts: number;
+}
+
+export interface EndpointUsage {
+  calls: number;
+  failures: number;
+  /** Calls whose token counts were estimated because the response had no usage block. */
+  estimatedCalls: number;
+  promptTokens: number;
+  completionTokens: number;
+  totalTokens: number;
+  avgPromptTokens: number;
+  avgCompletionTokens: number;
+  avgQueueWaitMs: number;
+  avgUpstreamMs: number;
+  p50UpstreamMs: number;
+  p95UpstreamMs: number;
+  retries: number;
+  models: Record<string, number>;
+}
+
+interface Aggregate {
+  calls: number;
+  failures: number;
+  estimatedCalls: number;
+  promptTokens: number;
+  completionTokens: number;
+  totalQueueWaitMs: number;
+  totalUpstreamMs: number;
+  retries: number;
+  models: Map<string, number>;
+  latencies: number[];
+}
+
+const endpoints = new Map<string, Aggregate>();
+
+/**
+ * Returns the aggregate for an endpoint, creating it on first use.
+ */
+function aggregateFor(endpoint: string): Aggregate {
+  let aggregate = endpoints.get(endpoint);
+  if (!aggregate) {
+    aggregate = {
+      calls: 0,
+      failures: 0,
+      estimatedCalls: 0,
+      promptTokens: 0,
+      completionTokens: 0,
+      totalQueueWaitMs: 0,
+      totalUpstreamMs: 0,
+      retries: 0,
+      models: new Map(),
+      latencies: [],
+    };
+    endpoints.set(endpoint, aggregate);
+  }
+  return aggregate;
+}
+
+function percentile(samples: number[], p: number): number {
+  if (samples.length === 0) return 0;
+  const sorted = [...samples].sort((a, b) => a - b);
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * p))];
+}
+
+/**
+ * Records a completed LLM call.
+ * @param call - The call's endpoint, model, usage and timings.
+ */
+export function recordCall(call: LlmCallRecord): void {
+  const estimated = !call.usage?.prompt_tokens && !call.usage?.completion_tokens;
+  const promptTokens = estimated ? Math.ceil(call.promptChars / CHARS_PER_TOKEN) : call.usage?.prompt_tokens ?? 0;
+  const completionTokens = estimated
+    ? Math.ceil(call.completionChars / CHARS_PER_TOKEN)
+    : call.usage?.completion_tokens ?? 0;
+
+  const aggregate = aggregateFor(call.endpoint);
+  aggregate.calls++;
+  if (estimated) aggregate.estimatedCalls++;
+  aggregate.promptTokens += promptTokens;
+  aggregate.completionTokens += completionTokens;
+  aggregate.totalQueueWaitMs += call.queueWaitMs;
+  aggregate.totalUpstreamMs += call.upstreamMs;
+  aggregate.retries += Math.max(0, call.attempts - 1);
+  aggregate.models.set(call.model, (aggregate.models.get(call.model) ?? 0) + 1);
+  aggregate.latencies.push(call.upstreamMs);
+  if (aggregate.latencies.length > LATENCY_SAMPLES) aggregate.latencies.shift();
+
+  if (LOG_CALLS) {
+    console.log(
+      `LLM ${call.endpoint}: model=${call.model} prompt=${promptTokens} completion=${completionTokens} ` +
+        `total=${promptTokens + completionTokens}${estimated ? ' (estimated)' : ''} ` +
+        `queued=${call.queueWaitMs}ms upstream=${call.upstreamMs}ms attempts=${call.attempts}`,
+    );
+  }
+}
+
+/**
+ * Records an LLM call that failed after all retries.
+ * @param endpoint - The prompt template used.
+ */
+export function recordFailure(endpoint: string): void {
+  aggregateFor(endpoint).failures++;
+}
+
+/**
+ * Returns token and latency aggregates per endpoint.
+ * @returns The usage statistics keyed by endpoint.
+ */
+export function stats(): Record<string, EndpointUsage> {
+  const result: Record<string, EndpointUsage> = {};
+  for (const [endpoint, aggregate] of endpoints) {
+    const calls = aggregate.calls || 1;
+    result[endpoint] = {
+      calls: aggregate.calls,
+      failures: aggregate.failures,
+      estimatedCalls: aggregate.estimatedCalls,
+      promptTokens: aggregate.promptTokens,
+      completionTokens: aggregate.completionTokens,
+      totalTokens: aggregate.promptTokens + aggregate.completionTokens,
+      avgPromptTokens: Math.round(aggregate.promptTokens / calls),
+      avgCompletionTokens: Math.round(aggregate.completionTokens / calls),
+      avgQueueWaitMs: Math.round(aggregate.totalQueueWaitMs / calls),
+      avgUpstreamMs: Math.round(aggregate.totalUpstreamMs / calls),
+      p50UpstreamMs: percentile(aggregate.latencies, 0.5),
+      p95UpstreamMs: percentile(aggregate.latencies, 0.95),
+      retries: aggregate.retries,
+      models: Object.fromEntries(aggregate.models),
+    };
+  }
+  return result;
+}
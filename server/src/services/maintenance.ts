@@ -0,0 +1,159 @@
+import * as cache from './cache';
+import * as persistentCache from './persistentCache';
+import * as translationMemory from './translationMemory';
+import { cleanupExpiredFavorites } from './favorites.service';
+import { optimize } from './db';
+
+// This service runs housekeeping jobs in the background of the API process: purging expired
+// favorites, sweeping expired entries out of the in-memory caches, compacting the SQLite LLM cache
+// and refreshing SQLite's planner statistics. Each job runs on its own interval, never overlaps
+// with itself, and records how long it took and how many rows or entries it removed.
+
+const FAVORITES_PURGE_INTERVAL_MS = Number(process.env.FAVORITES_PURGE_INTERVAL_MS) || 1000 * 60 * 60;
+const CACHE_SWEEP_INTERVAL_MS = Number(process.env.CACHE_SWEEP_INTERVAL_MS) || 1000 * 60;
+const LLM_CACHE_COMPACT_INTERVAL_MS = Number(process.env.LLM_CACHE_COMPACT_INTERVAL_MS) || 1000 * 60 * 10;
+const SQLITE_OPTIMIZE_INTERVAL_MS = Number(process.env.SQLITE_OPTIMIZE_INTERVAL_MS) || 1000 * 60 * 60 * 6;
+// The first run of each job is spread over this window so jobs (and cluster workers) do not all start at once.
+const MAX_START_DELAY_MS = 1000 * 30;
+
+export interface MaintenanceJob {
+  name: string;
+  intervalMs: number;
+  /** Does the work and returns the number of rows or entries removed. */
+  run: () => Promise<number>;
+}
+
+export interface JobStats {
+  runs: number;
+  failures: number;
+  running: boolean;
+  lastRunAt?: string;
+  lastDurationMs: number;
+  totalDurationMs: number;
+  lastRemoved: number;
+  totalRemoved: number;
+  lastError?: string;
+}
+
+const jobs = new Map<string, { job: MaintenanceJob; stats: JobStats; timer?: NodeJS.Timeout }>();
+let started = false;
+
+/**
+ * Adds a job to the scheduler. Jobs registered after `startMaintenance` are started immediately.
+ * @param job - The job to schedule.
+ */
+export function registerJob(job: MaintenanceJob): void {
+  if (jobs.has(job.name)) {
+    throw new Error(`Maintenance job ${job.name} is already registered`);
+  }
+  jobs.set(job.name, {
+    job,
+    stats: { runs: 0, failures: 0, running: false, lastDurationMs: 0, totalDurationMs: 0, lastRemoved: 0, totalRemoved: 0 },
+  });
+  if (started) schedule(job.name);
+}
+
+/**
+ * Runs a job now unless it is already running.
+ * @param name - The job name.
+ * @returns A promise that resolves to the number of rows removed, or undefined if the job was skipped or failed.
+ */
+export async function runJob(name: string): Promise<number | undefined> {
+  const entry = jobs.get(name);
+  if (!entry || entry.stats.running) return undefined;
+
+  const { job, stats } = entry;
+  stats.running = true;
+  stats.lastRunAt = new Date().toISOString();
+  const start = Date.now();
+  try {
+    const removed = await job.run();
+    stats.lastRemoved = removed;
+    stats.totalRemoved += removed;
+    stats.lastError = undefined;
+    if (removed > 0) {
+      console.log(`Maintenance job ${name} removed ${removed} rows in ${Date.now() - start} ms.`);
+    }
+    return removed;
+  } catch (err: any) {
+    stats.failures++;
+    stats.lastError = err?.message || String(err);
+    console.error(`Maintenance job ${name} failed:`, stats.lastError);
+    return undefined;
+  } finally {
+    stats.runs++;
+    stats.lastDurationMs = Date.now() - start;
+    stats.totalDurationMs += stats.lastDurationMs;
+    stats.running = false;
+  }
+}
+
+/**
+ * Starts the timer for one job: a first run after a random delay, then one run per interval.
+ * Timers are unref'd so they never keep the process alive on their own.
+ */
+function schedule(name: string): void {
+  const entry = jobs.get(name);
+  if (!entry || entry.timer) return;
+  const delay = Math.random() * Math.min(entry.job.intervalMs, MAX_START_DELAY_MS);
+  entry.timer = setTimeout(() => {
+    void runJob(name);
+    entry.timer = setInterval(() => void runJob(name), entry.job.intervalMs);
+    entry.timer.unref();
+  }, delay);
+  entry.timer.unref();
+}
+
+/**
+ * Registers the built-in jobs and starts every job's timer.
+ * Call once after the database has been initialized.
+ */
+export function startMaintenance(): void {
+  if (started) return;
+  started = true;
+  if (jobs.has('favorites_purge')) {
+    // Restarted after stopMaintenance; the built-in jobs are already registered.
+    for (const name of jobs.keys()) schedule(name);
+    return;
+  }
+
+  registerJob({ name: 'favorites_purge', intervalMs: FAVORITES_PURGE_INTERVAL_MS, run: () => cleanupExpiredFavorites() });
+  registerJob({
+    name: 'cache_sweep',
+    intervalMs: CACHE_SWEEP_INTERVAL_MS,
+    run: async () => cache.sweep() + translationMemory.sweep(),
+  });
+  registerJob({ name: 'llm_cache_compact', intervalMs: LLM_CACHE_COMPACT_INTERVAL_MS, run: () => persistentCache.compact() });
+  registerJob({
+    name: 'sqlite_optimize',
+    intervalMs: SQLITE_OPTIMIZE_INTERVAL_MS,
+    run: async () => {
+      await optimize();
+      return 0;
+    },
+  });
+}
+
+/**
+ * Stops every job's timer, e.g. during shutdown. Runs already in progress finish on their own.
+ */
+export function stopMaintenance(): void {
+  for (const entry of jobs.values()) {
+    clearTimeout(entry.timer);
+    clearInterval(entry.timer);
+    entry.timer = undefined;
+  }
+  started = false;
+}
+
+/**
+ * Returns run counts, timings and removed-row totals for every job.
+ * @returns The statistics keyed by job name.
+ */
+export function stats(): Record<string, JobStats> {
+  const result: Record<string, JobStats> = {};
+  for (const [name, entry] of jobs) {
+    result[name] = { ...entry.stats };
+  }
+  return result;
+}
@@ -0,0 +1,226 @@
+import { NextFunction, Request, Response } from 'express';
+
+// This service is a small Prometheus-style metrics registry. Hot paths only bump counters and
+// histogram buckets held in maps; values that other services already track (cache sizes, queue
+// depths, hit counts) are read through collectors when /metrics is scraped, so they cost nothing
+// until then. `render` produces the Prometheus text exposition format.
+
+export type Labels = Record<string, string | number>;
+export type MetricType = 'counter' | 'gauge' | 'histogram';
+export type Sample = [Labels, number];
+
+interface Metric {
+  name: string;
+  help: string;
+  type: MetricType;
+  lines(): string[];
+}
+
+// Seconds; covers fast cache hits through slow LLM completions.
+const DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+const registry = new Map<string, Metric>();
+
+/**
+ * Formats a label set as `{a="1",b="2"}` (or nothing for an empty set).
+ */
+function formatLabels(labels: Labels): string {
+  const parts = Object.entries(labels).map(
+    ([key, value]) => `${key}="${String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n')}"`,
+  );
+  return parts.length ? `{${parts.join(',')}}` : '';
+}
+
+function labelKey(labels: Labels): string {
+  return Object.keys(labels)
+    .sort()
+    .map((key) => `${key}=${labels[key]}`)
+    .join('|');
+}
+
+function register<T extends Metric>(metric: T): T {
+  if (registry.has(metric.name)) {
+    throw new Error(`Metric ${metric.name} is already registered`);
+  }
+  registry.set(metric.name, metric);
+  return metric;
+}
+
+export class Counter implements Metric {
+  readonly type = 'counter';
+  readonly name: string;
+  readonly help: string;
+  private readonly series = new Map<string, { labels: Labels; value: number }>();
+
+  constructor(name: string, help: string) {
+    this.name = name;
+    this.help = help;
+  }
+
+  /**
+   * Increases the counter for a label set.
+   * @param labels - The label values.
+   * @param value - The (non-negative) increment.
+   */
+  inc(labels: Labels = {}, value = 1): void {
+    const key = labelKey(labels);
+    const entry = this.series.get(key);
+    if (entry) entry.value += value;
+    else this.series.set(key, { labels, value });
+  }
+
+  lines(): string[] {
+    return [...this.series.values()].map(({ labels, value }) => `${this.name}${formatLabels(labels)} ${value}`);
+  }
+}
+
+export class Histogram implements Metric {
+  readonly type = 'histogram';
+  readonly name: string;
+  readonly help: string;
+  private readonly buckets: number[];
+  private readonly series = new Map<string, { labels: Labels; counts: number[]; sum: number; count: number }>();
+
+  constructor(name: string, help: string, buckets = DEFAULT_BUCKETS) {
+    this.name = name;
+    this.help = help;
+    this.buckets = buckets;
+  }
+
+  /**
+   * Records one observation.
+   * @param labels - The label values.
+   * @param value - The observed value, in the histogram's unit.
+   */
+  observe(labels: Labels, value: number): void {
+    const key = labelKey(labels);
+    let entry = this.series.get(key);
+    if (!entry) {
+      entry = { labels, counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+      this.series.set(key, entry);
+    }
+    const index = this.buckets.findIndex((bound) => value <= bound);
+    if (index >= 0) entry.counts[index]++;
+    entry.sum += value;
+    entry.count++;
+  }
+
+  /**
+   * Starts timing an operation.
+   * @param labels - The label values.
+   * @returns A function that records the elapsed seconds; extra labels can be added when it is called.
+   */
+  startTimer(labels: Labels = {}): (extra?: Labels) => void {
+    const start = process.hrtime.bigint();
+    return (extra?: Labels) => {
+      this.observe(extra ? { ...labels, ...extra } : labels, Number(process.hrtime.bigint() - start) / 1e9);
+    };
+  }
+
+  lines(): string[] {
+    const lines: string[] = [];
+    for (const { labels, counts, sum, count } of this.series.values()) {
+      let cumulative = 0;
+      this.buckets.forEach((bound, i) => {
+        cumulative += counts[i];
+        lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: bound })} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${count}`);
+      lines.push(`${this.name}_sum${formatLabels(labels)} ${sum}`);
+      lines.push(`${this.name}_count${formatLabels(labels)} ${count}`);
+    }
+    return lines;
+  }
+}
+
+/**
+ * Creates and registers a counter.
+ * @param name - The metric name, e.g. `llm_retries_total`.
+ * @param help - One-line description.
+ * @returns The counter.
+ */
+export function counter(name: string, help: string): Counter {
+  return register(new Counter(name, help));
+}
+
+/**
+ * Creates and registers a histogram.
+ * @param name - The metric name, e.g. `http_request_duration_seconds`.
+ * @param help - One-line description.
+ * @param buckets - Upper bounds of the buckets, ascending.
+ * @returns The histogram.
+ */
+export function histogram(name: string, help: string, buckets?: number[]): Histogram {
+  return register(new Histogram(name, help, buckets));
+}
+
+/**
+ * Registers a metric whose samples are read from another service when metrics are scraped.
+ * @param name - The metric name.
+ * @param help - One-line description.
+ * @param type - 'counter' for running totals, 'gauge' for current values.
+ * @param read - Returns the current samples.
+ */
+export function collect(name: string, help: string, type: 'counter' | 'gauge', read: () => Sample[]): void {
+  register({
+    name,
+    help,
+    type,
+    lines: () => read().map(([labels, value]) => `${name}${formatLabels(labels)} ${Number(value) || 0}`),
+  });
+}
+
+/**
+ * Renders every registered metric in the Prometheus text exposition format.
+ * @returns The exposition text.
+ */
+export function render(): string {
+  const out: string[] = [];
+  for (const metric of registry.values()) {
+    let lines: string[];
+    try {
+      lines = metric.lines();
+    } catch (err: any) {
+      console.error(`Failed to collect metric ${metric.name}:`, err?.message || err);
+      continue;
+    }
+    out.push(`# HELP ${metric.name} ${metric.help}`, `# TYPE ${metric.name} ${metric.type}`, ...lines);
+  }
+  return out.join('\n') + '\n';
+}
+
+// Instruments shared across services.
+
+export const httpRequestDuration = histogram(
+  'http_request_duration_seconds',
+  'Express request latency by method, route and status code.',
+);
+export const llmRequestDuration = histogram(
+  'llm_request_duration_seconds',
+  'Latency of individual Groq attempts by lane and outcome.',
+);
+export const llmRetries = counter('llm_retries_total', 'Groq attempts retried after a failure, by lane.');
+export const llmRateLimited = counter('llm_rate_limited_total', 'Groq responses with status 429, by lane.');
+export const llmTokens = counter('llm_tokens_total', 'Tokens reported in the Groq usage field, by lane and kind.');
+export const llmJsonRepairs = counter(
+  'llm_json_repairs_total',
+  'LLM responses that were truncated, malformed or incomplete, by endpoint and outcome (repaired, completed, partial, failed).',
+);
+export const sqliteQueryDuration = histogram(
+  'sqlite_query_duration_seconds',
+  'SQLite query latency by query name, kind (read/write) and status (ok/error); queued writes include the wait to commit.',
+  [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1],
+);
+
+/**
+ * Express middleware recording the latency and status of every request. Routes are labelled by
+ * their pattern (e.g. `/favorites/:id`) rather than the raw path to keep label cardinality low.
+ */
+export function httpMetrics(req: Request, res: Response, next: NextFunction): void {
+  const stop = httpRequestDuration.startTimer();
+  res.once('finish', () => {
+    const route = req.route?.path !== undefined ? `${req.baseUrl}${req.route.path}` : 'unmatched';
+    stop({ method: req.method, route, status: res.statusCode });
+  });
+  next();
+}
@@ -0,0 +1,212 @@
+import { DEFAULT_TTL_MS, MAX_STALE_MS } from './cache';
+import { getDb, queryOne, withTransaction } from './db';
+
+// This service is the second (SQLite) tier behind the in-memory LLM caches.
+// Writes are buffered and flushed in one transaction (write-behind), reads go to SQLite only
+// after an in-memory miss (read-through), and a compaction (scheduled by the maintenance service)
+// removes expired rows and keeps the table under a fixed size. Entries survive restarts, so new instances come up warm.
+// Like the in-memory tier, each entry has a soft TTL (`staleAt`) after which it is served stale and
+// revalidated, and a hard TTL (`expiresAt`, LLM_CACHE_TTL_MS) after which it is gone.
+
+// Defaults to the in-memory hard TTL, so an entry read back from SQLite is served stale no longer
+// than it would have been from memory.
+const L2_TTL_MS = Number(process.env.LLM_CACHE_TTL_MS) || DEFAULT_TTL_MS + MAX_STALE_MS; // 7 hours
+const MAX_ROWS = Number(process.env.LLM_CACHE_MAX_ROWS) || 10000;
+const FLUSH_INTERVAL_MS = Number(process.env.LLM_CACHE_FLUSH_INTERVAL_MS) || 1000;
+const FLUSH_BATCH_SIZE = 100;
+
+export interface PersistedEntry<T> {
+  data: T;
+  /** End of the soft TTL, in epoch milliseconds. */
+  staleAt: number;
+  expiresAt: number;
+}
+
+export interface PersistentCacheStats {
+  hits: number;
+  misses: number;
+  writes: number;
+  flushes: number;
+  errors: number;
+  compactedRows: number;
+  pendingWrites: number;
+}
+
+interface PendingWrite {
+  value: string;
+  staleAt: number;
+  expiresAt: number;
+}
+
+const pending = new Map<string, PendingWrite>();
+const counters = { hits: 0, misses: 0, writes: 0, flushes: 0, errors: 0, compactedRows: 0 };
+let flushTimer: NodeJS.Timeout | undefined;
+let flushing: Promise<void> | undefined;
+
+/**
+ * Starts the flush timer on first use.
+ * The timer is unref'd so it never keeps the process alive on its own.
+ */
+function ensureTimers(): void {
+  if (!flushTimer) {
+    flushTimer = setInterval(() => void flush(), FLUSH_INTERVAL_MS);
+    flushTimer.unref();
+  }
+}
+
+/**
+ * Queues a value to be written to SQLite on the next flush.
+ * @param key - The cache key.
+ * @param data - The value to persist; must be JSON-serializable.
+ * @param ttlMs - How long the persisted entry stays valid.
+ * @param softTtlMs - How long it is served without being revalidated.
+ */
+export function persist<T>(key: string, data: T, ttlMs = L2_TTL_MS, softTtlMs = DEFAULT_TTL_MS): void {
+  ensureTimers();
+  const now = Date.now();
+  pending.set(key, { value: JSON.stringify(data), staleAt: now + Math.min(softTtlMs, ttlMs), expiresAt: now + ttlMs });
+  if (pending.size >= FLUSH_BATCH_SIZE) {
+    void flush();
+  }
+}
+
+/**
+ * Reads a value from the persistent tier. Pending (not yet flushed) writes are seen too.
+ * @param key - The cache key.
+ * @returns The persisted value and its soft and hard expiry, or undefined if absent or expired.
+ */
+export async function load<T>(key: string): Promise<PersistedEntry<T> | undefined> {
+  const now = Date.now();
+  const queued = pending.get(key);
+  if (queued && queued.expiresAt > now) {
+    counters.hits++;
+    return { data: JSON.parse(queued.value) as T, staleAt: queued.staleAt, expiresAt: queued.expiresAt };
+  }
+
+  try {
+    const row = await queryOne<{ value: string; stale_at: number; expires_at: number }>(
+      'llm_cache_select',
+      'SELECT value, stale_at, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?',
+      key,
+      now,
+    );
+    if (!row) {
+      counters.misses++;
+      return undefined;
+    }
+    counters.hits++;
+    return { data: JSON.parse(row.value) as T, staleAt: row.stale_at, expiresAt: row.expires_at };
+  } catch (err: any) {
+    counters.errors++;
+    console.error('Persistent cache read failed:', err?.message || err);
+    return undefined;
+  }
+}
+
+/**
+ * Returns the most recently written non-expired entries, used to warm the in-memory caches.
+ * @param limit - The maximum number of entries to return.
+ * @returns The entries with their keys, newest expiry first.
+ */
+export async function loadRecent<T>(limit: number): Promise<Array<PersistedEntry<T> & { key: string }>> {
+  try {
+    const rows = await getDb().all<{ key: string; value: string; stale_at: number; expires_at: number }[]>(
+      'SELECT key, value, stale_at, expires_at FROM llm_cache WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?',
+      Date.now(),
+      limit,
+    );
+    return rows.map((row) => ({
+      key: row.key,
+      data: JSON.parse(row.value) as T,
+      staleAt: row.stale_at,
+      expiresAt: row.expires_at,
+    }));
+  } catch (err: any) {
+    counters.errors++;
+    console.error('Persistent cache warm-up failed:', err?.message || err);
+    return [];
+  }
+}
+
+/**
+ * Writes all pending entries to SQLite in a single transaction.
+ * A call made while a flush is running waits for it and then writes whatever is still pending.
+ * If the transaction fails, the batch is queued again for the next flush, except for entries that
+ * have been superseded by a newer write or have expired in the meantime.
+ * @returns A promise that resolves when the pending entries have been written.
+ */
+export function flush(): Promise<void> {
+  if (flushing) return flushing.then(() => flush());
+  if (pending.size === 0) return Promise.resolve();
+
+  const batch = [...pending.entries()];
+  pending.clear();
+
+  flushing = (async () => {
+    try {
+      await withTransaction(async (db) => {
+        const stmt = await db.prepare(
+          'INSERT OR REPLACE INTO llm_cache (key, value, stale_at, expires_at) VALUES (?, ?, ?, ?)',
+        );
+        try {
+          for (const [key, entry] of batch) {
+            await stmt.run(key, entry.value, entry.staleAt, entry.expiresAt);
+          }
+        } finally {
+          await stmt.finalize();
+        }
+      });
+      counters.writes += batch.length;
+      counters.flushes++;
+    } catch (err: any) {
+      counters.errors++;
+      console.error('Persistent cache flush failed, will retry:', err?.message || err);
+      const now = Date.now();
+      for (const [key, entry] of batch) {
+        if (!pending.has(key) && entry.expiresAt > now) pending.set(key, entry);
+      }
+    }
+  })().finally(() => {
+    flushing = undefined;
+  });
+  return flushing;
+}
+
+/**
+ * Removes expired rows and, if the table is still over MAX_ROWS, the rows closest to expiry.
+ * @returns The number of rows removed; rejects if the compaction failed and nothing was removed.
+ */
+export async function compact(): Promise<number> {
+  try {
+    const removed = await withTransaction(async (db) => {
+      const expired = await db.run('DELETE FROM llm_cache WHERE expires_at <= ?', Date.now());
+      let count = expired.changes || 0;
+
+      const row = await db.get<{ count: number }>('SELECT COUNT(*) AS count FROM llm_cache');
+      const overflow = (row?.count ?? 0) - MAX_ROWS;
+      if (overflow > 0) {
+        const trimmed = await db.run(
+          'DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at ASC LIMIT ?)',
+          overflow,
+        );
+        count += trimmed.changes || 0;
+      }
+      return count;
+    });
+
+    counters.compactedRows += removed;
+    return removed;
+  } catch (err) {
+    // Counted here and reported by the caller (the maintenance scheduler records the failure).
+    counters.errors++;
+    throw err;
+  }
+}
+
+/**
+ * Returns read, write and compaction counters for the persistent tier.
+ * @returns The current persistent cache statistics.
+ */
+export function stats(): PersistentCacheStats {
+  return { ...counters, pendingWrites: pending.size };
+}
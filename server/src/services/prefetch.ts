@@ -0,0 +1,150 @@
+// This service speculatively warms the recipe details cache after suggestions are returned,
+// since most users open one of the suggested recipes next. It is opt-in (PREFETCH_DETAILS_TOP_N),
+// runs on a small worker pool, and yields to user traffic: while too many foreground AI requests
+// are in flight, queued prefetches are cancelled and no new ones are started. Once started, a
+// prefetch's Groq call waits behind every user call in the transport queue.
+
+export const TOP_N = Number(process.env.PREFETCH_DETAILS_TOP_N) || 0;
+const CONCURRENCY = Number(process.env.PREFETCH_CONCURRENCY) || 1;
+const MAX_FOREGROUND = Number(process.env.PREFETCH_MAX_FOREGROUND) || 4;
+const MAX_QUEUED = 50;
+const MAX_TRACKED = 5000;
+
+export interface PrefetchJob {
+  /** The details cache key the job will fill. */
+  key: string;
+  /** Produces and caches the details; resolves to false if they were cached or already being made. */
+  run: () => Promise<boolean>;
+}
+
+export interface PrefetchStats {
+  scheduled: number;
+  completed: number;
+  /** Jobs that found the details already cached or being fetched, and made no call. */
+  skipped: number;
+  failed: number;
+  cancelled: number;
+  used: number;
+  /** Share of completed prefetches that a user later read from the cache. */
+  usedRate: number;
+  queued: number;
+  running: number;
+  foreground: number;
+}
+
+const queue: PrefetchJob[] = [];
+const prefetchedKeys = new Set<string>();
+const counters = { scheduled: 0, completed: 0, skipped: 0, failed: 0, cancelled: 0, used: 0 };
+let running = 0;
+let foreground = 0;
+
+/**
+ * Whether speculative prefetching is enabled.
+ * @returns True when PREFETCH_DETAILS_TOP_N is greater than zero.
+ */
+export function isEnabled(): boolean {
+  return TOP_N > 0;
+}
+
+/**
+ * Marks the start of a foreground (user-facing) AI request.
+ * @returns A function to call exactly once when the request has finished.
+ */
+export function trackForeground(): () => void {
+  foreground++;
+  if (foreground > MAX_FOREGROUND) {
+    cancelQueued();
+  }
+  let done = false;
+  return () => {
+    if (done) return;
+    done = true;
+    foreground--;
+    drain();
+  };
+}
+
+/**
+ * Drops every queued prefetch because the server is busy with user requests.
+ */
+function cancelQueued(): void {
+  counters.cancelled += queue.length;
+  queue.length = 0;
+}
+
+/**
+ * Starts queued prefetches while there is spare capacity and foreground load is low.
+ */
+function drain(): void {
+  while (running < CONCURRENCY && queue.length > 0 && foreground <= MAX_FOREGROUND) {
+    const job = queue.shift()!;
+    running++;
+    Promise.resolve()
+      .then(job.run)
+      .then(
+        (fetched) => {
+          if (!fetched) {
+            counters.skipped++;
+            return;
+          }
+          counters.completed++;
+          prefetchedKeys.add(job.key);
+          if (prefetchedKeys.size > MAX_TRACKED) {
+            prefetchedKeys.delete(prefetchedKeys.values().next().value as string);
+          }
+        },
+        (err: any) => {
+          counters.failed++;
+          console.warn(`Prefetch failed for ${job.key}:`, err?.message || err);
+        },
+      )
+      .finally(() => {
+        running--;
+        drain();
+      });
+  }
+}
+
+/**
+ * Queues prefetch jobs at low priority. Jobs are dropped if the queue is full
+ * or the foreground load is already too high.
+ * @param jobs - The jobs to run, most important first.
+ */
+export function schedule(jobs: PrefetchJob[]): void {
+  if (!isEnabled()) return;
+  for (const job of jobs) {
+    if (foreground > MAX_FOREGROUND || queue.length >= MAX_QUEUED) {
+      counters.cancelled++;
+      continue;
+    }
+    if (queue.some((queued) => queued.key === job.key)) continue;
+    counters.scheduled++;
+    queue.push(job);
+  }
+  // Let the response that triggered the prefetch go out before starting any work.
+  setImmediate(drain);
+}
+
+/**
+ * Records a details cache hit so that prefetch usefulness can be measured.
+ * @param key - The details cache key that was hit.
+ */
+export function recordHit(key: string): void {
+  if (prefetchedKeys.delete(key)) {
+    counters.used++;
+  }
+}
+
+/**
+ * Returns prefetch counters, including how often a prefetched result was actually used.
+ * @returns The current prefetch statistics.
+ */
+export function stats(): PrefetchStats {
+  return {
+    ...counters,
+    usedRate: counters.completed ? counters.used / counters.completed : 0,
+    queued: queue.length,
+    running,
+    foreground,
+  };
+}
@@ -0,0 +1,110 @@
+// This service is the registry of the prompt templates sent to the LLM. Each template keeps its
+// static parts (the system prompt and fixed instructions) built once, and declares a budget for
+// their size and for the size of a whole prompt. Budgets live next to the prompt text, so a
+// change that makes a prompt noticeably longer also has to raise its budget in the same diff.
+
+// Rough token estimate: about 4 characters per token.
+export const CHARS_PER_TOKEN = 4;
+
+export interface ChatMessage {
+  role: 'system' | 'user' | 'assistant';
+  content: string;
+}
+
+export interface PromptDefinition {
+  /** Registry name, also used as the endpoint label in usage accounting. */
+  name: string;
+  system: string;
+  /** Fixed instructions sent in every user message; dynamic input is appended after them. */
+  instructions?: string;
+  /** Maximum estimated tokens of the static parts (system prompt plus instructions). */
+  staticBudgetTokens: number;
+  /** Maximum estimated tokens of a complete prompt; larger prompts are counted and logged. */
+  promptBudgetTokens: number;
+}
+
+export interface PromptTemplate extends PromptDefinition {
+  /** Estimated tokens of the static parts. */
+  staticTokens: number;
+  /**
+   * Builds the chat messages for one call.
+   * @param input - The dynamic part of the user message, appended after the instructions.
+   * @param prefix - Optional text placed before the instructions (e.g. the target language).
+   */
+  messages(input: string, prefix?: string): ChatMessage[];
+}
+
+export interface PromptStats {
+  name: string;
+  staticTokens: number;
+  staticBudgetTokens: number;
+  promptBudgetTokens: number;
+  /** Prompts built from this template whose estimated size exceeded the budget. */
+  overBudget: number;
+  largestPromptTokens: number;
+}
+
+const registry = new Map<string, PromptTemplate>();
+const sizes = new Map<string, { overBudget: number; largestPromptTokens: number }>();
+
+/**
+ * Estimates the number of tokens in a text.
+ * @param text - The text.
+ * @returns The estimate, rounded up.
+ */
+export function estimateTokens(text: string): number {
+  return Math.ceil(text.length / CHARS_PER_TOKEN);
+}
+
+/**
+ * Registers a prompt template. Logs a warning at startup when the static parts exceed their budget.
+ * @param definition - The prompt text and budgets.
+ * @returns The template.
+ */
+export function definePrompt(definition: PromptDefinition): PromptTemplate {
+  if (registry.has(definition.name)) {
+    throw new Error(`Prompt ${definition.name} is already registered`);
+  }
+
+  const instructions = definition.instructions ?? '';
+  const systemMessage: ChatMessage = Object.freeze({ role: 'system', content: definition.system });
+  const staticTokens = estimateTokens(definition.system + instructions);
+  if (staticTokens > definition.staticBudgetTokens) {
+    console.warn(
+      `Prompt ${definition.name} has ~${staticTokens} static tokens, over its budget of ${definition.staticBudgetTokens}.`,
+    );
+  }
+  const size = { overBudget: 0, largestPromptTokens: 0 };
+  sizes.set(definition.name, size);
+
+  const template: PromptTemplate = {
+    ...definition,
+    staticTokens,
+    messages(input: string, prefix = ''): ChatMessage[] {
+      const user = prefix + instructions + input;
+      const tokens = staticTokens + estimateTokens(prefix + input);
+      size.largestPromptTokens = Math.max(size.largestPromptTokens, tokens);
+      if (tokens > definition.promptBudgetTokens) {
+        size.overBudget++;
+        console.warn(`Prompt ${definition.name} is ~${tokens} tokens, over its budget of ${definition.promptBudgetTokens}.`);
+      }
+      return [systemMessage, { role: 'user', content: user }];
+    },
+  };
+  registry.set(definition.name, template);
+  return template;
+}
+
+/**
+ * Returns the size and budget of every registered prompt.
+ * @returns One entry per template.
+ */
+export function stats(): PromptStats[] {
+  return [...registry.values()].map((template) => ({
+    name: template.name,
+    staticTokens: template.staticTokens,
+    staticBudgetTokens: template.staticBudgetTokens,
+    promptBudgetTokens: template.promptBudgetTokens,
+    ...sizes.get(template.name)!,
+  }));
+}
@@ -0,0 +1,110 @@
+import { RecipeQuery } from '../types/recipes';
+
+// This service turns a RecipeQuery into a canonical fingerprint so that requests which
+// only differ in ingredient order, casing, plurals or pantry staples share a cache entry.
+
+// Staples the LLM assumes are always available; listing them does not change the recipes.
+const PANTRY_STAPLES = new Set(['salt', 'water']);
+
+// Upper bounds (minutes) of the time buckets; anything above the last one is "unlimited".
+const TIME_BUCKETS = [15, 30, 45, 60, 90];
+
+export interface QueryFingerprint {
+  /** Stable string used as the exact-match cache key. */
+  key: string;
+  /** Sorted, deduplicated and normalized ingredients (staples removed). */
+  ingredients: string[];
+  /** Everything except ingredients and time; only queries in the same partition may share results. */
+  partition: string;
+  /** Upper bound of the time bucket, or 0 when no time limit was given. */
+  timeBucket: number;
+}
+
+/**
+ * Normalizes a single ingredient name: lowercase, trimmed, single spaces, naive singular.
+ * @param name - The raw ingredient name entered by the user.
+ * @returns The normalized ingredient name, or an empty string if nothing is left.
+ */
+export function normalizeIngredient(name: string): string {
+  const cleaned = String(name ?? '')
+    .toLowerCase()
+    .replace(/[^a-z0-9ऀ-ॿ\s-]/g, ' ')
+    .replace(/\s+/g, ' ')
+    .trim();
+
+  if (cleaned.length <= 3) return cleaned;
+  if (cleaned.endsWith('ies')) return cleaned.slice(0, -3) + 'y';
+  if (cleaned.endsWith('oes')) return cleaned.slice(0, -2);
+  if (cleaned.endsWith('s') && !cleaned.endsWith('ss')) return cleaned.slice(0, -1);
+  return cleaned;
+}
+
+/**
+ * Normalizes, deduplicates and sorts a list of ingredient names.
+ * @param names - The raw ingredient names.
+ * @param dropStaples - Whether pantry staples such as salt and water are removed.
+ * @returns The canonical ingredient list.
+ */
+export function normalizeIngredients(names: string[] | undefined, dropStaples = false): string[] {
+  const set = new Set<string>();
+  for (const name of names ?? []) {
+    const normalized = normalizeIngredient(name);
+    if (!normalized) continue;
+    if (dropStaples && PANTRY_STAPLES.has(normalized)) continue;
+    set.add(normalized);
+  }
+  return [...set].sort();
+}
+
+/**
+ * Rounds a time limit up to the nearest bucket so 25 and 30 minutes share an entry.
+ * @param minutes - The requested time limit.
+ * @returns The bucket upper bound, or 0 for "no limit".
+ */
+export function bucketTime(minutes: number | undefined): number {
+  const value = Number(minutes);
+  if (!value || value <= 0) return 0;
+  return TIME_BUCKETS.find((bound) => value <= bound) ?? 0;
+}
+
+/**
+ * Builds the canonical fingerprint of a recipe query.
+ * @param query - The incoming recipe query.
+ * @returns The query fingerprint.
+ */
+export function fingerprintQuery(query: RecipeQuery): QueryFingerprint {
+  const ingredients = normalizeIngredients(query.ingredients, true);
+  const avoid = normalizeIngredients(query.avoidIngredients);
+  const timeBucket = bucketTime(query.timeLimitMinutes);
+
+  const partition = [
+    `diet=${query.diet ?? 'any'}`,
+    `spice=${query.spiceLevel ?? 'any'}`,
+    `cuisine=${(query.cuisineFocus ?? '').trim().toLowerCase() || 'any'}`,
+    `servings=${Number(query.servings) || 'any'}`,
+    `avoid=${avoid.join(',')}`,
+  ].join('|');
+
+  return {
+    key: `${partition}|time=${timeBucket}|ing=${ingredients.join(',')}`,
+    ingredients,
+    partition,
+    timeBucket,
+  };
+}
+
+/**
+ * Recovers a fingerprint from its `key`, e.g. for cache entries loaded from the persistent tier.
+ * @param key - The fingerprint key (without any cache key prefix).
+ * @returns The fingerprint, or undefined if the key is not in the expected format.
+ */
+export function parseFingerprintKey(key: string): QueryFingerprint | undefined {
+  const match = /^(.*)\|time=(\d+)\|ing=([^|]*)$/.exec(key);
+  if (!match) return undefined;
+  return {
+    key,
+    ingredients: match[3] ? match[3].split(',') : [],
+    partition: match[1],
+    timeBucket: Number(match[2]),
+  };
+}
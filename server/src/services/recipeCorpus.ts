@@ -0,0 +1,351 @@
+import { RecipeQuery, RecipeSuggestion } from '../types/recipes';
+import { enqueueWrite, queryAll, queryOne } from './db';
+import { normalizeIngredient, normalizeIngredients } from './queryFingerprint';
+import * as recipeVectors from './recipeVectors';
+
+// This service keeps the recipes the LLM generates in a local corpus (the 'recipe_corpus' table)
+// with an in-memory inverted index from ingredient to recipe. A suggestion query is matched against
+// the corpus by pantry coverage, the share of a recipe's ingredients the user already has, after
+// filtering by diet, avoid-list, cuisine and time limit. When enough recipes cover the pantry well,
+// the query is answered from the corpus in a few milliseconds instead of calling the LLM.
+
+const MAX_RECIPES = Number(process.env.RECIPE_CORPUS_MAX_RECIPES) || 5000;
+const MIN_COVERAGE = Number(process.env.RECIPE_CORPUS_MIN_COVERAGE) || 0.75;
+
+// Staples and basic spices assumed to be in every kitchen, as whole normalized ingredient names.
+// They do not count towards coverage, so a recipe is not passed over because the user did not
+// list salt or turmeric. Only whole names match: "coconut oil" and "water chestnut" still count.
+const KITCHEN_STAPLES = new Set([
+  'salt',
+  'water',
+  'oil',
+  'cooking oil',
+  'vegetable oil',
+  'refined oil',
+  'ghee',
+  'sugar',
+  'turmeric',
+  'turmeric powder',
+  'cumin',
+  'cumin seed',
+  'jeera',
+  'hing',
+  'asafoetida',
+  'masala',
+  'garam masala',
+]);
+
+interface CorpusEntry {
+  recipe: RecipeSuggestion;
+  /** The diet of the query the recipe was generated for, or 'any'. */
+  diet: string;
+  titleKey: string;
+  /** Index terms of each ingredient that counts towards coverage. */
+  ingredientTerms: string[][];
+  /** Every ingredient name, staples included, as a phrase (see `phraseOf`) for the avoid-list check. */
+  ingredientPhrases: string[];
+}
+
+interface CorpusMatch {
+  entry: CorpusEntry;
+  coverage: number;
+  matched: number;
+}
+
+export interface RecipeCorpusStats {
+  recipes: number;
+  /** Distinct ingredient terms in the inverted index. */
+  terms: number;
+  lookups: number;
+  hits: number;
+  misses: number;
+  hitRate: number;
+}
+
+const entries = new Map<string, CorpusEntry>();
+const byTitle = new Map<string, string>();
+const index = new Map<string, Set<string>>();
+const counters = { lookups: 0, hits: 0, misses: 0 };
+
+/**
+ * Returns the index terms of an ingredient name: the whole normalized name and each of its words,
+ * so "red chilli powder" is found by "chilli" as well as by "red chilli powder".
+ * @param name - The ingredient name from a recipe.
+ * @returns The terms, or an empty list if nothing is left after normalization.
+ */
+export function ingredientTerms(name: string): string[] {
+  const full = normalizeIngredient(name);
+  if (!full) return [];
+  const words = full.split(' ').map(normalizeIngredient).filter((word) => word.length > 1);
+  return [...new Set([full, ...words])];
+}
+
+/**
+ * Returns a name as its normalized words, padded with a space on both sides, so that one phrase
+ * contains another exactly when it contains the other's words in order: " red chilli powder "
+ * contains " red chilli " and " chilli ", but not " red chilli flake ".
+ * @param name - An ingredient name or avoid-list item.
+ * @returns The phrase, or an empty string if nothing is left after normalization.
+ */
+function phraseOf(name: string): string {
+  const words = normalizeIngredient(name).split(' ').map(normalizeIngredient).filter(Boolean);
+  return words.length ? ` ${words.join(' ')} ` : '';
+}
+
+/**
+ * Builds the corpus entry of a recipe.
+ */
+function entryFor(recipe: RecipeSuggestion, diet: string): CorpusEntry {
+  const counted: string[][] = [];
+  const ingredientPhrases: string[] = [];
+  for (const ingredient of recipe.ingredients ?? []) {
+    const terms = ingredientTerms(ingredient.name);
+    if (!terms.length) continue;
+    ingredientPhrases.push(phraseOf(ingredient.name));
+    // terms[0] is the whole normalized name.
+    if (!KITCHEN_STAPLES.has(terms[0])) {
+      counted.push(terms);
+    }
+  }
+  return {
+    recipe,
+    diet,
+    titleKey: `${diet}:${normalizeIngredient(recipe.title)}`,
+    ingredientTerms: counted,
+    ingredientPhrases,
+  };
+}
+
+/**
+ * Adds an entry to the in-memory corpus and its index.
+ */
+function insert(entry: CorpusEntry): void {
+  entries.set(entry.recipe.id, entry);
+  byTitle.set(entry.titleKey, entry.recipe.id);
+  for (const terms of entry.ingredientTerms) {
+    for (const term of terms) {
+      let ids = index.get(term);
+      if (!ids) {
+        ids = new Set();
+        index.set(term, ids);
+      }
+      ids.add(entry.recipe.id);
+    }
+  }
+}
+
+/**
+ * Removes a recipe from the in-memory corpus and its index.
+ * @returns The removed entry, if there was one.
+ */
+function removeEntry(id: string): CorpusEntry | undefined {
+  const entry = entries.get(id);
+  if (!entry) return undefined;
+  entries.delete(id);
+  byTitle.delete(entry.titleKey);
+  for (const terms of entry.ingredientTerms) {
+    for (const term of terms) {
+      const ids = index.get(term);
+      if (!ids) continue;
+      ids.delete(id);
+      if (ids.size === 0) index.delete(term);
+    }
+  }
+  return entry;
+}
+
+/**
+ * Logs a failed background write to the corpus table.
+ */
+function logWriteError(err: any): void {
+  console.error('Recipe corpus write failed:', err?.message || err);
+}
+
+/**
+ * Whether a recipe may be served to a query with the given diet. Recipes are served to queries
+ * with the diet they were generated for; any vegetarian recipe may also answer a 'veg' query.
+ */
+function fitsDiet(entry: CorpusEntry, diet: RecipeQuery['diet']): boolean {
+  if (!diet) return true;
+  if (diet === 'veg' && entry.recipe.isVegetarian) return true;
+  return entry.diet === diet;
+}
+
+/**
+ * Whether a recipe satisfies the avoid-list, cuisine and time limit of a query. An avoid-list
+ * item excludes every ingredient whose name contains it as whole words, so "red chilli" also
+ * rules out "red chilli powder".
+ */
+function fitsConstraints(entry: CorpusEntry, query: RecipeQuery, avoid: string[]): boolean {
+  if (avoid.some((item) => entry.ingredientPhrases.some((phrase) => phrase.includes(item)))) return false;
+
+  const limit = Number(query.timeLimitMinutes);
+  if (limit > 0 && !(entry.recipe.estimatedTimeMinutes <= limit)) return false;
+
+  const cuisine = (query.cuisineFocus ?? '').trim().toLowerCase();
+  if (cuisine) {
+    const region = (entry.recipe.cuisineRegion ?? '').toLowerCase();
+    const tags = (entry.recipe.tags ?? []).map((tag) => String(tag).toLowerCase());
+    if (!region.includes(cuisine) && !tags.includes(cuisine)) return false;
+  }
+  return true;
+}
+
+/**
+ * Finds recipes in the corpus that answer a suggestion query, best pantry coverage first.
+ * @param query - The recipe query.
+ * @param count - How many recipes an answer needs.
+ * @returns `count` recipes whose coverage is at least RECIPE_CORPUS_MIN_COVERAGE, or undefined
+ * if the corpus does not hold enough of them.
+ */
+export function search(query: RecipeQuery, count: number): RecipeSuggestion[] | undefined {
+  counters.lookups++;
+  const pantry = normalizeIngredients(query.ingredients);
+  const avoid = (query.avoidIngredients ?? []).map(phraseOf).filter(Boolean);
+
+  const candidates = new Set<string>();
+  for (const item of pantry) {
+    index.get(item)?.forEach((id) => candidates.add(id));
+  }
+
+  const pantrySet = new Set(pantry);
+  const matches: CorpusMatch[] = [];
+  for (const id of candidates) {
+    const entry = entries.get(id);
+    if (!entry || !entry.ingredientTerms.length) continue;
+    if (!fitsDiet(entry, query.diet) || !fitsConstraints(entry, query, avoid)) continue;
+
+    const matched = entry.ingredientTerms.filter((terms) => terms.some((term) => pantrySet.has(term))).length;
+    const coverage = matched / entry.ingredientTerms.length;
+    if (coverage >= MIN_COVERAGE) {
+      matches.push({ entry, coverage, matched });
+    }
+  }
+
+  if (matches.length < count) {
+    counters.misses++;
+    return undefined;
+  }
+  counters.hits++;
+  matches.sort((a, b) => b.coverage - a.coverage || b.matched - a.matched);
+  return matches.slice(0, count).map((match) => match.entry.recipe);
+}
+
+/**
+ * Adds generated recipes to the corpus and persists them in the background. A recipe whose title
+ * is already in the corpus for the same diet is skipped; past RECIPE_CORPUS_MAX_RECIPES the
+ * oldest recipes are dropped.
+ * @param recipes - The normalized recipes.
+ * @param query - The query they were generated for.
+ */
+export function add(recipes: RecipeSuggestion[], query: RecipeQuery): void {
+  const diet = query.diet ?? 'any';
+  const now = Date.now();
+  for (const recipe of recipes) {
+    const entry = entryFor(recipe, diet);
+    if (byTitle.has(entry.titleKey) || entries.has(recipe.id) || !entry.ingredientTerms.length) continue;
+    insert(entry);
+    enqueueWrite(
+      'recipe_corpus_insert',
+      'INSERT OR IGNORE INTO recipe_corpus (id, title_key, diet, recipe, created_at) VALUES (?, ?, ?, ?, ?)',
+      recipe.id,
+      entry.titleKey,
+      diet,
+      JSON.stringify(recipe),
+      now,
+    ).catch(logWriteError);
+  }
+
+  while (entries.size > MAX_RECIPES) {
+    const oldest = entries.keys().next().value as string;
+    removeEntry(oldest);
+    enqueueWrite('recipe_corpus_delete', 'DELETE FROM recipe_corpus WHERE id = ?', oldest).catch(logWriteError);
+    void forgetVector(oldest);
+  }
+}
+
+/**
+ * Drops an evicted recipe from the similarity index unless it is also a favorite, which keeps
+ * its vector until the favorite is removed.
+ * @param id - The id of the evicted recipe.
+ */
+async function forgetVector(id: string): Promise<void> {
+  try {
+    const favorite = await queryOne('favorites_exists', 'SELECT 1 FROM favorites WHERE id = ?', id);
+    if (!favorite && !entries.has(id)) recipeVectors.remove(id);
+  } catch (err: any) {
+    console.error('Recipe corpus eviction failed:', err?.message || err);
+  }
+}
+
+/**
+ * Replaces a corpus recipe with its enriched details, so later answers from the corpus carry the
+ * full ingredient list, steps and nutrition. Recipes that are not in the corpus are ignored.
+ * @param recipe - The enriched recipe, with the id of the suggestion it was built from.
+ */
+export function enrich(recipe: RecipeSuggestion): void {
+  const existing = removeEntry(recipe.id);
+  if (!existing) return;
+  const entry = entryFor(recipe, existing.diet);
+  insert({ ...entry, titleKey: existing.titleKey });
+  enqueueWrite(
+    'recipe_corpus_update',
+    'UPDATE recipe_corpus SET recipe = ? WHERE id = ?',
+    JSON.stringify(recipe),
+    recipe.id,
+  ).catch(logWriteError);
+}
+
+/**
+ * Loads the most recent corpus recipes from SQLite and builds the inverted index.
+ * Call once after the database has been initialized.
+ * @returns A promise that resolves to the number of recipes loaded.
+ */
+export async function initRecipeCorpus(): Promise<number> {
+  const rows = await queryAll<{ diet: string; recipe: string }>(
+    'recipe_corpus_load',
+    'SELECT diet, recipe FROM recipe_corpus ORDER BY created_at DESC LIMIT ?',
+    MAX_RECIPES,
+  );
+  // Insert oldest first so eviction order matches insertion order.
+  for (const row of rows.reverse()) {
+    try {
+      const recipe = JSON.parse(row.recipe) as RecipeSuggestion;
+      const entry = entryFor(recipe, row.diet);
+      if (!byTitle.has(entry.titleKey)) insert(entry);
+    } catch {
+      // Skip malformed rows.
+    }
+  }
+  return entries.size;
+}
+
+/**
+ * Checks whether a recipe is in the corpus.
+ * @param id - The recipe id.
+ * @returns True if the corpus holds the recipe.
+ */
+export function has(id: string): boolean {
+  return entries.has(id);
+}
+
+/**
+ * Returns every recipe in the corpus, oldest first.
+ * @returns The recipes.
+ */
+export function recipes(): RecipeSuggestion[] {
+  return [...entries.values()].map((entry) => entry.recipe);
+}
+
+/**
+ * Returns the size of the corpus and its lookup counters.
+ * @returns The current corpus statistics.
+ */
+export function stats(): RecipeCorpusStats {
+  return {
+    recipes: entries.size,
+    terms: index.size,
+    ...counters,
+    hitRate: counters.lookups ? counters.hits / counters.lookups : 0,
+  };
+}
@@ -0,0 +1,217 @@
+import { RecipeSuggestion } from '../types/recipes';
+import { queryAll, queryOne } from './db';
+import { FIFTEEN_DAYS_MS } from './favorites.service';
+
+// This service searches the recipes stored in favorites and the recipe corpus through the
+// 'recipe_fts' FTS5 index (kept up to date by triggers, see db.ts). Free text matches the title,
+// description, tags, ingredients and cuisine region, ranked by BM25 with the title weighted
+// highest; a category matches the tags. Results can be filtered by cuisine, difficulty and
+// vegetarian, and come with facet counts for those three fields. Every query is answered from
+// the FTS index or the column indexes, and counting stops after RECIPE_SEARCH_COUNT_LIMIT matches,
+// so the cost of a search is bounded however many recipes are stored. Favorites past
+// their 15-day expiry are left out before the maintenance purge deletes them.
+
+export const MAX_SEARCH_LIMIT = 50;
+// Deep pages are rarely useful and get slower with every page skipped.
+export const MAX_SEARCH_OFFSET = 1000;
+const FACET_VALUES = 20;
+// Matches counted for the total and each facet. The default covers every page a client can reach.
+const COUNT_LIMIT = Number(process.env.RECIPE_SEARCH_COUNT_LIMIT) || MAX_SEARCH_OFFSET + MAX_SEARCH_LIMIT;
+
+// BM25 weights of the FTS columns: title, description, tags, ingredients, cuisine region.
+const RANKING = 'bm25(recipe_fts, 10.0, 2.0, 4.0, 3.0, 5.0)';
+
+export interface RecipeSearchParams {
+  /** Free text; every word must match, the last one as a prefix. */
+  q?: string;
+  /** A category, matched against the tags. */
+  category?: string;
+  cuisine?: string;
+  difficulty?: string;
+  vegetarian?: boolean;
+  limit: number;
+  offset: number;
+}
+
+export interface RecipeSearchFacets {
+  cuisine: Record<string, number>;
+  difficulty: Record<string, number>;
+  vegetarian: Record<'true' | 'false', number>;
+}
+
+export interface RecipeSearchResult {
+  results: RecipeSuggestion[];
+  total: number;
+  /** Offset of the next page, or null on the last page. */
+  nextOffset: number | null;
+  facets: RecipeSearchFacets;
+  /** True when more recipes match than are counted; `total` and `facets` are then lower bounds. */
+  countsCapped: boolean;
+}
+
+export interface RecipeSearchStats {
+  queries: number;
+  avgQueryMs: number;
+  maxQueryMs: number;
+}
+
+type Filter = 'cuisine' | 'difficulty' | 'vegetarian';
+
+interface Clause {
+  sql: string;
+  params: unknown[];
+}
+
+const counters = { queries: 0, totalQueryMs: 0, maxQueryMs: 0 };
+
+/**
+ * Turns user input into an FTS5 query: each word becomes a quoted phrase, so operators and
+ * punctuation in the input are matched literally, and the last word matches as a prefix.
+ * @param text - The user's search text.
+ * @returns The FTS5 expression, or undefined if the text has no words.
+ */
+export function toFtsQuery(text: string | undefined): string | undefined {
+  const words = String(text ?? '')
+    .split(/[^\p{L}\p{N}]+/u)
+    .filter(Boolean);
+  if (!words.length) return undefined;
+  return words.map((word, i) => `"${word}"${i === words.length - 1 ? '*' : ''}`).join(' ');
+}
+
+/**
+ * Builds the FROM and WHERE clauses of a search, leaving out one filter when counting its facet.
+ * A recipe is kept while it is in the corpus or a favorite saved on or after `favoritesCutoff`.
+ */
+function whereClause(
+  params: RecipeSearchParams,
+  match: string | undefined,
+  favoritesCutoff: string,
+  except?: Filter,
+): Clause {
+  const conditions: string[] = [
+    `(EXISTS (SELECT 1 FROM recipe_corpus c WHERE c.id = s.id)
+      OR EXISTS (SELECT 1 FROM favorites f WHERE f.id = s.id AND f.created_at >= ?))`,
+  ];
+  const values: unknown[] = [favoritesCutoff];
+  let from = 'recipe_search s';
+  if (match) {
+    from = 'recipe_fts JOIN recipe_search s ON s.rowid = recipe_fts.rowid';
+    conditions.unshift('recipe_fts MATCH ?');
+    values.unshift(match);
+  }
+  if (params.cuisine && except !== 'cuisine') {
+    conditions.push('s.cuisine_region = ? COLLATE NOCASE');
+    values.push(params.cuisine);
+  }
+  if (params.difficulty && except !== 'difficulty') {
+    conditions.push('s.difficulty = ?');
+    values.push(params.difficulty);
+  }
+  if (params.vegetarian !== undefined && except !== 'vegetarian') {
+    conditions.push('s.is_vegetarian = ?');
+    values.push(params.vegetarian ? 1 : 0);
+  }
+  return { sql: `FROM ${from} WHERE ${conditions.join(' AND ')}`, params: values };
+}
+
+/**
+ * Counts the matching recipes per value of one column, over at most COUNT_LIMIT matches. The
+ * facet's own filter is left out, so the counts show what choosing another value would return.
+ */
+async function facetCounts(
+  params: RecipeSearchParams,
+  match: string | undefined,
+  favoritesCutoff: string,
+  facet: Filter,
+  column: string,
+): Promise<Record<string, number>> {
+  const where = whereClause(params, match, favoritesCutoff, facet);
+  const rows = await queryAll<{ value: string | number | null; count: number }>(
+    `recipe_search_facet_${facet}`,
+    `SELECT value, COUNT(*) AS count FROM (SELECT ${column} AS value ${where.sql} LIMIT ?)
+     GROUP BY value ORDER BY count DESC LIMIT ${FACET_VALUES}`,
+    ...where.params,
+    COUNT_LIMIT,
+  );
+  const counts: Record<string, number> = {};
+  for (const row of rows) {
+    if (row.value === null || row.value === '') continue;
+    counts[facet === 'vegetarian' ? String(row.value === 1) : String(row.value)] = row.count;
+  }
+  return counts;
+}
+
+/**
+ * Searches the stored recipes.
+ * @param params - The text, category, filters and page.
+ * @returns One page of ranked results, the total number of matches and the facet counts.
+ */
+export async function searchRecipes(params: RecipeSearchParams): Promise<RecipeSearchResult> {
+  const start = Date.now();
+  const match = [
+    toFtsQuery(params.q),
+    params.category ? `tags : (${toFtsQuery(params.category) ?? '""'})` : undefined,
+  ]
+    .filter(Boolean)
+    .join(' AND ') || undefined;
+
+  const favoritesCutoff = new Date(Date.now() - FIFTEEN_DAYS_MS).toISOString();
+  const where = whereClause(params, match, favoritesCutoff);
+  // Without text, the most recently stored recipes come first.
+  const order = match ? `${RANKING}, s.rowid` : 's.updated_at DESC, s.rowid DESC';
+  const [rows, total, cuisine, difficulty, vegetarian] = await Promise.all([
+    queryAll<{ recipe: string }>(
+      'recipe_search_results',
+      `SELECT s.recipe ${where.sql} ORDER BY ${order} LIMIT ? OFFSET ?`,
+      ...where.params,
+      params.limit,
+      params.offset,
+    ),
+    // One row past the limit tells whether the count was capped.
+    queryOne<{ count: number }>(
+      'recipe_search_total',
+      `SELECT COUNT(*) AS count FROM (SELECT 1 ${where.sql} LIMIT ?)`,
+      ...where.params,
+      COUNT_LIMIT + 1,
+    ),
+    facetCounts(params, match, favoritesCutoff, 'cuisine', 's.cuisine_region'),
+    facetCounts(params, match, favoritesCutoff, 'difficulty', 's.difficulty'),
+    facetCounts(params, match, favoritesCutoff, 'vegetarian', 's.is_vegetarian'),
+  ]);
+
+  const results: RecipeSuggestion[] = [];
+  for (const row of rows) {
+    try {
+      results.push(JSON.parse(row.recipe));
+    } catch {
+      // The triggers only index valid JSON; skip anything else.
+    }
+  }
+  const countsCapped = (total?.count ?? 0) > COUNT_LIMIT;
+  const count = Math.min(total?.count ?? 0, COUNT_LIMIT);
+
+  const elapsed = Date.now() - start;
+  counters.queries++;
+  counters.totalQueryMs += elapsed;
+  counters.maxQueryMs = Math.max(counters.maxQueryMs, elapsed);
+
+  return {
+    results,
+    total: count,
+    nextOffset: params.offset + rows.length < count ? params.offset + rows.length : null,
+    facets: { cuisine, difficulty, vegetarian: { true: vegetarian.true ?? 0, false: vegetarian.false ?? 0 } },
+    countsCapped,
+  };
+}
+
+/**
+ * Returns search query counts and timings.
+ * @returns The current search statistics.
+ */
+export function stats(): RecipeSearchStats {
+  return {
+    queries: counters.queries,
+    avgQueryMs: counters.queries ? counters.totalQueryMs / counters.queries : 0,
+    maxQueryMs: counters.maxQueryMs,
+  };
+}
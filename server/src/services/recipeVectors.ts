@@ -0,0 +1,315 @@
+import { RecipeSuggestion } from '../types/recipes';
+import { normalizeIngredient } from './queryFingerprint';
+import { ingredientTerms } from './recipeCorpus';
+import { fnv1a } from './similarityIndex';
+
+// This service is an in-process similarity index over recipes, used to find "recipes like this
+// one" without asking the LLM. Each recipe is embedded as a hashed TF-IDF vector of its title
+// words, ingredients, tags and cuisine region: features are hashed into a fixed number of
+// dimensions (with a hash-derived sign, so collisions tend to cancel out) and weighted by the
+// inverse document frequency of their dimension. Vectors live in one Float32Array, stored
+// dimension by dimension, so a query only scans the few dimensions its own features hash to and
+// each scan is a contiguous pass over all recipes. Top-k search is exact (brute force).
+
+const DIMENSIONS = Number(process.env.RECIPE_VECTOR_DIMENSIONS) || 256;
+const MAX_ITEMS = Number(process.env.RECIPE_VECTOR_MAX_ITEMS) || 200000;
+const INITIAL_CAPACITY = 1024;
+export const MAX_RESULTS = 50;
+
+// The title and cuisine say more about a dish than any single ingredient or tag.
+const TITLE_WEIGHT = 2;
+const CUISINE_WEIGHT = 1.5;
+const INGREDIENT_WEIGHT = 1;
+const TAG_WEIGHT = 1;
+
+interface SparseVector {
+  dims: number[];
+  values: number[];
+}
+
+export interface SimilarRecipe {
+  recipe: RecipeSuggestion;
+  /** Cosine similarity between the TF-IDF vectors, from 0 to 1 for typical recipes. */
+  score: number;
+}
+
+export interface RecipeVectorStats {
+  recipes: number;
+  dimensions: number;
+  capacity: number;
+  /** Memory held by the vector matrix and norms. */
+  bytes: number;
+  queries: number;
+  avgQueryMs: number;
+  maxQueryMs: number;
+}
+
+let capacity = INITIAL_CAPACITY;
+// matrix[d * capacity + row] is the term frequency of dimension d in a row.
+let matrix = new Float32Array(DIMENSIONS * capacity);
+// Inverse L2 norm of each row's TF-IDF vector (0 for an empty row).
+let inverseNorms = new Float32Array(capacity);
+let scores = new Float32Array(capacity);
+let count = 0;
+const recipesByRow: RecipeSuggestion[] = [];
+const rowsById = new Map<string, number>();
+
+// Number of rows with a non-zero value per dimension, and the IDF weights derived from it.
+const documentFrequency = new Uint32Array(DIMENSIONS);
+const idf = new Float32Array(DIMENSIONS).fill(1);
+// IDF and norms are recomputed whenever the index has doubled in size since the last time.
+let idfComputedAt = 0;
+
+const counters = { queries: 0, totalQueryMs: 0, maxQueryMs: 0 };
+
+/**
+ * Adds one hashed feature to a term-frequency map.
+ */
+function addFeature(tf: Map<number, number>, feature: string, weight: number): void {
+  const hash = fnv1a(feature);
+  const dim = (hash & 0x7fffffff) % DIMENSIONS;
+  const sign = hash & 0x80000000 ? -1 : 1;
+  tf.set(dim, (tf.get(dim) ?? 0) + sign * weight);
+}
+
+/**
+ * Computes the hashed term-frequency vector of a recipe.
+ * @param recipe - The recipe; only title, ingredients, tags and cuisine region are used.
+ * @returns The non-zero dimensions and their values.
+ */
+function termFrequencies(recipe: Partial<RecipeSuggestion>): SparseVector {
+  const tf = new Map<number, number>();
+  for (const word of normalizeIngredient(recipe.title ?? '').split(' ')) {
+    const term = normalizeIngredient(word);
+    if (term.length > 1) addFeature(tf, `t:${term}`, TITLE_WEIGHT);
+  }
+  for (const ingredient of recipe.ingredients ?? []) {
+    for (const term of ingredientTerms(ingredient?.name ?? '')) {
+      addFeature(tf, `i:${term}`, INGREDIENT_WEIGHT);
+    }
+  }
+  for (const tag of recipe.tags ?? []) {
+    const term = normalizeIngredient(String(tag));
+    if (term) addFeature(tf, `g:${term}`, TAG_WEIGHT);
+  }
+  const cuisine = normalizeIngredient(recipe.cuisineRegion ?? '');
+  if (cuisine) addFeature(tf, `c:${cuisine}`, CUISINE_WEIGHT);
+
+  const vector: SparseVector = { dims: [], values: [] };
+  for (const [dim, value] of tf) {
+    if (value !== 0) {
+      vector.dims.push(dim);
+      vector.values.push(value);
+    }
+  }
+  return vector;
+}
+
+/**
+ * Computes the inverse TF-IDF norm of a vector with the current IDF weights.
+ */
+function inverseNorm(vector: SparseVector): number {
+  let sum = 0;
+  for (let i = 0; i < vector.dims.length; i++) {
+    const value = vector.values[i] * idf[vector.dims[i]];
+    sum += value * value;
+  }
+  return sum > 0 ? 1 / Math.sqrt(sum) : 0;
+}
+
+/**
+ * Recomputes the IDF weights from the document frequencies and, with them, every row norm.
+ * Works dimension by dimension so every pass over the matrix is sequential.
+ */
+function refreshIdf(): void {
+  const sums = new Float64Array(count);
+  for (let d = 0; d < DIMENSIONS; d++) {
+    idf[d] = Math.log((1 + count) / (1 + documentFrequency[d])) + 1;
+    const weight = idf[d] * idf[d];
+    const offset = d * capacity;
+    for (let row = 0; row < count; row++) {
+      const value = matrix[offset + row];
+      if (value !== 0) sums[row] += value * value * weight;
+    }
+  }
+  for (let row = 0; row < count; row++) {
+    inverseNorms[row] = sums[row] > 0 ? 1 / Math.sqrt(sums[row]) : 0;
+  }
+  idfComputedAt = count;
+}
+
+/**
+ * Doubles the capacity of the matrix, keeping the stored rows.
+ */
+function grow(): void {
+  const nextCapacity = capacity * 2;
+  const nextMatrix = new Float32Array(DIMENSIONS * nextCapacity);
+  for (let d = 0; d < DIMENSIONS; d++) {
+    nextMatrix.set(matrix.subarray(d * capacity, d * capacity + count), d * nextCapacity);
+  }
+  const nextInverseNorms = new Float32Array(nextCapacity);
+  nextInverseNorms.set(inverseNorms.subarray(0, count));
+  matrix = nextMatrix;
+  inverseNorms = nextInverseNorms;
+  scores = new Float32Array(nextCapacity);
+  capacity = nextCapacity;
+}
+
+/**
+ * Removes a recipe from the index; the last row is moved into its place.
+ * @param id - The recipe id.
+ */
+export function remove(id: string): void {
+  const row = rowsById.get(id);
+  if (row === undefined) return;
+  const last = count - 1;
+  for (let d = 0; d < DIMENSIONS; d++) {
+    const offset = d * capacity;
+    if (matrix[offset + row] !== 0) documentFrequency[d]--;
+    matrix[offset + row] = matrix[offset + last];
+    matrix[offset + last] = 0;
+  }
+  inverseNorms[row] = inverseNorms[last];
+  recipesByRow[row] = recipesByRow[last];
+  recipesByRow.pop();
+  rowsById.delete(id);
+  if (row !== last) rowsById.set(recipesByRow[row].id, row);
+  count--;
+}
+
+/**
+ * Adds a recipe to the index, replacing an earlier version with the same id. Past
+ * RECIPE_VECTOR_MAX_ITEMS the oldest recipe is dropped.
+ * @param recipe - The recipe to index.
+ */
+export function add(recipe: RecipeSuggestion): void {
+  if (!recipe?.id) return;
+  remove(recipe.id);
+  if (count >= MAX_ITEMS) {
+    remove(rowsById.keys().next().value as string);
+  }
+  if (count === capacity) grow();
+
+  const row = count++;
+  const vector = termFrequencies(recipe);
+  for (let i = 0; i < vector.dims.length; i++) {
+    matrix[vector.dims[i] * capacity + row] = vector.values[i];
+    documentFrequency[vector.dims[i]]++;
+  }
+  recipesByRow[row] = recipe;
+  rowsById.set(recipe.id, row);
+
+  if (count >= idfComputedAt * 2) {
+    refreshIdf();
+  } else {
+    inverseNorms[row] = inverseNorm(vector);
+  }
+}
+
+/**
+ * Adds many recipes to the index.
+ * @param recipes - The recipes to index.
+ * @returns The number of recipes in the index afterwards.
+ */
+export function addAll(recipes: Iterable<RecipeSuggestion>): number {
+  for (const recipe of recipes) add(recipe);
+  return count;
+}
+
+/**
+ * Returns an indexed recipe.
+ * @param id - The recipe id.
+ * @returns The recipe, or undefined if it is not indexed.
+ */
+export function get(id: string): RecipeSuggestion | undefined {
+  const row = rowsById.get(id);
+  return row === undefined ? undefined : recipesByRow[row];
+}
+
+/**
+ * Finds the indexed recipes most similar to a recipe. The recipe itself, and other copies of a
+ * dish with the same title, are left out.
+ * @param recipe - The recipe to compare against; it does not have to be indexed.
+ * @param k - The number of results, at most MAX_RESULTS.
+ * @returns Up to `k` recipes, most similar first.
+ */
+export function findSimilar(recipe: Partial<RecipeSuggestion>, k = 10): SimilarRecipe[] {
+  const start = performance.now();
+  const limit = Math.max(1, Math.min(MAX_RESULTS, Math.floor(k)));
+  const vector = termFrequencies(recipe);
+
+  // Locals, so the hot loops do not re-read module state.
+  const rows = count;
+  const values = matrix;
+  const dots = scores;
+  const rowWeights = inverseNorms;
+
+  // Dot product with every row: per query dimension, the query's IDF-weighted value times the
+  // row's. Four dimensions are accumulated per pass to cut the loads and stores of `dots`.
+  const weights = vector.dims.map((dim, i) => vector.values[i] * idf[dim] * idf[dim]);
+  const offsets = vector.dims.map((dim) => dim * capacity);
+  dots.fill(0, 0, rows);
+  let i = 0;
+  for (; i + 4 <= offsets.length; i += 4) {
+    const [w0, w1, w2, w3] = weights.slice(i, i + 4);
+    const [o0, o1, o2, o3] = offsets.slice(i, i + 4);
+    for (let row = 0; row < rows; row++) {
+      dots[row] +=
+        w0 * values[o0 + row] + w1 * values[o1 + row] + w2 * values[o2 + row] + w3 * values[o3 + row];
+    }
+  }
+  for (; i < offsets.length; i++) {
+    const weight = weights[i];
+    const offset = offsets[i];
+    for (let row = 0; row < rows; row++) {
+      dots[row] += weight * values[offset + row];
+    }
+  }
+  const queryWeight = inverseNorm(vector);
+
+  // Keep the best `limit` rows, sorted by descending score.
+  const topRows: number[] = [];
+  const topScores: number[] = [];
+  const ownRow = recipe.id === undefined ? -1 : rowsById.get(recipe.id) ?? -1;
+  const ownTitle = normalizeIngredient(recipe.title ?? '');
+  if (queryWeight > 0) {
+    let threshold = 0;
+    for (let row = 0; row < rows; row++) {
+      const score = dots[row] * rowWeights[row] * queryWeight;
+      if (score <= threshold || row === ownRow) continue;
+      if (ownTitle && normalizeIngredient(recipesByRow[row].title) === ownTitle) continue;
+
+      let position = topRows.length === limit ? limit - 1 : topRows.length;
+      while (position > 0 && topScores[position - 1] < score) {
+        topRows[position] = topRows[position - 1];
+        topScores[position] = topScores[position - 1];
+        position--;
+      }
+      topRows[position] = row;
+      topScores[position] = score;
+      if (topRows.length === limit) threshold = topScores[limit - 1];
+    }
+  }
+
+  const elapsed = performance.now() - start;
+  counters.queries++;
+  counters.totalQueryMs += elapsed;
+  counters.maxQueryMs = Math.max(counters.maxQueryMs, elapsed);
+  return topRows.map((row, i) => ({ recipe: recipesByRow[row], score: topScores[i] }));
+}
+
+/**
+ * Returns the size of the index and its query timings.
+ * @returns The current index statistics.
+ */
+export function stats(): RecipeVectorStats {
+  return {
+    recipes: count,
+    dimensions: DIMENSIONS,
+    capacity,
+    bytes: matrix.byteLength + inverseNorms.byteLength + scores.byteLength,
+    queries: counters.queries,
+    avgQueryMs: counters.queries ? counters.totalQueryMs / counters.queries : 0,
+    maxQueryMs: counters.maxQueryMs,
+  };
+}
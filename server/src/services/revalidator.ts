@@ -0,0 +1,76 @@
+// This service refreshes stale cache entries in the background (stale-while-revalidate).
+// At most SWR_MAX_CONCURRENCY refreshes run at once; further ones wait in a bounded queue,
+// and a key that is already queued or running is not scheduled again.
+
+const MAX_CONCURRENT = Number(process.env.SWR_MAX_CONCURRENCY) || 2;
+const MAX_QUEUED = Number(process.env.SWR_MAX_QUEUED) || 50;
+
+export interface RevalidationStats {
+  scheduled: number;
+  deduplicated: number;
+  dropped: number;
+  succeeded: number;
+  failed: number;
+  running: number;
+  queued: number;
+}
+
+const queue = new Map<string, () => Promise<unknown>>();
+const running = new Set<string>();
+const counters = { scheduled: 0, deduplicated: 0, dropped: 0, succeeded: 0, failed: 0 };
+
+/**
+ * Starts queued refreshes while there is spare concurrency.
+ */
+function drain(): void {
+  while (running.size < MAX_CONCURRENT && queue.size > 0) {
+    const [key, task] = queue.entries().next().value as [string, () => Promise<unknown>];
+    queue.delete(key);
+    running.add(key);
+
+    Promise.resolve()
+      .then(task)
+      .then(
+        () => {
+          counters.succeeded++;
+        },
+        (err: any) => {
+          counters.failed++;
+          console.error(`Background revalidation failed for ${key}:`, err?.message || err);
+        },
+      )
+      .finally(() => {
+        running.delete(key);
+        drain();
+      });
+  }
+}
+
+/**
+ * Schedules a background refresh of a stale cache entry.
+ * The task is expected to write the fresh value to the cache itself.
+ * @param key - The cache key being refreshed.
+ * @param task - The function that recomputes and stores the value.
+ */
+export function revalidate(key: string, task: () => Promise<unknown>): void {
+  if (queue.has(key) || running.has(key)) {
+    counters.deduplicated++;
+    return;
+  }
+  if (queue.size >= MAX_QUEUED) {
+    counters.dropped++;
+    return;
+  }
+
+  counters.scheduled++;
+  queue.set(key, task);
+  drain();
+}
+
+/**
+ * Returns counters for scheduled, completed and dropped background refreshes.
+ * @returns The current revalidation statistics.
+ */
+export function stats(): RevalidationStats {
+  return { ...counters, running: running.size, queued: queue.size };
+}
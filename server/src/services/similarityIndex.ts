@@ -0,0 +1,215 @@
+import { QueryFingerprint } from './queryFingerprint';
+
+// This service keeps a MinHash/LSH index over the ingredient sets of cached recipe queries.
+// A new query that misses the exact cache can be served from a cached query in the same
+// partition (diet, spice, cuisine, servings, avoid-list) whose ingredients are similar enough.
+
+const NUM_HASHES = 64;
+const BAND_ROWS = 4;
+const NUM_BANDS = NUM_HASHES / BAND_ROWS;
+
+const THRESHOLD = Number(process.env.SIMILARITY_CACHE_THRESHOLD) || 0.8;
+const MAX_INDEXED = Number(process.env.SIMILARITY_CACHE_MAX_ENTRIES) || 2000;
+
+interface IndexedQuery {
+  cacheKey: string;
+  fingerprint: QueryFingerprint;
+  bandKeys: string[];
+}
+
+export interface SimilarMatch {
+  cacheKey: string;
+  similarity: number;
+}
+
+export interface SimilarityStats {
+  lookups: number;
+  exactHits: number;
+  similarHits: number;
+  misses: number;
+  exactHitRate: number;
+  similarHitRate: number;
+  indexed: number;
+}
+
+// Random-looking odd seeds, one per hash function; fixed so signatures are stable across restarts.
+const SEEDS = Array.from({ length: NUM_HASHES }, (_, i) => (Math.imul(i + 1, 0x9e3779b1) | 1) >>> 0);
+
+const entries = new Map<string, IndexedQuery>();
+const buckets = new Map<string, Set<string>>();
+const counters = { lookups: 0, exactHits: 0, similarHits: 0, misses: 0 };
+
+/**
+ * FNV-1a hash of a string, as an unsigned 32-bit integer.
+ * @param value - The string to hash.
+ * @returns The 32-bit hash.
+ */
+export function fnv1a(value: string): number {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < value.length; i++) {
+    hash ^= value.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+}
+
+/**
+ * Finalization mix from MurmurHash3, used to derive independent hash functions from one base hash.
+ * @param h - The value to mix.
+ * @returns The mixed unsigned 32-bit value.
+ */
+function fmix32(h: number): number {
+  h ^= h >>> 16;
+  h = Math.imul(h, 0x85ebca6b);
+  h ^= h >>> 13;
+  h = Math.imul(h, 0xc2b2ae35);
+  h ^= h >>> 16;
+  return h >>> 0;
+}
+
+/**
+ * Computes the MinHash signature of an ingredient set.
+ * @param items - The normalized ingredient set.
+ * @returns The signature, one minimum per hash function.
+ */
+function minHash(items: string[]): Uint32Array {
+  const signature = new Uint32Array(NUM_HASHES).fill(0xffffffff);
+  for (const item of items) {
+    const base = fnv1a(item);
+    for (let i = 0; i < NUM_HASHES; i++) {
+      const h = fmix32(base ^ SEEDS[i]);
+      if (h < signature[i]) signature[i] = h;
+    }
+  }
+  return signature;
+}
+
+/**
+ * Splits a signature into LSH band keys, scoped to the query partition.
+ * @param partition - The fingerprint partition.
+ * @param signature - The MinHash signature.
+ * @returns One bucket key per band.
+ */
+function bandKeys(partition: string, signature: Uint32Array): string[] {
+  const keys: string[] = [];
+  for (let band = 0; band < NUM_BANDS; band++) {
+    const rows = signature.subarray(band * BAND_ROWS, (band + 1) * BAND_ROWS);
+    keys.push(`${partition}#${band}:${rows.join('.')}`);
+  }
+  return keys;
+}
+
+/**
+ * Exact Jaccard similarity of two sorted, deduplicated lists.
+ * @param a - The first list.
+ * @param b - The second list.
+ * @returns |a ∩ b| / |a ∪ b|, or 1 when both are empty.
+ */
+function jaccard(a: string[], b: string[]): number {
+  if (a.length === 0 && b.length === 0) return 1;
+  const setB = new Set(b);
+  let intersection = 0;
+  for (const item of a) {
+    if (setB.has(item)) intersection++;
+  }
+  return intersection / (a.length + b.length - intersection);
+}
+
+/**
+ * Whether results generated for `cached` also satisfy the time limit of `query`.
+ * Recipes made for a stricter (or equal) limit are fine; looser ones are not.
+ */
+function fitsTimeLimit(cached: QueryFingerprint, query: QueryFingerprint): boolean {
+  if (query.timeBucket === 0) return true;
+  return cached.timeBucket !== 0 && cached.timeBucket <= query.timeBucket;
+}
+
+/**
+ * Removes a cache key from the index.
+ * @param cacheKey - The key to remove.
+ */
+export function remove(cacheKey: string): void {
+  const entry = entries.get(cacheKey);
+  if (!entry) return;
+  entries.delete(cacheKey);
+  for (const bandKey of entry.bandKeys) {
+    const bucket = buckets.get(bandKey);
+    if (!bucket) continue;
+    bucket.delete(cacheKey);
+    if (bucket.size === 0) buckets.delete(bandKey);
+  }
+}
+
+/**
+ * Adds a cached query to the index. The oldest entries are dropped past the size limit.
+ * @param fingerprint - The fingerprint of the cached query.
+ * @param cacheKey - The key under which its result is cached.
+ */
+export function add(fingerprint: QueryFingerprint, cacheKey: string): void {
+  remove(cacheKey);
+  const keys = bandKeys(fingerprint.partition, minHash(fingerprint.ingredients));
+  entries.set(cacheKey, { cacheKey, fingerprint, bandKeys: keys });
+  for (const bandKey of keys) {
+    let bucket = buckets.get(bandKey);
+    if (!bucket) {
+      bucket = new Set();
+      buckets.set(bandKey, bucket);
+    }
+    bucket.add(cacheKey);
+  }
+
+  while (entries.size > MAX_INDEXED) {
+    const oldest = entries.keys().next().value as string;
+    remove(oldest);
+  }
+}
+
+/**
+ * Finds cached queries similar to the given one, best match first.
+ * Candidates come from LSH buckets and are verified with exact Jaccard similarity.
+ * @param fingerprint - The fingerprint of the incoming query.
+ * @param threshold - Minimum Jaccard similarity; defaults to SIMILARITY_CACHE_THRESHOLD.
+ * @returns The matches at or above the threshold, sorted by similarity.
+ */
+export function findSimilar(fingerprint: QueryFingerprint, threshold = THRESHOLD): SimilarMatch[] {
+  const candidates = new Set<string>();
+  for (const bandKey of bandKeys(fingerprint.partition, minHash(fingerprint.ingredients))) {
+    buckets.get(bandKey)?.forEach((key) => candidates.add(key));
+  }
+
+  const matches: SimilarMatch[] = [];
+  for (const key of candidates) {
+    const entry = entries.get(key);
+    if (!entry || !fitsTimeLimit(entry.fingerprint, fingerprint)) continue;
+    const similarity = jaccard(entry.fingerprint.ingredients, fingerprint.ingredients);
+    if (similarity >= threshold) {
+      matches.push({ cacheKey: key, similarity });
+    }
+  }
+  return matches.sort((a, b) => b.similarity - a.similarity);
+}
+
+/**
+ * Records the outcome of a recipe cache lookup for hit-rate reporting.
+ * @param outcome - Whether the lookup was an exact hit, a similarity hit or a miss.
+ */
+export function recordLookup(outcome: 'exact' | 'similar' | 'miss'): void {
+  counters.lookups++;
+  if (outcome === 'exact') counters.exactHits++;
+  else if (outcome === 'similar') counters.similarHits++;
+  else counters.misses++;
+}
+
+/**
+ * Returns exact and similarity hit rates separately, plus the index size.
+ * @returns The current similarity cache statistics.
+ */
+export function stats(): SimilarityStats {
+  const { lookups } = counters;
+  return {
+    ...counters,
+    exactHitRate: lookups ? counters.exactHits / lookups : 0,
+    similarHitRate: lookups ? counters.similarHits / lookups : 0,
+    indexed: entries.size,
+  };
+}
@@ -0,0 +1,41 @@
+import assert from 'node:assert/strict';
+import { describe, it } from 'node:test';
+import { singleFlight } from './singleFlight';
+
+describe('singleFlight', () => {
+  it('runs one call for concurrent callers with the same key', async () => {
+    let calls = 0;
+    const fn = async () => {
+      calls++;
+      await new Promise((resolve) => setTimeout(resolve, 10));
+      return 'result';
+    };
+    const results = await Promise.all([singleFlight('same', fn), singleFlight('same', fn)]);
+    assert.deepEqual(results, ['result', 'result']);
+    assert.equal(calls, 1);
+  });
+
+  it('stops waiting at the caller deadline without failing the shared call', async () => {
+    const fn = () => new Promise<string>((resolve) => setTimeout(() => resolve('late'), 20));
+    const impatient = singleFlight('deadline', fn, { deadline: Date.now() + 1 });
+    const patient = singleFlight('deadline', fn);
+    await assert.rejects(impatient, { code: 'DEADLINE_EXCEEDED' });
+    assert.equal(await patient, 'late');
+  });
+
+  it('handles a failing shared call when the only caller was already aborted', async () => {
+    const unhandled: unknown[] = [];
+    const onUnhandled = (reason: unknown) => unhandled.push(reason);
+    process.on('unhandledRejection', onUnhandled);
+    try {
+      const controller = new AbortController();
+      controller.abort();
+      const fn = () => new Promise<never>((_, reject) => setTimeout(() => reject(new Error('upstream failed')), 5));
+      await assert.rejects(singleFlight('aborted', fn, { signal: controller.signal }), { code: 'ERR_CANCELED' });
+      await new Promise((resolve) => setTimeout(resolve, 20));
+      assert.deepEqual(unhandled, []);
+    } finally {
+      process.off('unhandledRejection', onUnhandled);
+    }
+  });
+});
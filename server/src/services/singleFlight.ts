@@ -0,0 +1,103 @@
+import { clusterFlight } from './cluster';
+
+// This service coalesces concurrent calls that share a key into a single in-flight promise.
+// When many users send the same query at once, only the first caller hits the LLM; the others
+// await the same promise. The entry is removed as soon as the call settles, so a failure is
+// propagated to every waiter but never cached for later callers. In cluster mode the leading
+// call is also coalesced with identical calls in other workers.
+//
+// The shared call must not depend on any one caller: it runs with the server's own deadlines and
+// no client abort signal, and each caller's deadline and signal only bound that caller's wait.
+// A caller that gives up leaves the call running for the others (and for the cache).
+
+const inFlight = new Map<string, Promise<unknown>>();
+const counters = { leaders: 0, coalesced: 0 };
+
+export interface FlightWait {
+  /** Epoch milliseconds after which this caller stops waiting. */
+  deadline?: number;
+  /** Stops this caller's wait, e.g. when its client disconnects. */
+  signal?: AbortSignal;
+}
+
+export interface SingleFlightStats {
+  leaders: number;
+  coalesced: number;
+  inFlight: number;
+}
+
+/**
+ * Runs `fn` for the given key unless a call with the same key is already in flight,
+ * in which case the caller joins the existing call.
+ * @param key - The coalescing key, usually the cache key of the result.
+ * @param fn - The function producing the result; it must not use the caller's deadline or signal.
+ * @param wait - The caller's own deadline and abort signal, which bound only its wait.
+ * @returns A promise for the shared result.
+ */
+export function singleFlight<T>(key: string, fn: () => Promise<T>, wait: FlightWait = {}): Promise<T> {
+  let promise = inFlight.get(key) as Promise<T> | undefined;
+  if (promise) {
+    counters.coalesced++;
+  } else {
+    counters.leaders++;
+    // Promise.resolve().then() turns a synchronous throw in fn into a rejection.
+    const shared = Promise.resolve()
+      .then(() => clusterFlight(key, fn))
+      .finally(() => {
+        inFlight.delete(key);
+      });
+    inFlight.set(key, shared);
+    promise = shared;
+  }
+  return waitFor(promise, wait);
+}
+
+/**
+ * Waits for a shared call until the caller's deadline passes or its signal aborts.
+ * @param promise - The shared call.
+ * @param wait - The caller's deadline and signal.
+ * @returns A promise that settles with the call, or rejects when the caller stops waiting.
+ */
+function waitFor<T>(promise: Promise<T>, { deadline, signal }: FlightWait): Promise<T> {
+  if (deadline === undefined && !signal) return promise;
+  return new Promise<T>((resolve, reject) => {
+    let timer: NodeJS.Timeout | undefined;
+    const finish = (settle: () => void) => {
+      clearTimeout(timer);
+      signal?.removeEventListener('abort', onAbort);
+      settle();
+    };
+    const giveUp = (message: string, code: string) => finish(() => reject(Object.assign(new Error(message), { code })));
+    const onAbort = () => giveUp('Caller stopped waiting for a shared call', 'ERR_CANCELED');
+
+    // Subscribed first, so the shared call always has a handler even if this caller gives up
+    // at once: a rejection nobody handles would take the process down.
+    promise.then(
+      (value) => finish(() => resolve(value)),
+      (err) => finish(() => reject(err)),
+    );
+    if (signal?.aborted) return onAbort();
+    signal?.addEventListener('abort', onAbort, { once: true });
+    if (deadline !== undefined) {
+      const remaining = Math.max(0, deadline - Date.now());
+      timer = setTimeout(() => giveUp('Deadline exceeded waiting for a shared call', 'DEADLINE_EXCEEDED'), remaining);
+    }
+  });
+}
+
+/**
+ * Whether a call with the given key is currently in flight.
+ * @param key - The coalescing key.
+ * @returns True if a caller would join an existing flight.
+ */
+export function isInFlight(key: string): boolean {
+  return inFlight.has(key);
+}
+
+/**
+ * Returns how many calls led a flight and how many were coalesced onto one.
+ * @returns The current single-flight statistics.
+ */
+export function stats(): SingleFlightStats {
+  return { ...counters, inFlight: inFlight.size };
+}
@@ -0,0 +1,215 @@
+import { promises as fs } from 'fs';
+import { enqueueWrite, getDb, queryOne, withTransaction } from './db';
+import { CacheStats, LruCache } from './cache';
+
+// This service is the translation memory used by translateText: a store of previously translated
+// strings keyed by (target language, normalized source text). A bounded LRU keeps the hot entries
+// in memory, every entry is persisted to the 'translation_memory' table, and the whole memory can be
+// exported and imported as JSON Lines so a warmed memory can be shipped with a deploy.
+
+const MAX_ENTRIES = Number(process.env.TRANSLATION_MEMORY_MAX_ENTRIES) || 5000;
+// Translations do not go stale; the TTL only lets rarely used entries leave memory.
+const MEMORY_TTL_MS = 1000 * 60 * 60 * 24 * 7;
+
+export interface TranslationMemoryEntry {
+  lang: string;
+  source: string;
+  translation: string;
+}
+
+export interface TranslationMemoryStats {
+  languages: Record<string, LanguageHitStats>;
+  memory: CacheStats;
+}
+
+export interface LanguageHitStats {
+  memoryHits: number;
+  diskHits: number;
+  misses: number;
+  hitRatio: number;
+}
+
+// Swept by the maintenance scheduler.
+const memory = new LruCache<string>({ maxEntries: MAX_ENTRIES, defaultTtlMs: MEMORY_TTL_MS, sweepIntervalMs: 0 });
+const counters = new Map<string, { memoryHits: number; diskHits: number; misses: number }>();
+
+/**
+ * Normalizes source text so that trivially different inputs share an entry.
+ * @param text - The source text.
+ * @returns The text in NFC form, trimmed, with runs of whitespace collapsed.
+ */
+export function normalizeSource(text: string): string {
+  return String(text ?? '').normalize('NFC').trim().replace(/\s+/g, ' ');
+}
+
+/**
+ * Returns the hit counters for a language, creating them on first use.
+ */
+function counterFor(lang: string) {
+  let counter = counters.get(lang);
+  if (!counter) {
+    counter = { memoryHits: 0, diskHits: 0, misses: 0 };
+    counters.set(lang, counter);
+  }
+  return counter;
+}
+
+/**
+ * Looks up a translation in memory and then in SQLite, promoting disk hits into memory.
+ * @param lang - The target language.
+ * @param text - The source text (normalized internally).
+ * @returns The stored translation, or undefined on a miss.
+ */
+export async function lookup(lang: string, text: string): Promise<string | undefined> {
+  const source = normalizeSource(text);
+  const key = `${lang}:${source}`;
+  const counter = counterFor(lang);
+
+  const cached = memory.get(key);
+  if (cached !== undefined) {
+    counter.memoryHits++;
+    return cached;
+  }
+
+  try {
+    const row = await queryOne<{ translation: string }>(
+      'translation_memory_select',
+      'SELECT translation FROM translation_memory WHERE lang = ? AND source = ?',
+      lang,
+      source,
+    );
+    if (row) {
+      counter.diskHits++;
+      memory.set(key, row.translation);
+      return row.translation;
+    }
+  } catch (err: any) {
+    console.error('Translation memory read failed:', err?.message || err);
+  }
+
+  counter.misses++;
+  return undefined;
+}
+
+/**
+ * Stores a translation in memory and persists it in the background.
+ * @param lang - The target language.
+ * @param text - The source text (normalized internally).
+ * @param translation - The translated text.
+ */
+export function store(lang: string, text: string, translation: string): void {
+  const source = normalizeSource(text);
+  memory.set(`${lang}:${source}`, translation);
+  enqueueWrite(
+    'translation_memory_upsert',
+    'INSERT OR REPLACE INTO translation_memory (lang, source, translation, updated_at) VALUES (?, ?, ?, ?)',
+    lang,
+    source,
+    translation,
+    Date.now(),
+  ).catch((err: any) => console.error('Translation memory write failed:', err?.message || err));
+}
+
+/**
+ * Removes translations whose in-memory TTL has passed. They stay in SQLite.
+ * @returns The number of entries removed from memory.
+ */
+export function sweep(): number {
+  return memory.sweep();
+}
+
+/**
+ * Loads the most recently updated translations into memory.
+ * @param limit - The maximum number of entries to load.
+ * @returns A promise that resolves to the number of entries loaded.
+ */
+export async function warm(limit = MAX_ENTRIES): Promise<number> {
+  const rows = await getDb().all<TranslationMemoryEntry[]>(
+    'SELECT lang, source, translation FROM translation_memory ORDER BY updated_at DESC LIMIT ?',
+    limit,
+  );
+  // Insert oldest first so the most recent entries end up most recently used.
+  for (const row of rows.reverse()) {
+    memory.set(`${row.lang}:${row.source}`, row.translation);
+  }
+  return rows.length;
+}
+
+/**
+ * Exports the whole translation memory as JSON Lines, one entry per line.
+ * @returns The serialized memory.
+ */
+export async function exportJsonl(): Promise<string> {
+  const rows = await getDb().all<TranslationMemoryEntry[]>(
+    'SELECT lang, source, translation FROM translation_memory ORDER BY lang, source',
+  );
+  return rows.map((row) => JSON.stringify(row)).join('\n') + (rows.length ? '\n' : '');
+}
+
+/**
+ * Imports JSON Lines produced by `exportJsonl`, replacing entries with the same key.
+ * Malformed lines are skipped.
+ * @param jsonl - The serialized memory.
+ * @returns A promise that resolves to the number of entries imported.
+ */
+export async function importJsonl(jsonl: string): Promise<number> {
+  const entries: TranslationMemoryEntry[] = [];
+  for (const line of jsonl.split('\n')) {
+    if (!line.trim()) continue;
+    try {
+      const entry = JSON.parse(line);
+      if (typeof entry.lang === 'string' && typeof entry.source === 'string' && typeof entry.translation === 'string') {
+        entries.push(entry);
+      }
+    } catch {
+      // Skip malformed lines.
+    }
+  }
+
+  const now = Date.now();
+  await withTransaction(async (db) => {
+    const stmt = await db.prepare(
+      'INSERT OR REPLACE INTO translation_memory (lang, source, translation, updated_at) VALUES (?, ?, ?, ?)',
+    );
+    try {
+      for (const entry of entries) {
+        await stmt.run(entry.lang, normalizeSource(entry.source), entry.translation, now);
+      }
+    } finally {
+      await stmt.finalize();
+    }
+  });
+  return entries.length;
+}
+
+/**
+ * Imports the seed file named by TRANSLATION_MEMORY_SEED (if any) and warms the in-memory LRU.
+ * Call once after the database has been initialized.
+ * @returns A promise that resolves when the memory is ready.
+ */
+export async function initTranslationMemory(): Promise<void> {
+  const seedPath = process.env.TRANSLATION_MEMORY_SEED;
+  if (seedPath) {
+    try {
+      const imported = await importJsonl(await fs.readFile(seedPath, 'utf8'));
+      console.log(`Imported ${imported} translations from ${seedPath}.`);
+    } catch (err: any) {
+      console.error('Failed to import translation memory seed:', err?.message || err);
+    }
+  }
+  const warmed = await warm();
+  console.log(`Warmed ${warmed} translations from the database.`);
+}
+
+/**
+ * Returns hit ratios per target language plus the in-memory cache counters.
+ * @returns The current translation memory statistics.
+ */
+export function stats(): TranslationMemoryStats {
+  const languages: Record<string, LanguageHitStats> = {};
+  for (const [lang, counter] of counters) {
+    const total = counter.memoryHits + counter.diskHits + counter.misses;
+    languages[lang] = { ...counter, hitRatio: total ? (counter.memoryHits + counter.diskHits) / total : 0 };
+  }
+  return { languages, memory: memory.stats() };
+}
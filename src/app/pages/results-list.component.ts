@@ -1,4 +1,4 @@
-import { Component, CUSTOM_ELEMENTS_SCHEMA, computed, inject } from '@angular/core';
+import { Component, CUSTOM_ELEMENTS_SCHEMA, computed, effect, inject, untracked } from '@angular/core';
 import { Router } from '@angular/router';
 import { NgIf, NgFor, NgClass } from '@angular/common';
 import { AiRecipeService } from '../services/ai-recipe.service';
@@ -90,6 +90,15 @@ export class ResultsListComponent {
 
   recipes = computed(() => this.aiService.getLastResults() ?? []);
 
+  constructor() {
+    // Once all suggestions are in, fetch their details in one batch so opening a recipe is instant.
+    effect(() => {
+      if (this.aiService.isComplete()) {
+        untracked(() => this.aiService.fetchAllRecipeDetails());
+      }
+    });
+  }
+
   async toggleFavorite(recipe: any) {
     await this.favorites.toggleFavorite(recipe);
   }
@@ -1,25 +1,111 @@
 import { Injectable, signal } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpErrorResponse, HttpHeaders } from '@angular/common/http';
+import { Observable, catchError, map, of, throwError } from 'rxjs';
 import { RecipeQuery, RecipeSuggestion } from '../models/recipes';
 
+// How many ETag-tagged responses are remembered for revalidation.
+const MAX_ETAG_ENTRIES = 50;
+
 @Injectable({ providedIn: 'root' })
 export class AiRecipeService {
   private lastResults = signal<RecipeSuggestion[] | null>(null);
   private loading = signal(false);
+  // True once every suggestion for the current query has arrived.
+  private complete = signal(false);
   private readonly baseUrl = 'http://localhost:4000/ai';
+  // Incremented on every new query so a superseded stream stops updating the results.
+  private generation = 0;
+  // Generation whose suggestions were last sent to the batch details endpoint.
+  private detailsGeneration = 0;
+  // Last response body and ETag per request, so repeated requests can be revalidated with a 304.
+  private readonly etags = new Map<string, { etag: string; body: unknown }>();
 
   constructor(private readonly http: HttpClient) {}
 
+  /**
+   * Requests recipe suggestions and renders them as they arrive.
+   * Uses the streaming endpoint and falls back to the single-response endpoint
+   * if streaming fails before any recipe was received.
+   */
   generateRecipes(query: RecipeQuery): void {
+    const generation = ++this.generation;
     this.loading.set(true);
-    this.http
-      .post<{ recipes: RecipeSuggestion[] }>(`${this.baseUrl}/suggest-recipes`, query)
+    this.complete.set(false);
+    this.lastResults.set([]);
+    this.streamRecipes(query, generation).catch((err) => {
+      if (generation !== this.generation) {
+        return;
+      }
+      if ((this.lastResults() ?? []).length > 0) {
+        console.error('Recipe stream ended early', err);
+        this.loading.set(false);
+        this.complete.set(true);
+        return;
+      }
+      console.warn('Streaming recipes failed, falling back to a single request', err);
+      this.fetchRecipes(query, generation);
+    });
+  }
+
+  private async streamRecipes(query: RecipeQuery, generation: number): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/suggest-recipes/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+      body: JSON.stringify(query),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Recipe stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    const received: RecipeSuggestion[] = [];
+    let buffer = '';
+
+    while (generation === this.generation) {
+      const { value, done } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += value;
+      const events = buffer.split('\n\n');
+      buffer = events.pop() ?? '';
+
+      for (const raw of events) {
+        const event = /^event: (.*)$/m.exec(raw)?.[1];
+        const data = /^data: (.*)$/m.exec(raw)?.[1] ?? 'null';
+        if (event === 'recipe') {
+          received.push(JSON.parse(data) as RecipeSuggestion);
+          this.lastResults.set([...received]);
+          this.loading.set(false);
+        } else if (event === 'error') {
+          throw new Error(JSON.parse(data)?.message ?? 'Recipe stream failed');
+        }
+      }
+    }
+
+    if (generation !== this.generation) {
+      await reader.cancel();
+      return;
+    }
+    this.loading.set(false);
+    this.complete.set(true);
+  }
+
+  private fetchRecipes(query: RecipeQuery, generation: number): void {
+    this.postWithEtag<{ recipes: RecipeSuggestion[] }>(`${this.baseUrl}/suggest-recipes`, query)
       .subscribe({
         next: (res) => {
+          if (generation !== this.generation) {
+            return;
+          }
           this.lastResults.set(res.recipes ?? []);
           this.loading.set(false);
+          this.complete.set(true);
         },
         error: (err) => {
+          if (generation !== this.generation) {
+            return;
+          }
           console.error('Failed to fetch recipes from backend', err);
           this.lastResults.set([]);
           this.loading.set(false);
@@ -27,6 +113,32 @@ export class AiRecipeService {
       });
   }
 
+  /**
+   * POSTs a request, sending If-None-Match when the same request was answered before.
+   * The server replies 304 without a body when its result is unchanged, and the remembered body is used.
+   */
+  private postWithEtag<T>(url: string, body: unknown): Observable<T> {
+    const key = `${url}\n${JSON.stringify(body)}`;
+    const known = this.etags.get(key);
+    const headers = known ? new HttpHeaders({ 'If-None-Match': known.etag }) : undefined;
+    return this.http.post<T>(url, body, { headers, observe: 'response' }).pipe(
+      map((response) => {
+        const etag = response.headers.get('ETag');
+        if (etag && response.body !== null) {
+          this.etags.delete(key);
+          this.etags.set(key, { etag, body: response.body });
+          if (this.etags.size > MAX_ETAG_ENTRIES) {
+            this.etags.delete(this.etags.keys().next().value!);
+          }
+        }
+        return response.body as T;
+      }),
+      catchError((err: HttpErrorResponse) =>
+        err.status === 304 && known ? of(known.body as T) : throwError(() => err),
+      ),
+    );
+  }
+
   getLastResults(): RecipeSuggestion[] | null {
     return this.lastResults();
   }
@@ -35,18 +147,23 @@ export class AiRecipeService {
     return this.loading();
   }
 
+  /** Whether every suggestion for the current query has arrived. */
+  isComplete(): boolean {
+    return this.complete();
+  }
+
   getRecipeById(id: string): RecipeSuggestion | undefined {
     return this.lastResults()?.find((r) => r.id === id);
   }
 
   fetchRecipeDetails(id: string): void {
     const base = this.getRecipeById(id);
-    if (!base) {
+    // Skip recipes already enriched, e.g. by fetchAllRecipeDetails.
+    if (!base || base.nutrition) {
       return;
     }
     this.loading.set(true);
-    this.http
-      .post<RecipeSuggestion>(`${this.baseUrl}/recipe-details`, base)
+    this.postWithEtag<RecipeSuggestion>(`${this.baseUrl}/recipe-details`, base)
       .subscribe({
         next: (detailed) => {
           const current = this.lastResults() ?? [];
@@ -60,4 +177,40 @@ export class AiRecipeService {
         },
       });
   }
+
+  /**
+   * Enriches every current suggestion with one request to the batch endpoint.
+   * Runs once per query; recipes that fail to enrich keep their summary data.
+   */
+  fetchAllRecipeDetails(): void {
+    const generation = this.generation;
+    if (this.detailsGeneration === generation) {
+      return;
+    }
+    const bases = (this.lastResults() ?? []).filter((r) => !r.nutrition);
+    if (bases.length === 0) {
+      return;
+    }
+    this.detailsGeneration = generation;
+    this.http
+      .post<{ results: { id: string; status: 'ok' | 'error'; recipe?: RecipeSuggestion }[] }>(
+        `${this.baseUrl}/recipe-details/batch`,
+        { recipes: bases },
+      )
+      .subscribe({
+        next: ({ results }) => {
+          if (generation !== this.generation) {
+            return;
+          }
+          const enriched = new Map(
+            results.filter((r) => r.status === 'ok' && r.recipe).map((r) => [r.id, r.recipe!]),
+          );
+          const current = this.lastResults() ?? [];
+          this.lastResults.set(current.map((r) => enriched.get(r.id) ?? r));
+        },
+        error: (err) => {
+          console.error('Failed to fetch recipe details batch', err);
+        },
+      });
+  }
 }
@@ -0,0 +1,325 @@
+"""Groq/OpenAI-compatible chat-completions stand-in for offline benchmarking.
+
+Point the server at it to run every LLM path without spending Groq quota:
+
+    python testsprite_tests/groq_standin.py --port 8787 --latency lognormal:400,0.5
+    GROQ_API_URL=http://localhost:8787/v1/chat/completions GROQ_API_KEY=offline npm start
+
+The stand-in recognises the server's prompts (recipe suggestions, recipe details, single and batched
+translations) and answers each with a schema-valid payload from a seeded generator: the same seed and
+prompt always produce the same answer. Latency, streaming speed and injected failures are configurable.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DISHES = [
+    ("Dal Palak", "North Indian", True),
+    ("Vegetable Pulao", "North Indian", True),
+    ("Masala Dosa", "South Indian", True),
+    ("Lemon Rice", "South Indian", True),
+    ("Poha", "Maharashtrian", True),
+    ("Misal Pav", "Maharashtrian", True),
+    ("Dhokla", "Gujarati", True),
+    ("Aloo Posto", "Bengali", True),
+    ("Chana Masala", "Punjabi", True),
+    ("Egg Curry", "Bengali", False),
+    ("Chicken Sukka", "Mangalorean", False),
+    ("Fish Moilee", "Kerala", False),
+    ("Keema Matar", "Mughlai", False),
+    ("Paneer Bhurji", "North Indian", True),
+]
+STYLES = ["Quick", "Homestyle", "Spicy", "Tangy", "Smoky", "Masala", "One-Pot"]
+TAGS = ["quick", "comfort", "one-pot", "high-protein", "light", "festive", "kid-friendly", "weeknight"]
+PANTRY = ["onion", "tomato", "ginger", "garlic", "green chilli", "turmeric", "cumin seeds", "coriander", "ghee", "salt"]
+STEP_TEMPLATES = [
+    "Wash and chop the {a} and {b}.",
+    "Heat {fat} in a kadhai and splutter the cumin seeds.",
+    "Saute the {a} until golden, then add ginger-garlic paste.",
+    "Add turmeric, chilli and coriander powder and cook for a minute.",
+    "Stir in the {b} and cook covered for {n} minutes.",
+    "Adjust salt, simmer until thick and finish with fresh coriander.",
+    "Rest for two minutes before serving hot.",
+]
+TIPS = [
+    "Toast the spices on low heat so they do not burn.",
+    "A squeeze of lemon at the end brightens the flavours.",
+    "Leftovers taste even better the next day.",
+    "Use a heavy-bottomed pan to avoid sticking.",
+    "Add a pinch of sugar to balance the tomatoes.",
+]
+LANGUAGE_TAGS = {"English": "en", "Hindi": "hi", "Marathi": "mr"}
+
+
+class LatencyModel:
+    """Samples delays in milliseconds from a named distribution.
+
+    Specs: ``fixed:MS``, ``uniform:LOW,HIGH``, ``normal:MEAN,STDDEV`` and ``lognormal:MEDIAN,SIGMA``.
+    """
+
+    def __init__(self, spec, rng):
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()] if params else [0.0]
+        self.rng = rng
+        self.lock = threading.Lock()
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self):
+        with self.lock:
+            if self.kind == "fixed":
+                value = self.params[0]
+            elif self.kind == "uniform":
+                value = self.rng.uniform(self.params[0], self.params[1])
+            elif self.kind == "normal":
+                value = self.rng.gauss(self.params[0], self.params[1])
+            else:
+                value = self.params[0] * math.exp(self.rng.gauss(0.0, self.params[1]))
+        return max(0.0, value)
+
+
+def estimate_tokens(text):
+    """Rough token count, matching the server's 4-characters-per-token estimate."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def extract_json(text, marker):
+    """Parses the JSON that follows ``marker`` in a prompt, or returns None."""
+    index = text.rfind(marker)
+    if index < 0:
+        return None
+    try:
+        return json.loads(text[index + len(marker):].strip())
+    except ValueError:
+        return None
+
+
+def make_ingredients(rng, user_ingredients, count):
+    names = list(dict.fromkeys([i for i in user_ingredients if isinstance(i, str)] + rng.sample(PANTRY, len(PANTRY))))
+    return [
+        {"name": name.title(), "quantity": rng.choice(["1 cup", "2 tbsp", "1 tsp", "200 g", "2 medium", "a handful"]),
+         "isFromUserKitchen": name in user_ingredients}
+        for name in names[:count]
+    ]
+
+
+def make_details(rng, base):
+    existing = [i.get("name", "") for i in base.get("existingIngredients") or [] if isinstance(i, dict)]
+    ingredients = make_ingredients(rng, [n.lower() for n in existing], rng.randint(5, 10))
+    a, b = ingredients[0]["name"].lower(), ingredients[1]["name"].lower()
+    steps = [t.format(a=a, b=b, fat=rng.choice(["oil", "ghee"]), n=rng.randint(5, 15)) for t in STEP_TEMPLATES]
+    return {
+        "id": base.get("id") or str(uuid.UUID(int=rng.getrandbits(128))),
+        "title": base.get("title") or "Chef's Special",
+        "shortDescription": base.get("shortDescription") or "A comforting home-style dish.",
+        "cuisineRegion": base.get("cuisineRegion") or "North Indian",
+        "isVegetarian": bool(base.get("isVegetarian", True)),
+        "tags": base.get("tags") or rng.sample(TAGS, 2),
+        "estimatedTimeMinutes": base.get("estimatedTimeMinutes") or rng.choice([20, 25, 30, 40]),
+        "difficulty": base.get("difficulty") or "easy",
+        "servingSize": rng.choice([2, 3, 4]),
+        "ingredients": ingredients,
+        "steps": steps[: rng.randint(4, len(steps))],
+        "tips": rng.sample(TIPS, rng.randint(2, 4)),
+        "nutrition": {
+            "calories": rng.randint(180, 650), "protein": rng.randint(5, 35), "carbs": rng.randint(15, 80),
+            "fat": rng.randint(4, 30), "fiber": rng.randint(2, 12), "sugar": rng.randint(1, 12),
+        },
+    }
+
+
+def make_recipes(rng, query):
+    user_ingredients = [str(i).lower() for i in query.get("ingredients") or []]
+    time_limit = query.get("timeLimitMinutes") or 45
+    veg_only = query.get("diet") in ("veg", "vegan", "jain")
+    dishes = [d for d in DISHES if d[2] or not veg_only]
+    recipes = []
+    for title, region, veg in rng.sample(dishes, 3):
+        recipes.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": f"{rng.choice(STYLES)} {title}",
+            "shortDescription": f"A {rng.choice(['hearty', 'light', 'zesty', 'comforting'])} {region} dish "
+                                f"using {', '.join(user_ingredients[:2]) or 'pantry staples'}.",
+            "cuisineRegion": query.get("cuisineFocus") or region,
+            "isVegetarian": veg,
+            "tags": rng.sample(TAGS, 3),
+            "estimatedTimeMinutes": rng.randint(10, max(10, int(time_limit))),
+            "difficulty": rng.choice(["easy", "easy", "medium", "hard"]),
+            "ingredients": make_ingredients(rng, user_ingredients, rng.randint(4, 7)),
+            "steps": [t.format(a="onion", b="tomato", fat="oil", n=10) for t in STEP_TEMPLATES[:4]],
+            "tips": rng.sample(TIPS, 2),
+            "servingSize": query.get("servings") or 2,
+        })
+    return {"recipes": recipes}
+
+
+def pseudo_translate(text, language):
+    """Marks text as translated; English requests are returned unchanged."""
+    code = LANGUAGE_TAGS.get(language, "xx")
+    return text if code == "en" else f"[{code}] {text}"
+
+
+def generate_content(rng, messages):
+    """Builds the completion for a request by recognising which server prompt it carries."""
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    language = next((name for name in LANGUAGE_TAGS if f"into {name}" in user), "English")
+
+    if "mapping ids to texts" in system:
+        texts = extract_json(user, "Input:") or {}
+        return json.dumps({"translations": {k: pseudo_translate(str(v), language) for k, v in texts.items()}},
+                          ensure_ascii=False)
+    if "translator" in system:
+        match = re.search(r'Text: "(.*)"\s*$', user, re.S)
+        return pseudo_translate(match.group(1) if match else user, language)
+    if "detailed recipe" in system:
+        bases = extract_json(user, "Base recipes:")
+        if isinstance(bases, list):
+            return json.dumps({"recipes": [make_details(rng, b) for b in bases]}, ensure_ascii=False)
+        return json.dumps(make_details(rng, extract_json(user, "Base recipe:") or {}), ensure_ascii=False)
+    return json.dumps(make_recipes(rng, extract_json(user, "Input:") or {}), ensure_ascii=False)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "GroqStandIn/1.0"
+    # Headers and body are written separately; without TCP_NODELAY, Nagle's algorithm adds ~40 ms.
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        if self.server.options.verbose:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": self.server.options.model, "object": "model"}]})
+        elif self.path == "/health":
+            self.send_json(200, {"status": "ok", "requests": self.server.request_count})
+        else:
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        options = self.server.options
+        with self.server.lock:
+            self.server.request_count += 1
+            roll = self.server.fault_rng.random()
+        if roll < options.rate_limit_rate:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                           {"retry-after": str(options.retry_after), "x-ratelimit-remaining-requests": "0"})
+            return
+        if roll < options.rate_limit_rate + options.error_rate:
+            self.send_json(503, {"error": {"message": "Service unavailable (injected)"}})
+            return
+
+        messages = body.get("messages") or []
+        prompt = json.dumps(messages, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.sha256(f"{options.seed}:{prompt}".encode("utf-8")).hexdigest()
+        content = generate_content(random.Random(digest), messages)
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{digest[:24]}"
+        model = body.get("model") or options.model
+
+        time.sleep(self.server.latency.sample() / 1000)
+        if body.get("stream"):
+            self.stream(completion_id, model, content, usage)
+            return
+        self.send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def stream(self, completion_id, model, content, usage):
+        """Sends the completion as server-sent events, a few characters per chunk.
+        Like Groq, the final chunk reports token usage in `x_groq.usage`."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        size = self.server.options.chunk_chars
+        try:
+            for start in range(0, len(content), size):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": content[start:start + size]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.server.options.chunk_delay_ms / 1000)
+            done = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "x_groq": {"id": completion_id, "usage": usage}}
+            self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Groq-compatible chat-completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--seed", type=int, default=42, help="seed for generated content and latency")
+    parser.add_argument("--model", default="meta-llama/llama-4-maverick-17b-128e-instruct")
+    parser.add_argument("--latency", default="lognormal:400,0.4",
+                        help="time to first byte: fixed:MS, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay-ms", type=float, default=15, help="delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="retry-after seconds sent with a 429")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    return parser.parse_args(argv)
+
+
+def serve(options):
+    server = ThreadingHTTPServer((options.host, options.port), StandInHandler)
+    server.daemon_threads = True
+    server.options = options
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.fault_rng = random.Random(options.seed)
+    server.latency = LatencyModel(options.latency, random.Random(options.seed))
+    return server
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    httpd = serve(args)
+    print(f"Groq stand-in listening on http://{args.host}:{httpd.server_port}/v1/chat/completions "
+          f"(seed {args.seed}, latency {args.latency})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,399 @@
+"""HTTP-level load generator for the RecipeRec API.
+
+Drives ``/ai/suggest-recipes``, ``/ai/recipe-details`` and ``/favorites`` directly (no browser) and
+reports latency percentiles, throughput, error rates and cache hit ratios as JSON:
+
+    python testsprite_tests/loadgen.py --base-url http://localhost:4000 --mode closed --concurrency 8 \\
+        --duration 30 --mix suggest=60,details=30,favorites=10 --hit-ratio 0.8 \\
+        --budget suggest.p95_ms=1500 --budget error_rate=0.01 --output report.json
+
+Closed-loop mode runs ``--concurrency`` users that each send the next request as soon as the previous
+one finishes. Open-loop mode starts requests on a Poisson schedule at ``--rate`` per second whatever the
+response times are, and measures latency from the scheduled start so queueing is not hidden.
+
+``--hit-ratio`` controls the share of AI requests that reuse a small pool of hot queries (warmed up
+before measuring) instead of queries the server has never seen. Budgets are ``[endpoint.]metric=limit``;
+``throughput_rps`` is a minimum and every other metric a maximum. The exit code is 1 if a budget fails.
+
+Only the standard library is used: requests go over asyncio streams with keep-alive connections.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+PANTRY = ["rice", "dal", "onion", "tomato", "potato", "paneer", "spinach", "egg", "chicken", "peas",
+          "cauliflower", "chickpeas", "curd", "besan", "carrot", "capsicum", "fish", "poha", "bread", "lentils"]
+DIETS = ["veg", "non-veg", "vegan", "jain"]
+ENDPOINTS = ["suggest", "details", "favorites", "favorites_write"]
+MAX_METRICS = ("p50_ms", "p95_ms", "p99_ms", "max_ms", "mean_ms", "error_rate")
+MIN_METRICS = ("throughput_rps",)
+
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection speaking just enough of the protocol for JSON APIs."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive",
+                 f"Content-Length: {len(data)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        await self.writer.drain()
+        try:
+            return await self._read_response(method)
+        except Exception:
+            self.close()
+            raise
+
+    async def _read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise HttpError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if method == "HEAD" or status in (204, 304):
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            self.close()
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, headers, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Pool:
+    """Reuses idle keep-alive connections; opens a new one when none is idle."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme != "http":
+            raise ValueError("only http:// base URLs are supported")
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.idle = []
+
+    async def request(self, method, path, body=None, headers=None):
+        conn = self.idle.pop() if self.idle else Connection(self.host, self.port)
+        result = await conn.request(method, self.prefix + path, body, headers)
+        if conn.writer is not None:
+            self.idle.append(conn)
+        return result
+
+    def close(self):
+        for conn in self.idle:
+            conn.close()
+        self.idle.clear()
+
+
+class Workload:
+    """Builds requests for each endpoint, mixing hot (repeated) and cold (never seen) queries."""
+
+    def __init__(self, rng, mix, hit_ratio, hot_queries, timeout_ms):
+        self.rng = rng
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.hit_ratio = hit_ratio
+        self.headers = {"X-Request-Timeout-Ms": str(timeout_ms)} if timeout_ms else {}
+        self.hot = [self.cold_query() for _ in range(hot_queries)]
+        self.hot_recipes = [self.base_recipe(f"hot-{i}") for i in range(hot_queries)]
+
+    def cold_query(self):
+        # Two made-up ingredients keep cold queries out of both the exact and the similarity cache.
+        nonce = uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]
+        return {
+            "ingredients": self.rng.sample(PANTRY, 2) + [f"herb-{nonce}", f"spice-{nonce}"],
+            "diet": self.rng.choice(DIETS),
+            "timeLimitMinutes": self.rng.choice([15, 30, 45, 60]),
+            "servings": self.rng.choice([1, 2, 4]),
+        }
+
+    def base_recipe(self, recipe_id):
+        return {
+            "id": recipe_id,
+            "title": f"Load Test Curry {recipe_id}",
+            "shortDescription": "Synthetic recipe used by the load generator.",
+            "cuisineRegion": "North Indian",
+            "isVegetarian": True,
+            "tags": ["test"],
+            "estimatedTimeMinutes": 30,
+            "difficulty": "easy",
+            "ingredients": [{"name": "Rice", "quantity": "1 cup", "isFromUserKitchen": True}],
+            "steps": [],
+            "tips": [],
+        }
+
+    def warmup_requests(self):
+        return ([("suggest", "POST", "/ai/suggest-recipes", q) for q in self.hot]
+                + [("details", "POST", "/ai/recipe-details", r) for r in self.hot_recipes])
+
+    def next_requests(self):
+        """Returns the (endpoint, method, path, body) requests of the next operation."""
+        name = self.rng.choices(self.names, self.weights)[0]
+        hot = self.rng.random() < self.hit_ratio
+        if name == "suggest":
+            query = self.rng.choice(self.hot) if hot and self.hot else self.cold_query()
+            return [(name, "POST", "/ai/suggest-recipes", query)]
+        if name == "details":
+            recipe = (self.rng.choice(self.hot_recipes) if hot and self.hot_recipes
+                      else self.base_recipe(f"cold-{uuid.UUID(int=self.rng.getrandbits(128)).hex}"))
+            return [(name, "POST", "/ai/recipe-details", recipe)]
+        if name == "favorites_write":
+            recipe = self.base_recipe(f"fav-{uuid.UUID(int=self.rng.getrandbits(128)).hex}")
+            return [(name, "POST", "/favorites", recipe), (name, "DELETE", f"/favorites/{recipe['id']}", None)]
+        return [(name, "GET", "/favorites", None)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+        self.cache = defaultdict(Counter)
+        self.dropped = 0
+
+    def record(self, endpoint, latency_ms, status, headers):
+        self.latencies[endpoint].append(latency_ms)
+        self.statuses[endpoint][str(status)] += 1
+        if status >= 400:
+            self.errors[endpoint] += 1
+        if headers and "x-cache" in headers:
+            self.cache[endpoint][headers["x-cache"].upper()] += 1
+
+    def record_failure(self, endpoint, latency_ms, exc):
+        self.latencies[endpoint].append(latency_ms)
+        self.statuses[endpoint][type(exc).__name__] += 1
+        self.errors[endpoint] += 1
+
+
+async def run_operation(pool, workload, recorder, scheduled_at=None):
+    for endpoint, method, path, body in workload.next_requests():
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        scheduled_at = None
+        try:
+            status, headers, _ = await pool.request(method, path, body, workload.headers)
+            recorder.record(endpoint, (time.perf_counter() - started) * 1000, status, headers)
+        except Exception as exc:  # noqa: BLE001 - every failure counts as an error sample
+            recorder.record_failure(endpoint, (time.perf_counter() - started) * 1000, exc)
+
+
+async def closed_loop(args, workload, recorder, deadline):
+    async def user():
+        pool = Pool(args.base_url)
+        try:
+            while time.perf_counter() < deadline:
+                await run_operation(pool, workload, recorder)
+                if args.think_ms:
+                    await asyncio.sleep(workload.rng.expovariate(1000 / args.think_ms))
+        finally:
+            pool.close()
+
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+
+
+async def open_loop(args, workload, recorder, deadline):
+    pool = Pool(args.base_url)
+    in_flight = set()
+    next_at = time.perf_counter()
+    try:
+        while next_at < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= args.max_in_flight:
+                recorder.dropped += 1
+            else:
+                task = asyncio.ensure_future(run_operation(pool, workload, recorder, scheduled_at=next_at))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_at += workload.rng.expovariate(args.rate)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    finally:
+        pool.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest rank: the smallest value with at least pct% of the samples at or below it.
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return round(sorted_values[rank], 2)
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / count, 2) if count else None,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": round(values[-1], 2) if values else None,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_budget(text):
+    key, _, limit = text.partition("=")
+    scope, _, metric = key.strip().rpartition(".")
+    if metric not in MAX_METRICS + MIN_METRICS:
+        raise argparse.ArgumentTypeError(f"unknown budget metric '{metric}'")
+    return (scope or "overall", metric, float(limit))
+
+
+def check_budgets(report, budgets):
+    results = []
+    for scope, metric, limit in budgets:
+        stats = report["overall"] if scope == "overall" else report["endpoints"].get(scope, {})
+        actual = stats.get(metric)
+        if actual is None:
+            passed = False
+        elif metric in MIN_METRICS:
+            passed = actual >= limit
+        else:
+            passed = actual <= limit
+        results.append({"budget": f"{scope}.{metric}", "limit": limit, "actual": actual, "passed": passed,
+                        "kind": "min" if metric in MIN_METRICS else "max"})
+    return results
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    workload = Workload(rng, args.mix, args.hit_ratio, args.hot_queries, args.timeout_ms)
+
+    if args.warmup and args.hit_ratio > 0:
+        pool = Pool(args.base_url)
+        try:
+            for _, method, path, body in workload.warmup_requests():
+                try:
+                    await pool.request(method, path, body, workload.headers)
+                except Exception:  # noqa: BLE001 - warmup failures show up in the measured run
+                    pass
+        finally:
+            pool.close()
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    if args.mode == "open":
+        await open_loop(args, workload, recorder, deadline)
+    else:
+        await closed_loop(args, workload, recorder, deadline)
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("budget", "output")},
+        "elapsed_s": round(elapsed, 2),
+        "overall": summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "endpoints": {},
+        "dropped": recorder.dropped,
+    }
+    for endpoint, values in sorted(recorder.latencies.items()):
+        stats = summarize(values, recorder.errors[endpoint], elapsed)
+        stats["statuses"] = dict(recorder.statuses[endpoint])
+        cache = recorder.cache.get(endpoint)
+        if cache:
+            total = sum(cache.values())
+            stats["cache"] = dict(cache)
+            stats["cache_hit_ratio"] = round((total - cache.get("MISS", 0)) / total, 4)
+        report["endpoints"][endpoint] = stats
+
+    report["budgets"] = check_budgets(report, args.budget)
+    report["passed"] = all(b["passed"] for b in report["budgets"])
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP load generator for the RecipeRec API.")
+    parser.add_argument("--base-url", default="http://localhost:4000")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=5, help="closed loop: number of concurrent users")
+    parser.add_argument("--think-ms", type=float, default=0, help="closed loop: mean think time between requests")
+    parser.add_argument("--rate", type=float, default=5, help="open loop: mean arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="open loop: arrivals beyond this are dropped")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("suggest=60,details=30,favorites=10"),
+                        help=f"weighted endpoint mix, from {', '.join(ENDPOINTS)}")
+    parser.add_argument("--hit-ratio", type=float, default=0.5, help="share of AI requests using hot queries")
+    parser.add_argument("--hot-queries", type=int, default=10, help="size of the hot query pool")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="skip warming the hot queries")
+    parser.add_argument("--timeout-ms", type=int, default=0, help="sent as X-Request-Timeout-Ms when set")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        help="[endpoint.]metric=limit, e.g. suggest.p95_ms=1500 or error_rate=0.01")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())